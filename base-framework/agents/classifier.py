@@ -1,7 +1,485 @@
 # agents/classifier.py
+import hashlib
+import json
+import logging
+import os
 import re
-from typing import Optional, Dict, Any
-from fastapi import APIRouter, Query
+import sys
+import threading
+import time
+from itertools import chain
+from typing import Optional, Dict, Any, List, Literal, Set, Tuple
+from fastapi import APIRouter, Body, HTTPException, Query
+from agents.dspy_integration import AgentContext, run_agent, run_in_thread
+from app.linear_regex import LinearRegex, UnsupportedPattern
+
+try:
+    from re import _parser as _sre_parser
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parser
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Classifies input text using rule-based logic."}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
+logger = logging.getLogger(__name__)
+
+# Rule table used when no rule file is configured
+DEFAULT_RULES = {
+    "Greeting": [r"\bhello\b", r"\bhi\b", "greeting"],
+    "Question": [r"\?$", r"\bwhat\b", r"\bhow\b", r"\bwhy\b", r"\bwhen\b"],
+    "Command": [r"\bdo\b", r"\bexecute\b", r"\brun\b"],
+}
+
+# JSON or YAML file with the rule table ({category: [pattern, ...]}), reloaded
+# when it changes. Empty uses DEFAULT_RULES.
+CLASSIFIER_RULES_FILE = os.environ.get("CLASSIFIER_RULES_FILE", "")
+
+# Seconds between checks of the rule file for changes
+CLASSIFIER_RULES_CHECK_INTERVAL = float(os.environ.get("CLASSIFIER_RULES_CHECK_INTERVAL", 2))
+
+# Engine for regular-expression rules: "re", or "linear" to run them in time
+# linear in the text and reject rules that need backtracking when they load
+CLASSIFIER_REGEX_ENGINE = os.environ.get("CLASSIFIER_REGEX_ENGINE", "re")
+
+# Directory of a naive Bayes model trained with `python -m app.naive_bayes`,
+# used with mode=model. It is memory-mapped on first use and kept until restart.
+CLASSIFIER_MODEL_PATH = os.environ.get("CLASSIFIER_MODEL_PATH", "")
+
+# "rules" scores the keyword and regex rules, "model" asks the statistical model
+MODES = ("rules", "model")
+
+NO_MODEL = "No classifier model is configured; set CLASSIFIER_MODEL_PATH to use mode=model."
+
+# Most texts accepted by one POST /classifier/batch request
+MAX_BATCH_TEXTS = 10_000
+
+INVALID_INPUT = "INPUT_TEXT is not provided or is not a valid string."
+
+# A rule that is a plain keyword, optionally between \b word boundaries
+_LITERAL_RULE = re.compile(r"(\\b)?((?:[^\\.^$*+?{}\[\]|()]|\\[^\w\d])+?)(\\b)?")
+_WORDS = re.compile(r"\w+")
+
+# Up to this many non-word keywords are searched with str.find instead of the automaton
+_SCAN_KEYWORDS = 16
+
+def _is_word(char: str) -> bool:
+    """Whether `char` is a \\w character, as `re` decides word boundaries for str patterns."""
+    return char.isalnum() or char == "_"
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over plain keywords.
+
+    One pass over the text reports every occurrence of every keyword,
+    including overlapping ones, as (end index, keyword index) pairs.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        # goto[state] maps a character to the next state; out[state] lists keyword indexes ending there
+        self.goto: List[Dict[str, int]] = [{}]
+        self.out: List[List[int]] = [[]]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.out.append([])
+                state = next_state
+            self.out[state].append(index)
+
+        # Breadth-first failure links; outputs of the fallback state are merged in
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.out[next_state] = self.out[next_state] + self.out[self.fail[next_state]]
+
+    def iter_matches(self, text: str):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                for index in out[state]:
+                    yield end, index
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """
+    The longest run of plain characters every match of `pattern` contains,
+    taken from the top level of the parsed pattern, or None.
+    """
+    try:
+        parsed = _sre_parser.parse(pattern)
+    except Exception:
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    best, run = "", ""
+    for op, arg in parsed:
+        if op is _sre_parser.LITERAL:
+            run += chr(arg)
+        elif op is not _sre_parser.AT:  # anchors and \b are zero-width
+            best, run = max(best, run, key=len), ""
+    best = max(best, run, key=len)
+    return best if len(best) >= 2 else None
+
+
+class CompiledRules:
+    """
+    A rule table compiled for single-pass matching.
+
+    Whole-word keyword rules (`\\bhello\\b`) are looked up by the words of the
+    text. Other keyword rules (`greeting`, `\\bgood morning\\b`, ...) go into
+    one Aho-Corasick automaton, or are simply searched for when there are
+    only a few of them, with word boundaries checked per occurrence. Regular
+    expressions that require some literal text are searched only when that
+    text occurs; the others are always searched. `scores` returns, per
+    category, how many of its rules match somewhere in the text, exactly as
+    searching for each rule separately would.
+
+    With `regex_engine="linear"` regular expressions run on `LinearRegex`,
+    and a rule it cannot run without backtracking raises UnsupportedPattern.
+    """
+
+    def __init__(self, rules: Dict[str, List[str]], regex_engine: str = "re"):
+        if regex_engine not in ("re", "linear"):
+            raise ValueError(f"Unknown regex engine {regex_engine!r}; use 're' or 'linear'.")
+        self.regex_engine = regex_engine
+        self.categories = list(rules)
+        self.rule_category: List[int] = []
+        # word -> rules that are exactly that word between \b boundaries
+        self.word_rules: Dict[str, List[int]] = {}
+        self.keywords: List[str] = []
+        # keyword index -> (rule index, needs \b before, needs \b after, prefilter of a regex rule)
+        self.keyword_rules: List[Tuple[int, bool, bool, bool]] = []
+        # rule index -> compiled re.Pattern or LinearRegex
+        self.regexes: Dict[int, Any] = {}
+        self.unfiltered: List[int] = []
+        for category_index, (category, patterns) in enumerate(rules.items()):
+            for pattern in patterns:
+                rule = len(self.rule_category)
+                self.rule_category.append(category_index)
+                literal = _LITERAL_RULE.fullmatch(pattern)
+                if literal:
+                    keyword = re.sub(r"\\(.)", r"\1", literal.group(2))
+                    if literal.group(1) and literal.group(3) and _WORDS.fullmatch(keyword):
+                        self.word_rules.setdefault(keyword, []).append(rule)
+                    else:
+                        self.keywords.append(keyword)
+                        self.keyword_rules.append((rule, bool(literal.group(1)), bool(literal.group(3)), False))
+                    continue
+                if regex_engine == "re":
+                    self.regexes[rule] = re.compile(pattern)
+                else:
+                    try:
+                        self.regexes[rule] = LinearRegex(pattern)
+                    except UnsupportedPattern as exc:
+                        raise UnsupportedPattern(f"Classifier rule {pattern!r} of {category!r} is rejected: {exc}.") from exc
+                required = _required_literal(pattern)
+                if required is None:
+                    self.unfiltered.append(rule)
+                else:
+                    self.keywords.append(required)
+                    self.keyword_rules.append((rule, False, False, True))
+        # A handful of str.find scans beats walking the automaton character by character in Python
+        self.automaton = KeywordAutomaton(self.keywords) if len(self.keywords) > _SCAN_KEYWORDS else None
+        self._rule_category_array = None
+        self._any_keyword = None
+        self._word_arrays = None
+
+    def _keyword_ends(self, text: str):
+        """(end index, keyword index) of every keyword occurrence in `text`."""
+        if self.automaton is not None:
+            yield from self.automaton.iter_matches(text)
+            return
+        for index, keyword in enumerate(self.keywords):
+            start = text.find(keyword)
+            while start >= 0:
+                yield start + len(keyword), index
+                start = text.find(keyword, start + 1)
+
+    def matched_rules(self, text: str) -> Set[int]:
+        """Indexes of the rules that match somewhere in `text`."""
+        matched: Set[int] = set()
+        if self.word_rules:
+            word_rules = self.word_rules
+            for word in set(_WORDS.findall(text)):
+                rules = word_rules.get(word)
+                if rules:
+                    matched.update(rules)
+        self._match_keywords(text, matched)
+        return matched
+
+    def _match_keywords(self, text: str, matched: Set[int], unfiltered: bool = True) -> None:
+        """Adds the matching keyword and regex rules to `matched` (without the unfiltered regexes if told so)."""
+        candidates: Set[int] = set(self.unfiltered) if unfiltered else set()
+        keyword_rules, keywords = self.keyword_rules, self.keywords
+        for end, index in self._keyword_ends(text):
+            rule, left, right, prefilter = keyword_rules[index]
+            if prefilter:
+                candidates.add(rule)
+                continue
+            if rule in matched:
+                continue
+            start = end - len(keywords[index])
+            if left and (start > 0 and _is_word(text[start - 1])) == _is_word(text[start]):
+                continue
+            if right and _is_word(text[end - 1]) == (end < len(text) and _is_word(text[end])):
+                continue
+            matched.add(rule)
+
+        regexes = self.regexes
+        matched.update(rule for rule in candidates if regexes[rule].search(text))
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Number of matching rules per category."""
+        counts = [0] * len(self.categories)
+        for rule in self.matched_rules(text):
+            counts[self.rule_category[rule]] += 1
+        return dict(zip(self.categories, counts))
+
+    def score_matrix(self, texts: List[str]):
+        """
+        (texts x categories) NumPy matrix of matching rule counts.
+
+        Repeated texts are matched once. Whole-word rules are found by
+        intersecting each text's words with the rule words, and only those
+        hits are mapped to their rules and counted with array operations.
+        """
+        import numpy as np  # imported with the first batch, keeping it out of agent start-up
+
+        if self._rule_category_array is None:
+            self._rule_category_array = np.array(self.rule_category, dtype=np.intp)
+        unique: Dict[str, int] = {}
+        row_of = [unique.setdefault(text, len(unique)) for text in texts]
+        rows: List[int] = []
+        rules: List[int] = []
+        if self.keywords:
+            if self.automaton is None and self._any_keyword is None:
+                self._any_keyword = re.compile("|".join(map(re.escape, self.keywords)))
+            # Without the automaton, texts none of the keywords occur in are skipped in one regex search
+            any_keyword = self._any_keyword.search if self.automaton is None else None
+            for row, text in enumerate(unique):
+                if any_keyword is None or any_keyword(text):
+                    matched: Set[int] = set()
+                    self._match_keywords(text, matched, unfiltered=False)
+                    rows.extend([row] * len(matched))
+                    rules.extend(matched)
+        for rule in self.unfiltered:
+            search = self.regexes[rule].search
+            hits = [row for row, text in enumerate(unique) if search(text)]
+            rows.extend(hits)
+            rules.extend([rule] * len(hits))
+        # Each rule is of one kind, so no (text, rule) pair is found twice
+        rows_array = np.array(rows, dtype=np.intp)
+        rules_array = np.array(rules, dtype=np.intp)
+
+        if self.word_rules:
+            if self._word_arrays is None:
+                self._word_arrays = self._build_word_arrays(np)
+            word_index, rule_counts, rule_starts, word_rule_list = self._word_arrays
+            words, findall = self.word_rules.keys(), _WORDS.findall
+            hit_words = [words & findall(text) for text in unique]
+            hits_per_row = np.fromiter(map(len, hit_words), dtype=np.intp, count=len(hit_words))
+            hit_ids = np.fromiter(map(word_index.__getitem__, chain.from_iterable(hit_words)),
+                                  dtype=np.intp, count=int(hits_per_row.sum()))
+            # One (text, rule) pair per rule of each word hit
+            per_hit = rule_counts[hit_ids]
+            hit_rows = np.repeat(np.arange(len(unique)), hits_per_row)
+            offsets = np.arange(int(per_hit.sum())) - np.repeat(np.cumsum(per_hit) - per_hit, per_hit)
+            rows_array = np.concatenate((rows_array, np.repeat(hit_rows, per_hit)))
+            rules_array = np.concatenate((rules_array, word_rule_list[np.repeat(rule_starts[hit_ids], per_hit) + offsets]))
+
+        width = len(self.categories)
+        cells = rows_array * width + self._rule_category_array[rules_array]
+        counts = np.bincount(cells, minlength=len(unique) * width).reshape(len(unique), width)
+        return counts[np.array(row_of, dtype=np.intp)]
+
+    def _build_word_arrays(self, np):
+        """Word -> index, and per word index its rule count, offset into and the flat list of its rules."""
+        word_index = {word: index for index, word in enumerate(self.word_rules)}
+        rule_counts = np.array([len(rules) for rules in self.word_rules.values()], dtype=np.intp)
+        word_rule_list = np.array(list(chain.from_iterable(self.word_rules.values())), dtype=np.intp)
+        return word_index, rule_counts, np.cumsum(rule_counts) - rule_counts, word_rule_list
+
+
+class RuleSet:
+    """
+    A rule table compiled once, with its version: a digest of the table,
+    reported with every classification and part of the result cache key.
+    Rules that do not compile, or that the linear regex engine rejects,
+    raise ValueError.
+    """
+
+    def __init__(self, rules: Dict[str, List[str]], source: Optional[str] = None,
+                 regex_engine: Optional[str] = None):
+        if not isinstance(rules, dict) or not all(
+                isinstance(category, str) and isinstance(patterns, list) and all(isinstance(p, str) for p in patterns)
+                for category, patterns in rules.items()):
+            raise ValueError("Classifier rules must map category names to lists of patterns.")
+        try:
+            self.compiled = CompiledRules(rules, regex_engine or CLASSIFIER_REGEX_ENGINE)
+        except re.error as exc:
+            raise ValueError(f"Invalid classifier rule {exc.pattern!r}: {exc}") from exc
+        self.rules = rules
+        self.source = source
+        self.version = hashlib.sha256(json.dumps(rules, separators=(",", ":")).encode()).hexdigest()[:12]
+
+
+def load_rule_file(path: str) -> RuleSet:
+    """Reads and compiles the rule table of a .json, .yaml or .yml file; raises ValueError or OSError."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:  # optional: pip install pyyaml
+            raise ValueError("YAML rule files need PyYAML (pip install pyyaml).") from None
+        try:
+            rules = yaml.safe_load(data)
+        except yaml.YAMLError as exc:
+            raise ValueError(f"Invalid YAML in {path}: {exc}") from exc
+    else:
+        try:
+            rules = json.loads(data)
+        except ValueError as exc:
+            raise ValueError(f"Invalid JSON in {path}: {exc}") from exc
+    return RuleSet(rules, source=path)
+
+
+class RuleFile:
+    """
+    The rule set of a rule file, replaced when the file changes.
+
+    `current` never waits for a reload. At most every `check_interval`
+    seconds it compares the file's mtime and size with the loaded version;
+    on a change a background thread loads and compiles the new table while
+    requests keep using the old one, which is then replaced in a single
+    assignment. A file that fails to load keeps the previous rules in use.
+    """
+
+    def __init__(self, path: str, check_interval: float = CLASSIFIER_RULES_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._stamp = self._stat()
+        self._rule_set = load_rule_file(path)
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+        self._loading = False
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> RuleSet:
+        """The rule set in use, after starting a reload if the file has changed."""
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            self.refresh()
+        return self._rule_set
+
+    def refresh(self, wait: bool = False) -> None:
+        """Reloads the file in the background if it has changed since it was loaded; `wait` joins the reload."""
+        stamp = self._stat()
+        with self._lock:
+            if stamp == self._stamp or self._loading:
+                return
+            self._loading = True
+        thread = threading.Thread(target=self._reload, args=(stamp,), name="classifier-rules", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+
+    def _reload(self, stamp: Optional[Tuple[int, int]]) -> None:
+        try:
+            rule_set = load_rule_file(self.path)
+        except (OSError, ValueError) as exc:
+            self.last_error = str(exc)
+            logger.error("Keeping classifier rules %s: cannot reload %s: %s", self._rule_set.version, self.path, exc)
+        else:
+            self._rule_set = rule_set
+            self.reloads += 1
+            self.last_error = None
+            logger.info("Loaded classifier rules %s from %s", rule_set.version, self.path)
+        finally:
+            with self._lock:
+                self._stamp = stamp
+                self._loading = False
+
+
+_rule_file: Optional[RuleFile] = None
+_default_rule_set: Optional[RuleSet] = None
+_rules_lock = threading.Lock()
+
+
+def current_rule_set() -> RuleSet:
+    """The rules of CLASSIFIER_RULES_FILE when it is set (hot-reloaded), otherwise DEFAULT_RULES."""
+    global _rule_file, _default_rule_set
+    rule_file = _rule_file
+    if rule_file is None:
+        with _rules_lock:
+            if CLASSIFIER_RULES_FILE and _rule_file is None:
+                _rule_file = RuleFile(CLASSIFIER_RULES_FILE)
+            if _rule_file is None:
+                if _default_rule_set is None:
+                    _default_rule_set = RuleSet(DEFAULT_RULES)
+                return _default_rule_set
+            rule_file = _rule_file
+    return rule_file.current()
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def current_model():
+    """The NaiveBayesModel of CLASSIFIER_MODEL_PATH, loaded on first use, or None when it is not set."""
+    global _model
+    if _model is None and CLASSIFIER_MODEL_PATH:
+        with _model_lock:
+            if _model is None:
+                from app.naive_bayes import NaiveBayesModel
+                _model = NaiveBayesModel.load(CLASSIFIER_MODEL_PATH)
+    return _model
+
+
+def cache_version() -> Optional[str]:
+    """
+    Version of the rules in use; run_agent adds it to the result cache keys.
+
+    It is called on the event loop, so it never loads the rules: until the
+    first classification has loaded them on a worker thread it is None, and
+    that call is not cached.
+    """
+    if _rule_file is not None:
+        return _rule_file.current().version
+    if not CLASSIFIER_RULES_FILE and _default_rule_set is not None:
+        return _default_rule_set.version
+    return None
+
 
 class ClassifierAgent:
     """
@@ -28,44 +506,58 @@ class ClassifierAgent:
         print(result)
         # Expected output: { "classification": "Greeting/Question", "confidence": 0.85 }  (or similar)
 
+    With `mode="model"` texts are classified by a naive Bayes model trained
+    offline (see `app.naive_bayes`) instead of the rules.
     """
 
-    def __init__(self):
+    def __init__(self, rule_set: Optional[RuleSet] = None, model=None):
         """Word Boundaries:
             The use of \b ensures that only whole words are matched. For instance, r'\bhi\b' matches 'hi' 
             only if it appears as a separate word, not within this 
+
+        Without a `rule_set` the agent uses the current rules (see `current_rule_set`),
+        and without a `model` the one of CLASSIFIER_MODEL_PATH.
         """
-        self.rules = {
-            "Greeting": [r"\bhello\b", r"\bhi\b", "greeting"],
-            "Question": [r"\?$", r"\bwhat\b", r"\bhow\b", r"\bwhy\b", r"\bwhen\b"],
-            "Command": [r"\bdo\b", r"\bexecute\b", r"\brun\b"],
-        }
+        self.rule_set = rule_set if rule_set is not None else current_rule_set()
+        self.model = model
+
+    @property
+    def rules(self) -> Dict[str, List[str]]:
+        return self.rule_set.rules
+
+    @rules.setter
+    def rules(self, rules: Dict[str, List[str]]) -> None:
+        # Assigning a rule table compiles it once; classify never re-reads the patterns
+        self.rule_set = RuleSet(rules)
 
-    def classify(self, input_text: Optional[str] = None) -> Dict[str, Any]:
+    @property
+    def compiled(self) -> CompiledRules:
+        return self.rule_set.compiled
+
+    def classify(self, input_text: Optional[str] = None, mode: str = "rules") -> Dict[str, Any]:
         """
         Classifies the input text.
 
         Args:
             input_text: The text to classify.
+            mode: "rules" or "model".
 
         Returns:
-            A dictionary containing the classification and confidence score.
-            Returns an error message if input_text is invalid.
+            A dictionary containing the classification, confidence score and
+            the version of the rules (or model) used.
+            Returns an error message if input_text or mode is invalid.
         """
 
         if not input_text or not isinstance(input_text, str):
-            return {"error": "INPUT_TEXT is not provided or is not a valid string."}
+            return {"error": INVALID_INPUT}
+        if mode != "rules":
+            return self._predict([input_text], mode)[0]
 
         text = input_text.lower()
+        rule_set = self.rule_set
 
-        # Initialize scores
-        scores = {key: 0 for key in self.rules.keys()}
-
-        # Apply rules: check for each keyword or pattern in the text
-        for category, patterns in self.rules.items():
-            for pattern in patterns:
-                if re.search(pattern, text):
-                    scores[category] += 1
+        # Number of matching keywords or patterns per category, in one pass over the text
+        scores = rule_set.compiled.scores(text)
 
         # Determine the classification based on the highest score
         classification = "Statement"  # Default classification
@@ -76,7 +568,7 @@ class ClassifierAgent:
                 classification = cat
 
         # Combine "Greeting" and "Question" if both have scores
-        if scores["Greeting"] > 0 and scores["Question"] > 0:
+        if scores.get("Greeting", 0) > 0 and scores.get("Question", 0) > 0:
             classification = "Greeting/Question"
 
 
@@ -85,24 +577,94 @@ class ClassifierAgent:
 
         return {
             "classification": classification,
-            "confidence": round(confidence, 2)
+            "confidence": round(confidence, 2),
+            "rules_version": rule_set.version,
         }
 
+    def classify_many(self, input_texts: List[Optional[str]], mode: str = "rules") -> List[Dict[str, Any]]:
+        """
+        Classifies a batch of texts.
+
+        Each text is matched once; the batch is then scored together on a
+        NumPy count matrix (or by the model in one vectorized pass). Every
+        result is exactly what `classify` returns for that text, errors included.
+        """
+        import numpy as np
+
+        results: List[Dict[str, Any]] = [{"error": INVALID_INPUT} for _ in input_texts]
+        valid = [i for i, text in enumerate(input_texts) if text and isinstance(text, str)]
+        if not valid:
+            return results
+        if mode != "rules":
+            for i, result in zip(valid, self._predict([input_texts[i] for i in valid], mode)):
+                results[i] = result
+            return results
+
+        rule_set = self.rule_set
+        categories = rule_set.compiled.categories
+        counts = rule_set.compiled.score_matrix([input_texts[i].lower() for i in valid])
+        if categories:
+            max_scores = counts.max(axis=1)
+            # argmax picks the first category with the top score, like classify's strict comparison
+            labels = np.array(categories + ["Statement"], dtype=object)[
+                np.where(max_scores > 0, counts.argmax(axis=1), len(categories))]
+        else:
+            max_scores = np.zeros(len(valid), dtype=np.intp)
+            labels = np.full(len(valid), "Statement", dtype=object)
+        if "Greeting" in categories and "Question" in categories:
+            both = (counts[:, categories.index("Greeting")] > 0) & (counts[:, categories.index("Question")] > 0)
+            labels[both] = "Greeting/Question"
+
+        # Few distinct top scores, each rounded the way classify rounds it
+        confidences = {score: round(min(score / 3.0, 1.0), 2) for score in np.unique(max_scores).tolist()}
+        for i, label, score in zip(valid, labels.tolist(), max_scores.tolist()):
+            results[i] = {"classification": label, "confidence": confidences[score], "rules_version": rule_set.version}
+        return results
+
+    def _predict(self, texts: List[str], mode: str) -> List[Dict[str, Any]]:
+        """Classifies valid texts with the statistical model, all in one batch."""
+        if mode not in MODES:
+            return [{"error": f"Unknown mode {mode!r}; use one of: {', '.join(MODES)}."} for _ in texts]
+        model = self.model if self.model is not None else current_model()
+        if model is None:
+            return [{"error": NO_MODEL} for _ in texts]
+        labels, probabilities = model.predict(texts)
+        return [{"classification": label, "confidence": round(probability, 2), "model_version": model.version}
+                for label, probability in zip(labels, probabilities.tolist())]
+
+
+def agent_main(context=None):
+    """
+    Classifies `INPUT_TEXT` from the request context (used by the dynamic and
+    batch endpoints), or every text of an `INPUT_TEXTS` list.
+
+    Each call takes the current rule set once, so a reload that lands while
+    it runs does not change the rules halfway through.
+    """
+    agent = ClassifierAgent(current_rule_set())
+    mode = context.get("mode", "rules") if context is not None else "rules"
+    input_texts = context.get("INPUT_TEXTS") if context is not None else None
+    if isinstance(input_texts, list):
+        return agent.classify_many(input_texts, mode)
+    input_text = context.get("INPUT_TEXT") if context is not None else None
+    return agent.classify(input_text, mode)
 
 
 def register_routes(router: APIRouter):
     """Registers the classifier agent's routes with the provided APIRouter."""
 
-    agent = ClassifierAgent()
-
     @router.get("/classifier", summary="Classifies input text", response_model=Dict[str, Any], tags=["Dspy Agents"])
-    async def classifier_route(INPUT_TEXT: Optional[str] = Query(None, description="The text to be classified.  Example: Hello, how are you?")):
+    async def classifier_route(INPUT_TEXT: Optional[str] = Query(None, description="The text to be classified.  Example: Hello, how are you?"),
+                               mode: Literal["rules", "model"] = Query("rules", description="Classify with the rules or the trained model")):
         """
         Classifies the input text.
 
         **Input:**
 
         *   **INPUT_TEXT (optional, string):** The text to be classified. Example Hello, how are you?
+        *   **mode (optional, "rules" or "model"):** `model` classifies with the naive Bayes
+            model of `CLASSIFIER_MODEL_PATH`; its results carry a `model_version` instead of
+            `rules_version`. Defaults to `rules`.
 
         **Process:** An instance of the `ClassifierAgent` is used. The `classify`
         method is called with the `INPUT_TEXT`.
@@ -116,9 +678,12 @@ def register_routes(router: APIRouter):
         ```json
         {
           "classification": "Greeting/Question",
-          "confidence": 0.67
+          "confidence": 0.67,
+          "rules_version": "1d78ce238e78"
         }
         ```
+        `rules_version` identifies the rule table used, which is reloaded when
+        the file named by `CLASSIFIER_RULES_FILE` changes.
         **Example Output (if no input is provided):**
 
         ```json
@@ -127,5 +692,46 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        result = agent.classify(INPUT_TEXT)
-        return result
\ No newline at end of file
+        # Dispatched through run_agent so repeated texts are served from the result cache
+        result = await run_agent(sys.modules[__name__], AgentContext({"INPUT_TEXT": INPUT_TEXT, "mode": mode}))
+        return result
+
+    @router.post("/classifier/batch", summary="Classifies a batch of texts", response_model=Dict[str, Any], tags=["Dspy Agents"])
+    async def classifier_batch_route(INPUT_TEXTS: List[str] = Body(..., embed=True, examples=[["Hello, how are you?", "Run the tests"]]),
+                                     mode: Literal["rules", "model"] = Body("rules", embed=True)):
+        """
+        Classifies many texts in one request.
+
+        **Input (JSON body):**
+
+        *   **INPUT_TEXTS (required, list of strings):** The texts to be classified, at most 10,000.
+        *   **mode (optional, "rules" or "model"):** As for `/classifier`. Defaults to `rules`.
+
+        **Process:** The texts are matched against the compiled rules and scored together with NumPy,
+        or classified by the model in one vectorized pass.
+        Each result is the same as `/classifier?INPUT_TEXT=...` returns for that text.
+
+        **Example Input:**
+
+        ```json
+        {"INPUT_TEXTS": ["Hello, how are you?", "Run the tests", ""]}
+        ```
+
+        **Example Output:**
+
+        ```json
+        {
+          "results": [
+            {"classification": "Greeting/Question", "confidence": 0.67, "rules_version": "1d78ce238e78"},
+            {"classification": "Command", "confidence": 0.33, "rules_version": "1d78ce238e78"},
+            {"error": "INPUT_TEXT is not provided or is not a valid string."}
+          ]
+        }
+        ```
+        """
+        if len(INPUT_TEXTS) > MAX_BATCH_TEXTS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_TEXTS} texts per batch.")
+        # Not through run_agent: a whole batch is too large a result cache entry to be worth keeping,
+        # and keying it would serialize every text on the event loop
+        results = await run_in_thread(agent_main, AgentContext({"INPUT_TEXTS": INPUT_TEXTS, "mode": mode}))
+        return {"results": results}
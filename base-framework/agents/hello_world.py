@@ -1,2 +1,8 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns a simple hello world message."}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
 def agent_main():
     return "Welcome to the Agent Base Framework! (https://github.com/bar181/fastapi-agents)"
\ No newline at end of file
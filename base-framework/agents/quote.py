@@ -1,6 +1,9 @@
 # agents/quote.py
 import random
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns an inspirational quote."}
+
 # Collection of inspirational quotes
 QUOTES = [
     "Believe in yourself and all that you are.",
@@ -2,23 +2,45 @@
 from fastapi import FastAPI, HTTPException, Request, APIRouter
 from fastapi.responses import JSONResponse, Response
 from typing import Optional, List, Dict, Any
-import os
-from agents.dspy_integration import load_agent, run_agent
+from agents.dspy_integration import AgentContext, AgentRegistry, AgentTimeoutError, RequestDeadlineMiddleware, result_cache_stats, run_agent, run_batch
+from app.models import BatchRequest
 from agents.classifier import register_routes as register_classifier_routes
 from agents.quote import register_routes as register_quote_routes            # NEW
 
 app = FastAPI(title="FastAPI Agent System - Basic Framework - github.com/bar181")
 
+# Agents that run past their deadline answer with a structured 504
+app.add_middleware(RequestDeadlineMiddleware)
+
+@app.exception_handler(AgentTimeoutError)
+async def agent_timeout_handler(request: Request, exc: AgentTimeoutError):
+    return JSONResponse(status_code=504, content={"agent": exc.agent, "error": "timeout", "detail": str(exc)})
+
 # --- Agent Information ---
-AGENTS_INFO: List[Dict[str, str]] = [
-    {"name": "hello_world", "description": "Returns a simple hello world message."},   
-    {"name": "quote", "description": "Returns an inspirational quote."},
-    {"name": "classifier", "description": "Classifies input text using rule-based logic."},
-]
+# Agents are discovered once at startup; /agents is generated from the registry.
+registry = AgentRegistry()
 
 @app.get("/agents", tags=["All Agents"])
 async def list_all_agents() -> Dict[str, List[Dict[str, str]]]:
-    return {"agents": AGENTS_INFO}
+    return {"agents": registry.describe()}
+
+@app.post("/agents/batch", tags=["All Agents"])
+async def run_agents_batch(batch: BatchRequest) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs several agents concurrently, e.g. classifier, textrank_summarizer and quote for the same item.
+
+    Results come back in request order with a per-item status ("ok", "not_found",
+    "timeout" or "error") and elapsed_ms.
+    """
+    items = [(item.agent, item.params) for item in batch.items]
+    return {"results": await run_batch(registry, items, batch.concurrency)}
+
+@app.get("/agents/cache/stats", tags=["All Agents"])
+async def agent_cache_stats() -> Dict[str, Any]:
+    """
+    Counters of the agent result cache (agents that declare CACHE_TTL), for sizing AGENT_RESULT_CACHE_BYTES.
+    """
+    return result_cache_stats()
 
 # --- Agent Router ---
 agent_router = APIRouter(prefix="/agent")
@@ -33,24 +55,17 @@ app.include_router(agent_router)
 # dymanic agent generation using dspy
 @app.get("/agent/{agent_name}", tags=["Dynamic Agents"]) 
 async def execute_agent(agent_name: str, request: Request):
-    agent_file = os.path.join("agents", f"{agent_name}.py")
-    if not os.path.exists(agent_file):
+    agent_module = registry.get(agent_name)
+    if agent_module is None:
         raise HTTPException(status_code=404, detail="Agent not found.")
 
     try:
-        agent_module = load_agent(agent_file)
-
-        if hasattr(agent_module, 'TOKEN') and 'token' in request.query_params:
-            agent_module.TOKEN = request.query_params['token']
-        if hasattr(agent_module, 'EXPRESSION') and 'expression' in request.query_params:
-            agent_module.EXPRESSION = request.query_params['expression']
-        if hasattr(agent_module, 'INPUT_TEXT') and 'INPUT_TEXT' in request.query_params:
-            agent_module.INPUT_TEXT = request.query_params['INPUT_TEXT']
-        if hasattr(agent_module, 'TEXT_TO_SUMMARIZE') and 'TEXT_TO_SUMMARIZE' in request.query_params:
-            agent_module.TEXT_TO_SUMMARIZE = request.query_params['TEXT_TO_SUMMARIZE']
-
-        output = run_agent(agent_module)
+        # Query parameters are handed to the agent as its per-request context
+        context = AgentContext(dict(request.query_params))
+        output = await run_agent(agent_module, context)
         return {"agent": agent_name, "result": output}
+    except AgentTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing agent: {str(e)}")
 
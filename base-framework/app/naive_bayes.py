@@ -0,0 +1,177 @@
+"""
+Naive Bayes text model
+----------------------
+Multinomial naive Bayes over hashed word and word-pair counts, trained
+offline and served by the classifier's `mode=model`.
+
+Train it from a labeled CSV file (with a `text,label` header) or a JSON
+Lines file of {"text": ..., "label": ...} objects:
+
+    python -m app.naive_bayes labeled.csv models/classifier
+
+A model is a directory holding `weights.npy`, a float32 matrix of
+log P(feature | label) with one row per hashed feature, and `model.json`
+with the labels, their log priors and the hashing settings. The weights are
+memory-mapped when the model loads, so loading takes no time and worker
+processes share one copy through the page cache. NumPy is imported on first
+use, as in the classifier, so importing this module stays cheap.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import zlib
+from itertools import chain
+from typing import Iterable, List, Sequence, Tuple
+
+WEIGHTS_FILE = "weights.npy"
+META_FILE = "model.json"
+
+# Hashed feature space; a power of two. 2**18 features x 4 bytes per label.
+DEFAULT_FEATURES = 2 ** 18
+
+_WORDS = re.compile(r"\w+")
+
+
+def features(text: str, n_features: int) -> List[int]:
+    """Hashed ids of the lower-cased words of `text` and of its adjacent word pairs, repeats included."""
+    words = _WORDS.findall(text.lower())
+    mask = n_features - 1
+    ids = [zlib.crc32(word.encode()) & mask for word in words]
+    ids.extend(zlib.crc32(f"{first} {second}".encode()) & mask for first, second in zip(words, words[1:]))
+    return ids
+
+
+def _batch_features(texts: Sequence[str], n_features: int):
+    """Feature ids of all texts concatenated, and the number of ids per text, as NumPy arrays."""
+    import numpy as np
+
+    per_text = [features(text, n_features) for text in texts]
+    lengths = np.fromiter(map(len, per_text), dtype=np.intp, count=len(per_text))
+    ids = np.fromiter(chain.from_iterable(per_text), dtype=np.intp, count=int(lengths.sum()))
+    return ids, lengths
+
+
+class NaiveBayesModel:
+    """A trained model: labels, their log priors and the (features x labels) log-likelihood matrix."""
+
+    def __init__(self, labels: List[str], log_priors, weights, version: str):
+        n_features = weights.shape[0]
+        if n_features & (n_features - 1) or weights.shape != (n_features, len(labels)) or len(log_priors) != len(labels):
+            raise ValueError("Inconsistent naive Bayes model: weights, labels and priors do not match.")
+        self.labels = labels
+        self.log_priors = log_priors
+        self.weights = weights
+        self.n_features = n_features
+        self.version = version
+
+    def log_scores(self, texts: Sequence[str]):
+        """(texts x labels) NumPy matrix of unnormalized log posteriors, for the whole batch at once."""
+        import numpy as np
+
+        ids, lengths = _batch_features(texts, self.n_features)
+        scores = np.tile(self.log_priors.astype(np.float64), (len(texts), 1))
+        if ids.size:
+            # The ids of each text are consecutive, so one reduceat sums each text's weight rows
+            nonempty = lengths > 0
+            starts = (np.cumsum(lengths) - lengths)[nonempty]
+            scores[nonempty] += np.add.reduceat(self.weights[ids], starts, axis=0)
+        return scores
+
+    def predict(self, texts: Sequence[str]):
+        """The most probable label of each text, and an array of their posterior probabilities."""
+        import numpy as np
+
+        scores = self.log_scores(texts)
+        best = scores.argmax(axis=1)
+        shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+        probabilities = 1.0 / shifted.sum(axis=1)
+        labels = [self.labels[index] for index in best.tolist()]
+        return labels, probabilities
+
+    def save(self, path: str) -> None:
+        import numpy as np
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, WEIGHTS_FILE), np.ascontiguousarray(self.weights, dtype=np.float32))
+        meta = {
+            "labels": self.labels,
+            "log_priors": self.log_priors.tolist(),
+            "n_features": self.n_features,
+            "version": self.version,
+        }
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "NaiveBayesModel":
+        """Loads a saved model; the weights stay on disk, memory-mapped, unless `mmap` is False."""
+        import numpy as np
+
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        weights = np.load(os.path.join(path, WEIGHTS_FILE), mmap_mode="r" if mmap else None)
+        if weights.shape[0] != meta["n_features"]:
+            raise ValueError(f"{path}: {WEIGHTS_FILE} does not match {META_FILE}.")
+        return cls(meta["labels"], np.array(meta["log_priors"]), weights, meta["version"])
+
+
+def train(texts: Sequence[str], labels: Sequence[str], n_features: int = DEFAULT_FEATURES,
+          alpha: float = 1.0) -> NaiveBayesModel:
+    """Fits a model with additive (Laplace) smoothing `alpha`."""
+    import numpy as np
+
+    if n_features <= 0 or n_features & (n_features - 1):
+        raise ValueError("n_features must be a power of two.")
+    if not texts or len(texts) != len(labels):
+        raise ValueError("Training needs one label per text, and at least one text.")
+    names = sorted(set(labels))
+    label_index = {name: index for index, name in enumerate(names)}
+    y = np.array([label_index[label] for label in labels], dtype=np.intp)
+
+    ids, lengths = _batch_features(texts, n_features)
+    counts = np.bincount(ids * len(names) + np.repeat(y, lengths), minlength=n_features * len(names))
+    counts = counts.reshape(n_features, len(names)).astype(np.float64)
+    weights = np.log((counts + alpha) / (counts.sum(axis=0) + alpha * n_features)).astype(np.float32)
+    log_priors = np.log(np.bincount(y, minlength=len(names)) / len(y))
+
+    digest = hashlib.sha256(json.dumps(names).encode() + log_priors.tobytes() + weights.tobytes())
+    return NaiveBayesModel(names, log_priors, weights, digest.hexdigest()[:12])
+
+
+def read_labeled(path: str) -> Tuple[List[str], List[str]]:
+    """Texts and labels of a CSV (text,label header) or JSON Lines (.jsonl) file."""
+    texts: List[str] = []
+    labels: List[str] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows: Iterable[dict] = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, row in enumerate(rows, 1):
+            text, label = row.get("text"), row.get("label")
+            if not isinstance(text, str) or not isinstance(label, str) or not label:
+                raise ValueError(f"{path}: record {number} needs a text and a label.")
+            texts.append(text)
+            labels.append(label)
+    return texts, labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the classifier's naive Bayes model from a labeled file.")
+    parser.add_argument("labeled", help="CSV file with a text,label header, or a .jsonl file")
+    parser.add_argument("output", help="model directory to write (weights.npy and model.json)")
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES, help="hashed features, a power of two")
+    parser.add_argument("--alpha", type=float, default=1.0, help="additive smoothing")
+    args = parser.parse_args(argv)
+
+    texts, labels = read_labeled(args.labeled)
+    model = train(texts, labels, n_features=args.features, alpha=args.alpha)
+    model.save(args.output)
+    print(f"Trained on {len(texts)} texts, {len(model.labels)} labels; model {model.version} written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
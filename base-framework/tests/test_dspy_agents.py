@@ -39,3 +39,155 @@ def test_classifier_agent_statement():
     assert result["classification"] == "Statement"
     assert isinstance(result["confidence"], float)
 
+def test_compiled_classifier_rules_match_per_rule_search():
+    """The single-pass matcher counts exactly the rules a separate re.search per rule would."""
+    import random
+    import re
+    from agents.classifier import CompiledRules
+    rules = {
+        "Keywords": [r"\bhello\b", "hell", r"\bon", r"on\b", "lo w", r"\bc\+\+", r"\.\.\."],
+        "Regex": [r"\?$", r"\bwh\w+\b", r"(a|b)c", r"^\d+", r"x{2,}", r"(\w)\1", r"(?i)HELLO", r"\bdé\w*"],
+        "Upper": ["Hello", r"\bHI\b"],
+        "Shared": [r"\bhello\b", r"\bhi\b"],
+    }
+    # A few keywords are searched for directly, many go through the automaton
+    many = dict(rules, Many=[f"{i}-" for i in range(20)])
+    alphabet = ["hello", "hell", "on", "lo", " ", "w", "c++", "...", "?", "wh", "at", "bc", "xx", "12", "dé", "jà", "_", "-", "\n", "3-"]
+    for table in (rules, many):
+        compiled = CompiledRules(table)
+        rng = random.Random(7)
+        texts = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(300)]
+        matrix = compiled.score_matrix(texts)
+        for text, counts in zip(texts, matrix.tolist()):
+            expected = {category: sum(1 for p in patterns if re.search(p, text)) for category, patterns in table.items()}
+            assert compiled.scores(text) == expected, text
+            assert counts == list(expected.values()), text
+
+def test_linear_regex_engine_scores_like_re_and_rejects_backtracking_rules():
+    """The linear engine gives the same scores as re, and rules that need backtracking fail to load."""
+    import pytest
+    from agents.classifier import CompiledRules, RuleSet
+    rules = {
+        "Question": [r"\?$", r"\bwh\w+\b", r"^(how|can) "],
+        "Number": [r"\d+(\.\d+)?", r"\b\d{4}\b"],
+        "Greeting": [r"\bhello\b", "greeting"],
+    }
+    engines = CompiledRules(rules, "re"), CompiledRules(rules, "linear")
+    for text in ["how are you?", "what is 3.14", "greeting in 2024", "can do", "", "why\n"]:
+        assert engines[0].scores(text) == engines[1].scores(text), text
+    with pytest.raises(ValueError, match="backreference"):
+        RuleSet({"Repeat": [r"(\w)\1"]}, regex_engine="linear")
+    assert RuleSet({"Repeat": [r"(\w)\1"]}, regex_engine="re").compiled.scores("hello") == {"Repeat": 1}
+
+def test_classifier_rules_are_recompiled_on_assignment():
+    """Assigning a new rule table takes effect on the next classification."""
+    from agents.classifier import ClassifierAgent
+    agent = ClassifierAgent()
+    assert agent.classify("please deploy now")["classification"] == "Statement"
+    default_version = agent.rule_set.version
+    agent.rules = {"Command": [r"\bdeploy\b"]}
+    assert agent.classify("please deploy now") == {
+        "classification": "Command", "confidence": 0.33, "rules_version": agent.rule_set.version}
+    assert agent.rule_set.version != default_version
+
+def test_classify_many_matches_classify():
+    """Batch results are exactly the per-text results, invalid items included."""
+    from agents.classifier import ClassifierAgent
+    agent = ClassifierAgent()
+    texts = ["Hello, how are you?", "Run the tests", "", None, 42, "Hi! Greetings", "This is a statement.", "Run the tests",
+             "why why why do it?", "hello hi greeting"]
+    assert agent.classify_many(texts) == [agent.classify(text) for text in texts]
+    assert agent.classify_many([]) == []
+
+def test_classifier_batch_route(monkeypatch):
+    """POST /agent/classifier/batch classifies every text and limits the batch size."""
+    import agents.classifier as classifier
+    from agents.dspy_integration import clear_result_cache, result_cache_stats
+    clear_result_cache()
+    version = classifier.current_rule_set().version
+    response = client.post("/agent/classifier/batch", json={"INPUT_TEXTS": ["Hello, how are you?", "Run the tests", ""]})
+    assert result_cache_stats()["entries"] == 0
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"classification": "Greeting/Question", "confidence": 0.67, "rules_version": version},
+        {"classification": "Command", "confidence": 0.33, "rules_version": version},
+        {"error": "INPUT_TEXT is not provided or is not a valid string."},
+    ]}
+    assert client.post("/agent/classifier/batch", json={}).status_code == 422
+    monkeypatch.setattr(classifier, "MAX_BATCH_TEXTS", 2)
+    assert client.post("/agent/classifier/batch", json={"INPUT_TEXTS": ["a", "b", "c"]}).status_code == 413
+
+def test_classifier_rule_file_is_hot_reloaded(tmp_path, monkeypatch):
+    """Rules come from a file and are swapped, with a new version, when it changes, without holding up requests."""
+    import threading
+    import time
+    import pytest
+    import agents.classifier as classifier
+    path = tmp_path / "rules.json"
+    path.write_text('{"Command": ["\\\\bdeploy\\\\b"]}')
+    rule_file = classifier.RuleFile(str(path), check_interval=0)
+    monkeypatch.setattr(classifier, "_rule_file", rule_file)
+    first = client.get("/agent/classifier?INPUT_TEXT=deploy%20it%20now").json()
+    assert first == {"classification": "Command", "confidence": 0.33, "rules_version": rule_file.current().version}
+
+    # Requests keep getting the old rules while the new file is loading
+    release = threading.Event()
+    load = classifier.load_rule_file
+    monkeypatch.setattr(classifier, "load_rule_file", lambda p: release.wait(5) and load(p))
+    path.write_text('{"Deploy": ["deploy", "\\\\bnow\\\\b"]}')
+    assert client.get("/agent/classifier?INPUT_TEXT=deploy%20it%20now").json() == first
+    release.set()
+    deadline = time.monotonic() + 5
+    while rule_file.reloads == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The same request is not answered from the result cache of the old rules
+    second = client.get("/agent/classifier?INPUT_TEXT=deploy%20it%20now").json()
+    assert second == {"classification": "Deploy", "confidence": 0.67, "rules_version": rule_file.current().version}
+    assert second["rules_version"] != first["rules_version"]
+
+    # A broken file leaves the loaded rules in place
+    path.write_text('{"Deploy": ["(unclosed"]}')
+    rule_file.refresh(wait=True)
+    assert rule_file.current().version == second["rules_version"]
+    assert "(unclosed" in rule_file.last_error
+
+    pytest.importorskip("yaml")
+    yaml_path = tmp_path / "rules.yaml"
+    yaml_path.write_text("Greeting:\n  - '\\bhey\\b'\n")
+    assert classifier.load_rule_file(str(yaml_path)).rules == {"Greeting": [r"\bhey\b"]}
+
+def test_classifier_rule_file_is_first_loaded_off_the_event_loop(tmp_path, monkeypatch):
+    """The cache key never loads the rules; the first classification does, on an agent thread."""
+    import threading
+    import agents.classifier as classifier
+    path = tmp_path / "rules.json"
+    path.write_text('{"Command": ["deploy"]}')
+    monkeypatch.setattr(classifier, "CLASSIFIER_RULES_FILE", str(path))
+    monkeypatch.setattr(classifier, "_rule_file", None)
+    loads = []
+    load = classifier.load_rule_file
+    monkeypatch.setattr(classifier, "load_rule_file", lambda p: loads.append(threading.current_thread().name) or load(p))
+    assert classifier.cache_version() is None and loads == []
+    result = client.get("/agent/classifier?INPUT_TEXT=deploy%20first").json()
+    assert loads and loads[0].startswith("agent")
+    assert result["rules_version"] == classifier.cache_version()
+
+def test_classifier_model_mode(tmp_path, monkeypatch):
+    """mode=model classifies with the model of CLASSIFIER_MODEL_PATH, and says so when there is none"""
+    import agents.classifier as classifier
+    from app.naive_bayes import train
+    monkeypatch.setattr(classifier, "_model", None)
+    monkeypatch.setattr(classifier, "CLASSIFIER_MODEL_PATH", "")
+    assert client.get("/agent/classifier?INPUT_TEXT=refund%20please&mode=model").json() == {"error": classifier.NO_MODEL}
+
+    model = train(["please refund my order", "refund the payment", "the app crashes", "login page crashes"],
+                  ["Billing", "Billing", "Bug", "Bug"], n_features=1024)
+    model.save(str(tmp_path / "model"))
+    monkeypatch.setattr(classifier, "CLASSIFIER_MODEL_PATH", str(tmp_path / "model"))
+    result = client.get("/agent/classifier?INPUT_TEXT=my%20refund&mode=model").json()
+    assert result["classification"] == "Billing" and result["model_version"] == model.version
+    assert 0.5 < result["confidence"] <= 1
+    response = client.post("/agent/classifier/batch", json={"INPUT_TEXTS": ["my refund", "it crashes", ""], "mode": "model"})
+    assert [r.get("classification") for r in response.json()["results"]] == ["Billing", "Bug", None]
+    assert response.json()["results"][0] == result
+    assert client.get("/agent/classifier?INPUT_TEXT=hi&mode=other").status_code == 422
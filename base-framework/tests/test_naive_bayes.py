@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.naive_bayes import NaiveBayesModel, main, read_labeled, train
+
+TEXTS = ["please refund my order", "refund the payment twice", "charged twice for my order",
+         "the app crashes on login", "login page crashes", "error when the page loads"]
+LABELS = ["Billing", "Billing", "Billing", "Bug", "Bug", "Bug"]
+
+def test_naive_bayes_round_trips_through_a_memory_mapped_model(tmp_path):
+    """A saved model loads memory-mapped and predicts exactly like the trained one"""
+    model = train(TEXTS, LABELS, n_features=1024)
+    model.save(str(tmp_path))
+    loaded = NaiveBayesModel.load(str(tmp_path))
+    assert isinstance(loaded.weights, np.memmap)
+    assert (loaded.labels, loaded.version) == (["Billing", "Bug"], model.version)
+    labels, probabilities = loaded.predict(["refund my payment", "the login crashes"])
+    assert labels == ["Billing", "Bug"]
+    assert np.allclose(probabilities, model.predict(["refund my payment", "the login crashes"])[1])
+    assert all(0.5 < p <= 1 for p in probabilities)
+
+def test_naive_bayes_batch_predict_matches_single_texts():
+    """Scoring a batch at once, empty texts included, gives the scores of one text at a time"""
+    model = train(TEXTS, LABELS, n_features=256)
+    texts = ["refund", "", "crashes when charged", "???", "order page error"]
+    batch = model.log_scores(texts)
+    for row, text in zip(batch, texts):
+        assert np.allclose(row, model.log_scores([text])[0])
+    assert np.allclose(batch[1], model.log_priors)
+
+def test_naive_bayes_cli_trains_from_csv_and_jsonl(tmp_path, capsys):
+    """The training command reads CSV and JSON Lines files and rejects unlabeled records"""
+    csv_path = tmp_path / "labeled.csv"
+    csv_path.write_text("text,label\n" + "".join(f'"{t}",{l}\n' for t, l in zip(TEXTS, LABELS)))
+    jsonl_path = tmp_path / "labeled.jsonl"
+    jsonl_path.write_text("".join(json.dumps({"text": t, "label": l}) + "\n" for t, l in zip(TEXTS, LABELS)))
+    assert read_labeled(str(csv_path)) == read_labeled(str(jsonl_path)) == (TEXTS, LABELS)
+
+    main([str(jsonl_path), str(tmp_path / "model"), "--features", "512"])
+    assert "Trained on 6 texts, 2 labels" in capsys.readouterr().out
+    assert NaiveBayesModel.load(str(tmp_path / "model")).n_features == 512
+
+    jsonl_path.write_text('{"text": "no label"}\n')
+    with pytest.raises(ValueError, match="record 1"):
+        read_labeled(str(jsonl_path))
+    with pytest.raises(ValueError, match="power of two"):
+        train(TEXTS, LABELS, n_features=1000)
@@ -1,17 +1,846 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
 import importlib.util
+import itertools
+import inspect
+import json
+import logging
+import multiprocessing
 import os
+import pickle
+import signal
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 
-def load_agent(agent_filename: str):
-    """Dynamically load an agent module from a given filename."""
+logger = logging.getLogger(__name__)
+
+# Synchronous agents run on a bounded thread pool so they never block the event
+# loop. Set AGENT_THREAD_POOL_SIZE=0 to run them inline (useful when debugging).
+AGENT_THREAD_POOL_SIZE = int(os.environ.get("AGENT_THREAD_POOL_SIZE", min(32, (os.cpu_count() or 1) + 4)))
+_THREAD_POOL: Optional[ThreadPoolExecutor] = None
+
+# CPU-bound agents that declare EXECUTOR = "process" run in a pool of worker
+# processes instead, so they are not serialized by the GIL. Set
+# AGENT_PROCESS_POOL_SIZE=0 to run them on the thread pool like other agents.
+AGENT_PROCESS_POOL_SIZE = int(os.environ.get("AGENT_PROCESS_POOL_SIZE", os.cpu_count() or 1))
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_PROCESS_POOL_LOCK = threading.Lock()
+_PROCESS_POOL_FILES: List[str] = []
+_TASK_IDS = itertools.count()
+
+# Default time budget in seconds for one agent call; agents override it with a
+# module-level TIMEOUT. 0 disables the default limit.
+AGENT_TIMEOUT = float(os.environ.get("AGENT_TIMEOUT", 30))
+
+# Most agent invocations of one POST /agents/batch request that run at the same time.
+AGENT_BATCH_CONCURRENCY = int(os.environ.get("AGENT_BATCH_CONCURRENCY", 8))
+
+# Byte budget of the agent result cache. Agents that declare a module-level
+# CACHE_TTL (seconds) have their results cached by name, source version and
+# parameters. 0 disables the cache.
+AGENT_RESULT_CACHE_BYTES = int(os.environ.get("AGENT_RESULT_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Absolute deadline (Unix time) of the current HTTP request, from X-Request-Deadline.
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+# Loaded agent modules keyed by absolute path. Each entry records the file's
+# mtime/size and a digest of its source so unchanged files are never re-run.
+_MODULE_CACHE: Dict[str, "_CachedModule"] = {}
+_CACHE_LOCK = threading.RLock()
+
+
+class _CachedModule:
+    __slots__ = ("mtime_ns", "size", "digest", "module")
+
+    def __init__(self, mtime_ns: int, size: int, digest: str, module):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.module = module
+
+
+def _exec_agent(agent_filename: str, source: Optional[bytes] = None):
     module_name = os.path.splitext(os.path.basename(agent_filename))[0]
     spec = importlib.util.spec_from_file_location(module_name, agent_filename)
     module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+    if source is None:
+        spec.loader.exec_module(module)
+    else:
+        code = compile(source, agent_filename, "exec", dont_inherit=True)
+        exec(code, module.__dict__)
     return module
 
-def run_agent(agent_module):
-    """Run the agent's main function (agent_main) and return its output."""
-    if hasattr(agent_module, "agent_main"):
-        return agent_module.agent_main()
+
+def load_agent(agent_filename: str, use_cache: bool = True):
+    """
+    Dynamically load an agent module from a given filename.
+
+    Modules are cached by path and revalidated against the file's mtime and
+    size on every call; the file is only re-read when those change, and only
+    re-executed when its contents actually differ. Pass ``use_cache=False`` to
+    always execute the file from scratch.
+    """
+    if not use_cache:
+        return _exec_agent(agent_filename)
+
+    with _CACHE_LOCK:
+        return _cached_entry(agent_filename).module
+
+
+def _cached_entry(agent_filename: str) -> _CachedModule:
+    """Return the up-to-date cache entry for a file. Must be called with _CACHE_LOCK held."""
+    path = os.path.abspath(agent_filename)
+    stat = os.stat(path)
+    entry = _MODULE_CACHE.get(path)
+    if entry is None or (entry.mtime_ns, entry.size) != (stat.st_mtime_ns, stat.st_size):
+        with open(path, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        if entry is not None and entry.digest == digest:
+            entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+        else:
+            module = _exec_agent(path, source)
+            entry = _CachedModule(stat.st_mtime_ns, stat.st_size, digest, module)
+            _MODULE_CACHE[path] = entry
+    return entry
+
+
+def invalidate_agent_cache(agent_filename: Optional[str] = None) -> None:
+    """Drop one cached agent module, or every cached module if no filename is given."""
+    with _CACHE_LOCK:
+        if agent_filename is None:
+            _MODULE_CACHE.clear()
+        else:
+            _MODULE_CACHE.pop(os.path.abspath(agent_filename), None)
+
+
+class AgentRegistry:
+    """
+    Index of the agents available in an agents folder.
+
+    The folder is scanned once when the registry is created; every module that
+    defines `agent_main` or `register_routes` is loaded and kept by name, so
+    request handlers resolve agents with a dictionary lookup instead of
+    touching the filesystem. Call `scan()` again to pick up new files.
+
+    Agents describe themselves for `/agents` through an optional module-level
+    `AGENT_INFO` dict; the first docstring line is used as a fallback description.
+
+    Given a `manifest` (the output of `manifest()` saved at build time), the
+    registry is built from it instead: no agent is imported at startup and
+    each module is loaded on its first `get()`.
+    """
+
+    def __init__(self, agents_dir: Optional[str] = None, manifest: Optional[List[Dict[str, Any]]] = None):
+        self.agents_dir = agents_dir or os.path.dirname(os.path.abspath(__file__))
+        self._manifest = manifest
+        self._agents: Dict[str, Optional[_CachedModule]] = {}
+        self.scan()
+
+    def scan(self) -> None:
+        """(Re)load every agent module found in the agents folder."""
+        agents: Dict[str, Optional[_CachedModule]] = {}
+        if self._manifest is not None:
+            for item in self._manifest:
+                if os.path.exists(self._path(item["name"])):
+                    agents[item["name"]] = self._agents.get(item["name"])
+            self._agents = agents
+            return
+        skip = os.path.basename(__file__)
+        for filename in sorted(os.listdir(self.agents_dir)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".py" or name.startswith("_") or filename == skip:
+                continue
+            try:
+                with _CACHE_LOCK:
+                    entry = _cached_entry(os.path.join(self.agents_dir, filename))
+            except Exception:
+                logger.exception("Failed to load agent '%s'", name)
+                continue
+            if hasattr(entry.module, "agent_main") or hasattr(entry.module, "register_routes"):
+                agents[name] = entry
+        self._agents = agents
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.agents_dir, f"{name}.py")
+
+    def get(self, name: str):
+        """Return the named agent module, or None if unknown."""
+        if name not in self._agents:
+            return None
+        entry = self._agents[name]
+        if entry is None:
+            with _CACHE_LOCK:
+                entry = self._agents[name] = _cached_entry(self._path(name))
+        return entry.module
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._agents
+
+    def names(self) -> List[str]:
+        return list(self._agents)
+
+    def manifest(self) -> List[Dict[str, Any]]:
+        """Name, `/agents` info and executor of every agent, as consumed by `AgentRegistry(manifest=...)`."""
+        if self._manifest is not None:
+            return [item for item in self._manifest if item["name"] in self._agents]
+        return [
+            {"name": name, "info": _describe_module(entry.module), "executor": _executor(entry.module)}
+            for name, entry in self._agents.items()
+        ]
+
+    def process_agent_files(self) -> List[str]:
+        """Paths of the agents that declare `EXECUTOR = "process"`, for pre-warming workers."""
+        return [self._path(item["name"]) for item in self.manifest() if item["executor"] == "process"]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Agent listing for the `/agents` endpoint."""
+        return [{"name": item["name"], **item["info"]} for item in self.manifest()]
+
+
+def _describe_module(module) -> Dict[str, Any]:
+    info = dict(getattr(module, "AGENT_INFO", None) or {})
+    if "description" not in info:
+        doc = module.__doc__ or getattr(getattr(module, "agent_main", None), "__doc__", None) or ""
+        lines = [line.strip() for line in doc.strip().splitlines() if line.strip()]
+        info["description"] = lines[0] if lines else ""
+    return info
+
+
+class AgentTimeoutError(TimeoutError):
+    """Raised when an agent does not finish within its time budget."""
+
+    def __init__(self, agent: Optional[str] = None, timeout: Optional[float] = None):
+        super().__init__(agent, timeout)
+        self.agent = agent
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        if self.timeout is None:
+            return f"Agent '{self.agent}' exceeded its deadline."
+        return f"Agent '{self.agent}' did not finish within {self.timeout:.3g}s."
+
+
+class AgentContext:
+    """
+    Per-request inputs for a single agent invocation.
+
+    `params` holds the request parameters (query string or JSON body) and
+    `resources` holds shared objects supplied by the app, such as the MCP
+    adapter. Agents receive it as the argument of `agent_main(context)`
+    instead of reading module globals, so one loaded module can serve
+    concurrent requests.
+
+    `deadline` is the absolute time (Unix seconds) by which the call must
+    finish; `run_agent` fills it in. Long-running agents can call
+    `check_deadline()` between steps to stop early.
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None, deadline: Optional[float] = None, **resources: Any):
+        self.params = dict(params or {})
+        self.deadline = deadline
+        self.resources = resources
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.params.get(name, default)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if the call is unbounded."""
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def check_deadline(self) -> None:
+        """Raise AgentTimeoutError once the deadline has passed."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise AgentTimeoutError()
+
+
+_MISSING = object()
+_LEGACY_LOCKS: Dict[str, threading.Lock] = {}
+
+# Globals a legacy agent may receive from request params when it does not list
+# its own in a module-level INPUTS tuple
+LEGACY_INPUTS = ("TOKEN", "EXPRESSION", "INPUT_TEXT", "TEXT_TO_SUMMARIZE", "HYPOTHESIS")
+
+
+@functools.lru_cache(maxsize=256)
+def _accepts_context(agent_main) -> bool:
+    try:
+        parameters = inspect.signature(agent_main).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD, p.VAR_POSITIONAL) for p in parameters)
+
+
+def _run_legacy(agent_module, context: AgentContext):
+    """
+    Compatibility shim for agents whose `agent_main()` takes no arguments.
+
+    Request parameters are written to the matching upper-case module globals
+    (`token` -> `TOKEN`) and resources under their own name, the agent runs,
+    and the previous values are put back. A per-module lock keeps concurrent
+    invocations from seeing each other's inputs.
+
+    Only the globals the module lists in `INPUTS` (default LEGACY_INPUTS) are
+    inputs, so a param such as `quotes` cannot replace the data an agent
+    relies on, like its QUOTES list.
+    """
+    inputs = getattr(agent_module, "INPUTS", LEGACY_INPUTS)
+    overrides = {}
+    for key, value in context.params.items():
+        name = key.upper()
+        if name in inputs and hasattr(agent_module, name):
+            overrides[name] = value
+    overrides.update(context.resources)
+
+    path = getattr(agent_module, "__file__", None) or agent_module.__name__
+    with _CACHE_LOCK:
+        lock = _LEGACY_LOCKS.setdefault(path, threading.Lock())
+    with lock:
+        namespace = agent_module.__dict__
+        previous = {name: namespace.get(name, _MISSING) for name in overrides}
+        namespace.update(overrides)
+        try:
+            return agent_module.agent_main()
+        finally:
+            for name, value in previous.items():
+                if value is _MISSING:
+                    namespace.pop(name, None)
+                else:
+                    namespace[name] = value
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _THREAD_POOL
+    with _CACHE_LOCK:
+        if _THREAD_POOL is None:
+            _THREAD_POOL = ThreadPoolExecutor(max_workers=AGENT_THREAD_POOL_SIZE, thread_name_prefix="agent")
+        return _THREAD_POOL
+
+
+async def run_in_thread(func: Callable, *args: Any) -> Any:
+    """Run a blocking callable on the shared agent thread pool and await its result."""
+    if AGENT_THREAD_POOL_SIZE <= 0:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args)
+    return await loop.run_in_executor(_thread_pool(), call)
+
+
+def _executor(agent_module) -> str:
+    return getattr(agent_module, "EXECUTOR", "thread")
+
+
+class _PoolTasks:
+    """A process pool's size, its unfinished calls, and the worker process each call started in."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        # Workers report (task id, pid) here as they start a call
+        self.started = multiprocessing.get_context("spawn").SimpleQueue()
+        self.pending: Dict[Future, int] = {}
+        self.stuck: Set[Future] = set()
+        self.pids: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, pool: ProcessPoolExecutor, *args: Any) -> Future:
+        task_id = next(_TASK_IDS)
+        future = pool.submit(_process_call, task_id, *args)
+        with self.lock:
+            if not future.done():
+                self.pending[future] = task_id
+        future.add_done_callback(self._finished)
+        return future
+
+    def _drain(self) -> None:
+        # Called with the lock held, on every finished call, so the pipe never fills up
+        while not self.started.empty():
+            task_id, pid = self.started.get()
+            self.pids[task_id] = pid
+
+    def _finished(self, future: Future) -> None:
+        with self.lock:
+            self._drain()
+            self.pids.pop(self.pending.pop(future, None), None)
+            self.stuck.discard(future)
+
+    def pid(self, future: Future) -> Optional[int]:
+        """The worker running `future`, or None if it has not started yet."""
+        with self.lock:
+            self._drain()
+            return self.pids.get(self.pending.get(future))
+
+
+# Bookkeeping of each pool started by start_process_pool, including retired ones still finishing calls
+_POOL_TASKS: "weakref.WeakKeyDictionary[ProcessPoolExecutor, _PoolTasks]" = weakref.WeakKeyDictionary()
+_WORKER_STARTED = None
+
+
+def _init_worker(agent_files: List[str], started) -> None:
+    """Process pool initializer: load the agent modules once per worker."""
+    global _WORKER_STARTED
+    _WORKER_STARTED = started
+    for agent_file in agent_files:
+        try:
+            load_agent(agent_file)
+        except Exception:
+            logger.exception("Failed to preload agent '%s' in worker", agent_file)
+
+
+def _process_call(task_id: int, agent_file: str, func_name: Optional[str], args: tuple) -> Any:
+    """Runs inside a worker process; only the path, name and arguments are pickled."""
+    if _WORKER_STARTED is not None:
+        _WORKER_STARTED.put((task_id, os.getpid()))
+    agent_module = load_agent(agent_file)
+    if func_name is None:
+        return _call_agent(agent_module, *args)
+    return getattr(agent_module, func_name)(*args)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def start_process_pool(agent_files: Optional[List[str]] = None, max_workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Start the agent process pool and wait until every worker is running.
+
+    Each worker imports the given agent files up front (plus those passed to
+    earlier calls), so the first request routed to it does not pay for
+    interpreter start-up or module loading. Called from the app's startup;
+    otherwise the pool is started lazily on the first process-executor call.
+    Returns None if the pool is disabled.
+    """
+    global _PROCESS_POOL
+    max_workers = max_workers or AGENT_PROCESS_POOL_SIZE
+    if max_workers <= 0:
+        return None
+    with _PROCESS_POOL_LOCK:
+        for agent_file in agent_files or []:
+            if agent_file not in _PROCESS_POOL_FILES:
+                _PROCESS_POOL_FILES.append(agent_file)
+        if _PROCESS_POOL is None:
+            tasks = _PoolTasks(max_workers)
+            # spawn rather than fork: the parent already runs an event loop and threads.
+            _PROCESS_POOL = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(list(_PROCESS_POOL_FILES), tasks.started),
+            )
+            _POOL_TASKS[_PROCESS_POOL] = tasks
+            # Workers are spawned on demand; one task per worker starts them all now.
+            for future in [_PROCESS_POOL.submit(_worker_ready) for _ in range(max_workers)]:
+                future.result()
+        return _PROCESS_POOL
+
+
+def shutdown_process_pool() -> None:
+    """Stop the agent process pool, if it was started."""
+    global _PROCESS_POOL
+    with _PROCESS_POOL_LOCK:
+        pool, _PROCESS_POOL = _PROCESS_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _retire_process_pool(pool: ProcessPoolExecutor, stuck: Optional[Future] = None) -> None:
+    """
+    Route new calls to a fresh pool, started in the background, and let `pool`
+    wind down.
+
+    A running call cannot be cancelled, so the worker stuck on `stuck` has to
+    be killed. Killing any worker breaks the whole pool, though, so that waits
+    until the pool's other calls, running or queued, have finished.
+    """
+    global _PROCESS_POOL
+    tasks = _POOL_TASKS.get(pool)
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is pool:
+            _PROCESS_POOL = None
+            if AGENT_THREAD_POOL_SIZE > 0 and tasks is not None:
+                _thread_pool().submit(start_process_pool, None, tasks.max_workers)
+    pool.shutdown(wait=False)
+    if stuck is None or tasks is None:
+        return
+    with tasks.lock:
+        first = not tasks.stuck
+        if stuck in tasks.pending:
+            tasks.stuck.add(stuck)
+    if first:
+        threading.Thread(target=_kill_stuck_workers, args=(tasks,), name="agent-pool-reaper", daemon=True).start()
+
+
+def _kill_stuck_workers(tasks: _PoolTasks) -> None:
+    """Waits out a retired pool's other calls, then terminates the workers its stuck calls run in."""
+    while True:
+        with tasks.lock:
+            pending, stuck = list(tasks.pending), list(tasks.stuck)
+        if not stuck:
+            return
+        if len(pending) == len(stuck):
+            pids = [tasks.pid(future) for future in stuck]
+            if all(pids):
+                for pid in pids:
+                    try:
+                        os.kill(pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+                return
+        # A stuck call may not have reached a worker yet; it does once another call finishes
+        wait_futures(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+
+
+def _agent_name(agent_module) -> str:
+    return agent_module.__name__.rpartition(".")[2]
+
+
+def _resolve_deadline(agent_module, deadline: Optional[float] = None) -> Optional[float]:
+    """Earliest of the caller's deadline, the request deadline and now + the agent's TIMEOUT."""
+    timeout = getattr(agent_module, "TIMEOUT", AGENT_TIMEOUT)
+    candidates = [d for d in (deadline, request_deadline.get()) if d is not None]
+    if timeout:
+        candidates.append(time.time() + timeout)
+    return min(candidates) if candidates else None
+
+
+async def _await_deadline(agent_module, awaitable, deadline: Optional[float]) -> Any:
+    if deadline is None:
+        return await awaitable
+    timeout = max(deadline - time.time(), 0)
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise AgentTimeoutError(_agent_name(agent_module), timeout or None) from None
+    except AgentTimeoutError as exc:
+        # Raised cooperatively by context.check_deadline() inside the agent
+        exc.agent = exc.agent or _agent_name(agent_module)
+        raise
+
+
+async def _run_process(agent_module, func_name: Optional[str], args: tuple, deadline: Optional[float]) -> Any:
+    if AGENT_PROCESS_POOL_SIZE <= 0:
+        func = functools.partial(_call_agent, agent_module) if func_name is None else getattr(agent_module, func_name)
+        return await _await_deadline(agent_module, run_in_thread(func, *args), deadline)
+    agent_file = agent_module.__file__
+    for attempt in range(2):
+        pool = _PROCESS_POOL or await run_in_thread(start_process_pool, [agent_file])
+        try:
+            future = _POOL_TASKS[pool].submit(pool, agent_file, func_name, args)
+        except RuntimeError:
+            # The pool broke, or was retired after we picked it; retry once on its replacement
+            _retire_process_pool(pool)
+            if attempt:
+                raise
+            continue
+        try:
+            return await _await_deadline(agent_module, asyncio.wrap_future(future), deadline)
+        except AgentTimeoutError:
+            # A call still waiting for a worker is simply dropped; only a running one is stuck
+            if not (future.cancel() or future.done()):
+                _retire_process_pool(pool, future)
+            raise
+        except BrokenProcessPool:
+            # A worker died, taking the pool with it; retry once on a replacement.
+            _retire_process_pool(pool)
+            if attempt:
+                raise
+
+
+async def run_in_process(agent_module, func_name: Optional[str], *args: Any) -> Any:
+    """
+    Call a module-level function of an agent in the process pool and await its result.
+
+    The worker looks the agent up by file path in its own module cache, so
+    only `args` and the return value cross the process boundary. The call is
+    bounded like `run_agent`; on timeout the worker is killed and the pool
+    replaced once its other calls have finished. With the pool disabled the call runs on the thread pool instead.
+    """
+    return await _run_process(agent_module, func_name, args, _resolve_deadline(agent_module))
+
+
+class _ResultCache:
+    """
+    LRU cache of pickled agent results with a per-entry expiry time.
+
+    Entries are accounted by the size of their key and pickled value, and the
+    least recently used ones are evicted once the total exceeds
+    AGENT_RESULT_CACHE_BYTES. Values are stored pickled so callers can never
+    mutate a cached result.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, bytes, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Any:
+        """Return the cached value for `key`, or _MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[1])
+
+    def put(self, key: Tuple[str, str, str], value: Any, ttl: float) -> None:
+        try:
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return  # Not picklable, so not cacheable
+        size = sum(map(len, key)) + len(blob)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > AGENT_RESULT_CACHE_BYTES:
+                return
+            self._entries[key] = (time.monotonic() + ttl, blob, size)
+            self.bytes += size
+            while self.bytes > AGENT_RESULT_CACHE_BYTES:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Tuple[str, str, str]) -> None:
+        self.bytes -= self._entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": AGENT_RESULT_CACHE_BYTES,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_RESULT_CACHE = _ResultCache()
+_AGENT_VERSIONS: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+
+
+def _agent_version(agent_module) -> str:
+    """Digest of the source the agent module was loaded from, so edited agents get fresh cache keys."""
+    version = _AGENT_VERSIONS.get(agent_module)
+    if version is None:
+        path = getattr(agent_module, "__file__", None)
+        if path is None:
+            version = ""
+        else:
+            with open(path, "rb") as f:
+                version = hashlib.sha256(f.read()).hexdigest()
+        _AGENT_VERSIONS[agent_module] = version
+    return version
+
+
+def _result_cache_key(agent_module, context: AgentContext) -> Optional[Tuple[str, str, str]]:
+    """Cache key for this call, or None when the agent does not opt in or the params are not JSON."""
+    if not getattr(agent_module, "CACHE_TTL", None) or AGENT_RESULT_CACHE_BYTES <= 0:
+        return None
+    try:
+        params = json.dumps(context.params, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+    version = _agent_version(agent_module)
+    cache_version = getattr(agent_module, "cache_version", None)
+    if cache_version is not None:
+        # Agents whose results depend on data outside their source (e.g. a rule file) version it here
+        data_version = cache_version()
+        if data_version is None:
+            return None
+        version = f"{version}:{data_version}"
+    return _agent_name(agent_module), version, params
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    """Size, hit/miss and eviction counters of the agent result cache."""
+    return _RESULT_CACHE.stats()
+
+
+def clear_result_cache() -> None:
+    """Drop every cached agent result and reset the counters."""
+    _RESULT_CACHE.clear()
+
+
+def _call_agent(agent_module, context: AgentContext):
+    if _accepts_context(agent_module.agent_main):
+        return agent_module.agent_main(context)
+    return _run_legacy(agent_module, context)
+
+
+async def run_agent(agent_module, context: Optional[AgentContext] = None):
+    """
+    Run the agent's main function (agent_main) and return its output.
+
+    If `agent_main` accepts an argument it is called with the per-request
+    `context`; older no-argument agents go through the global-setting shim.
+    Coroutine agents are awaited on the event loop, while synchronous ones are
+    dispatched to the bounded agent thread pool, or to the process pool when
+    the module sets `EXECUTOR = "process"`. Process agents only receive
+    `context.params`; resources such as the MCP adapter stay in this process.
+
+    Every call is bounded by the agent's `TIMEOUT` (default `AGENT_TIMEOUT`),
+    the context's `deadline` and the request's `X-Request-Deadline`, whichever
+    comes first, and raises AgentTimeoutError when it runs out. Process agents
+    are killed; a thread cannot be, so its result is discarded when it
+    finishes, unless the agent stops itself via `context.check_deadline()`.
+
+    Agents that set `CACHE_TTL` (seconds) must be pure functions of their
+    params: results are cached by agent name, source version and params, and
+    a hit returns without running the agent. Resources are not part of the key.
+    An agent that also depends on loaded data defines `cache_version()`, whose
+    value is added to the key (it is called on the event loop, so it must be cheap;
+    None, e.g. while that data is not loaded yet, skips the cache for the call).
+    """
+    if not hasattr(agent_module, "agent_main"):
+        raise AttributeError("The agent does not define 'agent_main'.")
+    if context is None:
+        context = AgentContext()
+    context.deadline = _resolve_deadline(agent_module, context.deadline)
+    key = _result_cache_key(agent_module, context)
+    if key is None:
+        return await _dispatch_agent(agent_module, context)
+    if context.remaining() is not None and context.remaining() <= 0:
+        # Even a cache hit is too late for a caller whose deadline has passed
+        raise AgentTimeoutError(_agent_name(agent_module))
+    result = _RESULT_CACHE.get(key)
+    if result is _MISSING:
+        result = await _dispatch_agent(agent_module, context)
+        _RESULT_CACHE.put(key, result, agent_module.CACHE_TTL)
+    return result
+
+
+async def _dispatch_agent(agent_module, context: AgentContext):
+    agent_main = agent_module.agent_main
+    if inspect.iscoroutinefunction(agent_main):
+        call = agent_main(context) if _accepts_context(agent_main) else agent_main()
+        return await _await_deadline(agent_module, call, context.deadline)
+    if _executor(agent_module) == "process":
+        args = (AgentContext(context.params, deadline=context.deadline),)
+        return await _run_process(agent_module, None, args, context.deadline)
+    return await _await_deadline(agent_module, run_in_thread(_call_agent, agent_module, context), context.deadline)
+
+
+async def stream_agent(agent_module, context: Optional[AgentContext] = None) -> AsyncIterator[Any]:
+    """
+    Iterate over the events of the agent's `agent_stream(context)` generator as they are produced.
+
+    A synchronous generator is advanced on the agent thread pool one event at
+    a time, so blocking work between yields (e.g. an MCP round trip) never
+    runs on the event loop. The stream shares one deadline, resolved as in
+    `run_agent`; when it runs out the iterator raises AgentTimeoutError.
+    """
+    if not hasattr(agent_module, "agent_stream"):
+        raise AttributeError("The agent does not define 'agent_stream'.")
+    if context is None:
+        context = AgentContext()
+    context.deadline = _resolve_deadline(agent_module, context.deadline)
+    stream = agent_module.agent_stream(context)
+    if inspect.isasyncgen(stream):
+        try:
+            while True:
+                try:
+                    event = await _await_deadline(agent_module, stream.__anext__(), context.deadline)
+                except StopAsyncIteration:
+                    return
+                yield event
+        finally:
+            await stream.aclose()
     else:
-        raise AttributeError("The agent does not define 'agent_main'.")
\ No newline at end of file
+        try:
+            while True:
+                event = await _await_deadline(agent_module, run_in_thread(next, stream, _MISSING), context.deadline)
+                if event is _MISSING:
+                    return
+                yield event
+        finally:
+            try:
+                stream.close()
+            except ValueError:
+                pass  # still running on a pool thread after a timeout; it is dropped once that step returns
+
+
+async def run_batch(registry: AgentRegistry, items: List[Tuple[str, Dict[str, Any]]],
+                    concurrency: Optional[int] = None, **resources: Any) -> List[Dict[str, Any]]:
+    """
+    Run many (agent name, params) invocations concurrently through `run_agent`.
+
+    At most `concurrency` items (capped at AGENT_BATCH_CONCURRENCY) run at
+    once; `resources` are shared by every item's context. Returns one outcome
+    per item, in order: the agent name, a status ("ok", "not_found",
+    "timeout" or "error"), the result or error message, and elapsed_ms.
+    A failing item never affects the others.
+    """
+    limit = min(concurrency or AGENT_BATCH_CONCURRENCY, AGENT_BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run_one(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            outcome: Dict[str, Any] = {"agent": name}
+            try:
+                agent_module = registry.get(name)
+                if agent_module is None:
+                    outcome.update(status="not_found", error="Agent not found.")
+                else:
+                    outcome.update(status="ok", result=await run_agent(agent_module, AgentContext(params, **resources)))
+            except AgentTimeoutError as exc:
+                outcome.update(status="timeout", error=str(exc))
+            except Exception as exc:
+                outcome.update(status="error", error=f"Error executing agent: {exc}")
+            outcome["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            return outcome
+
+    return list(await asyncio.gather(*(run_one(name, params) for name, params in items)))
+
+
+class RequestDeadlineMiddleware:
+    """
+    ASGI middleware that reads the `X-Request-Deadline` header (absolute Unix
+    time in seconds) into `request_deadline`, so every agent call made while
+    handling the request is bounded by it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        deadline = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-deadline":
+                try:
+                    deadline = float(value)
+                except ValueError:
+                    logger.warning("Ignoring invalid X-Request-Deadline header %r", value)
+                break
+        token = request_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
@@ -3,6 +3,12 @@
 from typing import Dict, Any
 from fastapi import APIRouter
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns a simple echo message."}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
 class EchoAgent:
     """
     Echo Agent
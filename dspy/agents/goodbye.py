@@ -1,2 +1,5 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns a goodbye message."}
+
 def agent_main():
     return "Goodbye from the agent!"
\ No newline at end of file
@@ -1,6 +1,9 @@
 # agents/joke.py
 import random
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns a random programming joke."}
+
 # Collection of programming jokes
 JOKES = [
     "Why did the programmer quit his job? Because he didn't get arrays!",
@@ -3,13 +3,23 @@
 
 import ast
 import operator
+import sys
 from typing import Dict, Any, Union, Optional
 from fastapi import APIRouter, Query
+from agents.dspy_integration import run_in_process
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Evaluates a math expression after verifying a token."}
+
+# Large exponents can keep a core busy, so evaluate in the agent process pool
+EXECUTOR = "process"
+# Seconds allowed per evaluation; on timeout the worker process is killed and replaced
+TIMEOUT = 5
 
 # Expected token for authorization
 EXPECTED_TOKEN = "MATH_SECRET"
 
-# Global variables for configuration
+# Global variables for standalone use; the dispatcher passes token/expression in the context instead
 TOKEN = None  # User must set this before calling agent_main()
 EXPRESSION = None  # User must set this to a valid arithmetic expression (e.g., "2+2")
 
@@ -105,13 +115,24 @@ class MathAgent:
         except Exception as e:
             return {"error": f"Unexpected error during evaluation: {str(e)}"}
 
+def evaluate(token: Optional[str] = None, expression: Optional[str] = None) -> Dict[str, Any]:
+    """Module-level entry point for the /math route, callable from a worker process."""
+    return MathAgent().evaluate(token, expression)
+
 # Keep the original function for backward compatibility
-def agent_main():
+def agent_main(context=None):
     """
     Original agent_main function for backward compatibility.
+
+    Reads `token` and `expression` from the per-request context when one is
+    given, otherwise from the TOKEN and EXPRESSION globals.
     """
     agent = MathAgent()
-    result = agent.evaluate(TOKEN, EXPRESSION)
+    if context is None:
+        token, expression = TOKEN, EXPRESSION
+    else:
+        token, expression = context.get("token"), context.get("expression")
+    result = agent.evaluate(token, expression)
     
     # Convert the result to match the original format
     if "error" in result:
@@ -122,8 +143,6 @@ def agent_main():
 def register_routes(router: APIRouter):
     """Registers the math agent's routes with the provided APIRouter."""
     
-    agent = MathAgent()
-    
     @router.get("/math", summary="Evaluates a math expression after verifying a token", tags=["Agents with Validation"])
     async def math_route(
         token: str = Query(None, description="Authorization token (must be 'MATH_SECRET')"),
@@ -164,7 +183,7 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        result = agent.evaluate(token, expression)
+        result = await run_in_process(sys.modules[__name__], "evaluate", token, expression)
         if "error" in result:
             return {"agent": "math", "result": "Error: " + result["error"]}
         else:
@@ -1,6 +1,14 @@
 # agents/summarizer.py
 from typing import Optional, Dict, Any
+import sys
 from fastapi import APIRouter, Query
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Summarizes a block of text (truncation)."}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
 
 class SummarizerAgent:
     """
@@ -49,6 +57,12 @@ class SummarizerAgent:
             summary = text_to_summarize
         return {"agent": "summarizer", "result": {"summary": summary, "explanation": "This is a simple summarization agent."}}
 
+def agent_main(context=None):
+    """Summarizes `TEXT_TO_SUMMARIZE` from the request context, truncated to `max_length` characters (default 10)."""
+    params = context.params if context is not None else {}
+    return SummarizerAgent(int(params.get("max_length", 10))).summarize(params.get("TEXT_TO_SUMMARIZE"))
+
+
 def register_routes(router: APIRouter):
     """Registers the summarizer agent's routes with the provided APIRouter."""
 
@@ -87,6 +101,6 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        agent = SummarizerAgent(max_length=max_length)
-        result = agent.summarize(TEXT_TO_SUMMARIZE)
+        context = AgentContext({"TEXT_TO_SUMMARIZE": TEXT_TO_SUMMARIZE, "max_length": max_length})
+        result = await run_agent(sys.modules[__name__], context)
         return result
\ No newline at end of file
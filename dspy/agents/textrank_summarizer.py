@@ -2,6 +2,19 @@
 from typing import Optional, Dict, Any, List
 from fastapi import APIRouter, Query
 import re
+import sys
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Summarizes text using TextRank algorithm."}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
+# Ranking is CPU work, so run it in the agent process pool
+EXECUTOR = "process"
+
+STOP_WORDS = frozenset({"the", "a", "an", "is", "are", "was", "were", "of", "in", "on", "at", "to", "by", "and", "or"})
 
 class TextRankSummarizerAgent:
     """
@@ -18,43 +31,71 @@ class TextRankSummarizerAgent:
 
     def _calculate_similarity(self, sentence1: str, sentence2: str) -> float:
         """Calculates similarity between two sentences (simple word overlap)."""
-        words1 = set(sentence1.lower().split())
-        words2 = set(sentence2.lower().split())
-        stop_words = {"the", "a", "an", "is", "are", "was", "were", "of", "in", "on", "at", "to", "by", "and", "or"}
-        words1 = words1 - stop_words
-        words2 = words2 - stop_words
+        words1 = set(sentence1.lower().split()) - STOP_WORDS
+        words2 = set(sentence2.lower().split()) - STOP_WORDS
         common_words = words1.intersection(words2)
         return len(common_words) / (len(words1) + len(words2) + 1e-6)
 
-    def _rank_sentences(self, sentences: List[str]) -> List[float]:
-        """Simplified TextRank ranking (one iteration)."""
-        num_sentences = len(sentences)
-        similarity_matrix = [[0.0] * num_sentences for _ in range(num_sentences)]
+    def _term_ids(self, sentences: List[str]):
+        """Each sentence's distinct non-stop words as integer term IDs, flattened: (sentence indices, term IDs)."""
+        import numpy as np
+
+        vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        terms: List[int] = []
+        for i, sentence in enumerate(sentences):
+            for word in set(sentence.lower().split()) - STOP_WORDS:
+                rows.append(i)
+                terms.append(vocabulary.setdefault(word, len(vocabulary)))
+        return np.array(rows, dtype=np.intp), np.array(terms, dtype=np.intp)
+
+    def _similarity_matrix(self, sentences: List[str]):
+        """
+        `_calculate_similarity` for every ordered pair of sentences, as an n x n
+        NumPy array with a zero diagonal.
 
-        # Build the similarity matrix
-        for i in range(num_sentences):
-            for j in range(num_sentences):
-                if i != j:
-                    similarity_matrix[i][j] = self._calculate_similarity(sentences[i], sentences[j])
+        Sentences are tokenized once. The common-word counts are accumulated
+        term by term over the sentences sharing that term, so the cost grows
+        with the pairs that actually overlap rather than with the vocabulary.
+        """
+        import numpy as np
 
-        # Normalize the rows of the similarity matrix (make them sum to 1)
-        for i in range(num_sentences):
-            row_sum = sum(similarity_matrix[i])
-            if row_sum > 0:
-                similarity_matrix[i] = [sim / row_sum for sim in similarity_matrix[i]]
+        num_sentences = len(sentences)
+        rows, terms = self._term_ids(sentences)
+        lengths = np.bincount(rows, minlength=num_sentences)
+        common = np.zeros((num_sentences, num_sentences))
+        order = np.argsort(terms, kind="stable")
+        rows, terms = rows[order], terms[order]
+        bounds = np.flatnonzero(np.diff(terms)) + 1
+        for postings in np.split(rows, bounds):
+            if len(postings) > 1:
+                common[np.ix_(postings, postings)] += 1
+        similarity = common / (lengths[:, None] + lengths[None, :] + 1e-6)
+        np.fill_diagonal(similarity, 0.0)
+        return similarity
 
+    def _rank_sentences(self, sentences: List[str]) -> List[float]:
+        """Simplified TextRank ranking (one iteration)."""
+        import numpy as np
 
-        # Initialize scores (can start with equal scores or slightly favor the first sentence)
+        num_sentences = len(sentences)
+        similarity_matrix = self._similarity_matrix(sentences)
+
+        # Normalize the rows of the similarity matrix (make them sum to 1).
+        # Sums are accumulated one column at a time, in the order a Python sum()
+        # adds them, so the scores are exactly those of the pairwise loops.
+        row_sums = np.zeros(num_sentences)
+        for j in range(num_sentences):
+            row_sums += similarity_matrix[:, j]
+        nonzero = row_sums > 0
+        similarity_matrix[nonzero] /= row_sums[nonzero, None]
+
+        # Equal initial scores, then one iteration of score updates
         scores = [1.0 / num_sentences] * num_sentences
-        #scores[0] = 1.0  #  Optionally, give a slight boost to the first sentence.
-
-        # One iteration of score updates.
-        new_scores = [0.0] * num_sentences
-        for i in range(num_sentences):
-            for j in range(num_sentences):
-                new_scores[i] += similarity_matrix[j][i] * scores[j]  # Note: j, i order
-        return new_scores
-        
+        new_scores = np.zeros(num_sentences)
+        for j in range(num_sentences):
+            new_scores += similarity_matrix[j] * scores[j]  # Note: j, i order
+        return new_scores.tolist()
 
     def summarize(self, text_to_summarize: Optional[str] = None, num_sentences: int = 2) -> Dict[str, Any]:
         """Summarizes the input text using TextRank."""
@@ -76,9 +117,15 @@ class TextRankSummarizerAgent:
         return {"summary": summary}
 
 
+def agent_main(context=None):
+    """Summarizes `TEXT_TO_SUMMARIZE` from the request context into `num_sentences` sentences (default 2)."""
+    params = context.params if context is not None else {}
+    num_sentences = int(params.get("num_sentences", 2))
+    return TextRankSummarizerAgent().summarize(params.get("TEXT_TO_SUMMARIZE"), num_sentences)
+
+
 def register_routes(router: APIRouter):
     """Registers the TextRank summarizer agent's routes."""
-    agent = TextRankSummarizerAgent()
 
     @router.get("/textrank_summarizer", summary="Summarizes input text using TextRank", response_model=Dict[str, Any], tags=["Dspy Agents"])
     async def textrank_summarizer_route(
@@ -136,7 +183,8 @@ def register_routes(router: APIRouter):
         ```
 
         """
-        result = agent.summarize(TEXT_TO_SUMMARIZE, num_sentences)
+        context = AgentContext({"TEXT_TO_SUMMARIZE": TEXT_TO_SUMMARIZE, "num_sentences": num_sentences})
+        result = await run_agent(sys.modules[__name__], context)
         return {
             "agent": "textrank_summarizer",
             "result": result
@@ -3,6 +3,9 @@ from typing import Dict, Any
 from fastapi import APIRouter
 from datetime import datetime, UTC 
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {"description": "Returns the current time in ISO 8601 format."}
+
 class TimeAgent:
     """
     Time Agent
@@ -1,48 +1,63 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, APIRouter
 from fastapi.responses import JSONResponse, Response
 from typing import Optional, List, Dict, Any
-import os
-from agents.dspy_integration import load_agent, run_agent
-from agents.classifier import register_routes as register_classifier_routes
-from agents.summarizer import register_routes as register_summarizer_routes
-from agents.textrank_summarizer import register_routes as register_textrank_summarizer_routes  # NEW
-from agents.echo import register_routes as register_echo_routes              # NEW
-from agents.time import register_routes as register_time_routes              # NEW
-from agents.joke import register_routes as register_joke_routes              # NEW
-from agents.quote import register_routes as register_quote_routes            # NEW
-from agents.math import register_routes as register_math_routes              # NEW
-
-app = FastAPI(title="FastAPI Agent System")
+from agents.dspy_integration import (
+    AgentContext, AgentTimeoutError, RequestDeadlineMiddleware,
+    result_cache_stats, run_agent, run_batch, run_in_thread, shutdown_process_pool, start_process_pool,
+)
+from app.models import BatchRequest
+from app.lazy_routes import ROUTE_PREFIX, create_registry, register_agent_routes
 
 # --- Agent Information ---
-AGENTS_INFO: List[Dict[str, str]] = [
-    {"name": "hello_world", "description": "Returns a simple hello world message."},
-    {"name": "goodbye", "description": "Returns a goodbye message."},
-    {"name": "echo", "description": "Returns a simple echo message."},
-    {"name": "time", "description": "Returns the current time in ISO 8601 format."},
-    {"name": "joke", "description": "Returns a random programming joke."},
-    {"name": "quote", "description": "Returns an inspirational quote."},
-    {"name": "math", "description": "Evaluates a math expression after verifying a token."},
-    {"name": "classifier", "description": "Classifies input text using rule-based logic."},
-    {"name": "summarizer", "description": "Summarizes a block of text (truncation)."},
-    {"name": "textrank_summarizer", "description": "Summarizes text using TextRank algorithm."},
-]
+# Agents are discovered once at startup; /agents is generated from the registry.
+# With LAZY_AGENT_ROUTES=1 it is read from app/agent_manifest.json and agents load on first use.
+registry = create_registry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warm worker processes for agents that declare EXECUTOR = "process"
+    await run_in_thread(start_process_pool, registry.process_agent_files())
+    yield
+    shutdown_process_pool()
+
+app = FastAPI(title="FastAPI Agent System", lifespan=lifespan)
+
+# Agents that run past their deadline answer with a structured 504
+app.add_middleware(RequestDeadlineMiddleware)
+
+@app.exception_handler(AgentTimeoutError)
+async def agent_timeout_handler(request: Request, exc: AgentTimeoutError):
+    return JSONResponse(status_code=504, content={"agent": exc.agent, "error": "timeout", "detail": str(exc)})
 
 @app.get("/agents", tags=["All Agents"])
 async def list_all_agents() -> Dict[str, List[Dict[str, str]]]:
-    return {"agents": AGENTS_INFO}
+    return {"agents": registry.describe()}
+
+@app.post("/agents/batch", tags=["All Agents"])
+async def run_agents_batch(batch: BatchRequest) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs several agents concurrently, e.g. classifier, textrank_summarizer and quote for the same item.
+
+    Results come back in request order with a per-item status ("ok", "not_found",
+    "timeout" or "error") and elapsed_ms.
+    """
+    items = [(item.agent, item.params) for item in batch.items]
+    return {"results": await run_batch(registry, items, batch.concurrency)}
+
+@app.get("/agents/cache/stats", tags=["All Agents"])
+async def agent_cache_stats() -> Dict[str, Any]:
+    """
+    Counters of the agent result cache (agents that declare CACHE_TTL), for sizing AGENT_RESULT_CACHE_BYTES.
+    """
+    return result_cache_stats()
 
 # --- Agent Router ---
-agent_router = APIRouter(prefix="/agent")
-register_classifier_routes(agent_router)
-register_summarizer_routes(agent_router)
-register_textrank_summarizer_routes(agent_router)  # NEW: Register the TextRank routes
-register_echo_routes(agent_router)                 # NEW: Register Echo Agent routes
-register_time_routes(agent_router)                 # NEW: Register Time Agent routes
-register_joke_routes(agent_router)                 # NEW: Register Joke Agent routes
-register_quote_routes(agent_router)                # NEW: Register Quote Agent routes
-register_math_routes(agent_router)                 # NEW: Register Math Agent routes
+agent_router = APIRouter(prefix=ROUTE_PREFIX)
+# classifier, summarizer, textrank_summarizer, echo, time, joke, quote and math
+# (see ROUTE_AGENTS in app/lazy_routes.py)
+register_agent_routes(agent_router)
 app.include_router(agent_router)
 
 
@@ -51,39 +66,30 @@ app.include_router(agent_router)
 
 @app.get("/agent/hello_world", tags=["Simple Agents"])
 async def hello_world_agent():
-    agent_file = os.path.join("agents", "hello_world.py")
-    agent_module = load_agent(agent_file)
-    output = run_agent(agent_module)
+    agent_module = registry.get("hello_world")
+    output = await run_agent(agent_module)
     return {"agent": "hello_world", "result": output}
 
 @app.get("/agent/goodbye")
 async def goodbye_agent():
-    agent_file = os.path.join("agents", "goodbye.py")
-    agent_module = load_agent(agent_file)
-    output = run_agent(agent_module)
+    agent_module = registry.get("goodbye")
+    output = await run_agent(agent_module)
     return {"agent": "goodbye", "result": output}
 
 
 @app.get("/agent/{agent_name}", tags=["Dynamic Agents"]) 
 async def execute_agent(agent_name: str, request: Request):
-    agent_file = os.path.join("agents", f"{agent_name}.py")
-    if not os.path.exists(agent_file):
+    agent_module = registry.get(agent_name)
+    if agent_module is None:
         raise HTTPException(status_code=404, detail="Agent not found.")
 
     try:
-        agent_module = load_agent(agent_file)
-
-        if hasattr(agent_module, 'TOKEN') and 'token' in request.query_params:
-            agent_module.TOKEN = request.query_params['token']
-        if hasattr(agent_module, 'EXPRESSION') and 'expression' in request.query_params:
-            agent_module.EXPRESSION = request.query_params['expression']
-        if hasattr(agent_module, 'INPUT_TEXT') and 'INPUT_TEXT' in request.query_params:
-            agent_module.INPUT_TEXT = request.query_params['INPUT_TEXT']
-        if hasattr(agent_module, 'TEXT_TO_SUMMARIZE') and 'TEXT_TO_SUMMARIZE' in request.query_params:
-            agent_module.TEXT_TO_SUMMARIZE = request.query_params['TEXT_TO_SUMMARIZE']
-
-        output = run_agent(agent_module)
+        # Query parameters are handed to the agent as its per-request context
+        context = AgentContext(dict(request.query_params))
+        output = await run_agent(agent_module, context)
         return {"agent": agent_name, "result": output}
+    except AgentTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing agent: {str(e)}")
 
@@ -1 +1,14 @@
-# Future data models will be defined here
\ No newline at end of file
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class BatchItem(BaseModel):
+    """One agent invocation in a POST /agents/batch request."""
+    agent: str = Field(..., description="Agent name, as listed by /agents")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parameters passed to the agent as its context")
+
+
+class BatchRequest(BaseModel):
+    """Body of POST /agents/batch."""
+    items: List[BatchItem]
+    concurrency: Optional[int] = Field(None, ge=1, description="Maximum items run at once (capped by the server)")
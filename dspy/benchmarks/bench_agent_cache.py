@@ -0,0 +1,74 @@
+"""
+Agent module cache benchmark
+----------------------------
+Compares loading agents with and without the module cache in
+`agents.dspy_integration.load_agent`, both as raw loader calls and as
+HTTP requests through the FastAPI app.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_agent_cache
+"""
+import functools
+import os
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from agents.dspy_integration import load_agent
+import app.main
+
+DURATION = 2.0
+
+
+def rate(func, duration: float = DURATION) -> float:
+    """Calls func repeatedly for `duration` seconds and returns calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def bench_loader(agent_name: str, use_cache: bool) -> float:
+    agent_file = os.path.join("agents", f"{agent_name}.py")
+
+    def call():
+        module = load_agent(agent_file, use_cache=use_cache)
+        if hasattr(module, "agent_main"):
+            module.agent_main()
+
+    return rate(call)
+
+
+def bench_http(path: str, use_cache: bool) -> float:
+    client = TestClient(app.main.app)
+    if use_cache:
+        return rate(lambda: client.get(path))
+
+    # Before the module cache and registry: every request stats and executes the file.
+    def lookup(name):
+        agent_file = os.path.join("agents", f"{name}.py")
+        return load_agent(agent_file, use_cache=False) if os.path.exists(agent_file) else None
+
+    with patch.object(app.main.registry, "get", lookup):
+        return rate(lambda: client.get(path))
+
+
+def main():
+    rows = [
+        ("load_agent hello_world", functools.partial(bench_loader, "hello_world")),
+        ("load_agent classifier", functools.partial(bench_loader, "classifier")),
+        ("GET /agent/hello_world", functools.partial(bench_http, "/agent/hello_world")),
+    ]
+    print(f"{'benchmark':<28}{'uncached/s':>14}{'cached/s':>14}{'speedup':>10}")
+    for label, bench in rows:
+        before = bench(use_cache=False)
+        after = bench(use_cache=True)
+        print(f"{label:<28}{before:>14.0f}{after:>14.0f}{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Classifier model benchmark
+--------------------------
+Trains the naive Bayes model on synthetic labeled messages, saves it and
+times loading it memory-mapped versus read into memory. Then classifies a
+batch of messages one `predict` call per message versus one call for the
+whole batch, checks that both agree, and reports the model's accuracy on
+held-out messages.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_classifier_model
+"""
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.naive_bayes import DEFAULT_FEATURES, NaiveBayesModel, train
+
+LABELS = 20
+WORDS_PER_LABEL = 200
+SHARED_WORDS = 2_000
+TRAIN_TEXTS = 50_000
+TEST_TEXTS = 10_000
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_data(rng: random.Random):
+    def word():
+        return "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 8)))
+
+    shared = [word() for _ in range(SHARED_WORDS)]
+    topical = {f"Label {i}": [word() for _ in range(WORDS_PER_LABEL)] for i in range(LABELS)}
+
+    def message(label: str) -> str:
+        words = rng.choices(shared, k=rng.randint(5, 15)) + rng.choices(topical[label], k=rng.randint(1, 4))
+        rng.shuffle(words)
+        return " ".join(words)
+
+    labels = [rng.choice(list(topical)) for _ in range(TRAIN_TEXTS + TEST_TEXTS)]
+    return [message(label) for label in labels], labels
+
+
+def main():
+    texts, labels = make_data(random.Random(0))
+    train_texts, test_texts = texts[:TRAIN_TEXTS], texts[TRAIN_TEXTS:]
+
+    start = time.perf_counter()
+    model = train(train_texts, labels[:TRAIN_TEXTS], n_features=DEFAULT_FEATURES)
+    print(f"train {TRAIN_TEXTS} texts, {LABELS} labels: {time.perf_counter() - start:.2f} s")
+
+    with tempfile.TemporaryDirectory() as path:
+        model.save(path)
+        for mmap in (False, True):
+            start = time.perf_counter()
+            loaded = NaiveBayesModel.load(path, mmap=mmap)
+            label = "memory-mapped" if mmap else "read"
+            print(f"load ({label}): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        single = [loaded.predict([text])[0][0] for text in test_texts]
+        single_s = time.perf_counter() - start
+        start = time.perf_counter()
+        batch, _ = loaded.predict(test_texts)
+        batch_s = time.perf_counter() - start
+
+    assert single == batch, "batch predictions differ from single predictions"
+    accuracy = np.mean([p == y for p, y in zip(batch, labels[TRAIN_TEXTS:])])
+    print(f"predict {TEST_TEXTS} texts one by one: {single_s:.2f} s, as one batch: {batch_s:.2f} s "
+          f"({single_s / batch_s:.1f}x); accuracy {accuracy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Classifier regex engine worst-case benchmark
+--------------------------------------------
+Adds one rule that backtracks catastrophically in `re` to the classifier's
+rules and times a classification of adversarial texts of growing length
+with the "re" and "linear" regex engines. `re` is not run again for a
+pattern once a single call takes longer than BUDGET_S, and never on the
+last, long text, which only the linear engine gets through.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_classifier_regex
+"""
+import time
+
+from agents.classifier import DEFAULT_RULES, ClassifierAgent, RuleSet
+
+BUDGET_S = 1.0
+
+# rule, text of a given size, sizes for both engines, size of the long text
+ADVERSARIAL = [
+    (r"(a+)+$", lambda n: "a" * n + "!", (16, 20, 22, 24), 10_000),
+    (r"^(\w+\s?)*$", lambda n: "word " * n + "!", (4, 5, 6, 7), 2_000),
+    (r"(a|aa)*c", lambda n: "a" * n, (20, 24, 28), 10_000),
+    (r"(x+x+)+y", lambda n: "x" * n, (14, 18, 22), 10_000),
+]
+
+
+def classify_ms(agent: ClassifierAgent, text: str) -> float:
+    start = time.perf_counter()
+    agent.classify(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    print(f"{'rule':<16}{'chars':>8}{'re ms':>12}{'linear ms':>12}")
+    worst = {"re": 0.0, "linear": 0.0}
+    for pattern, make_text, sizes, long_size in ADVERSARIAL:
+        rules = dict(DEFAULT_RULES, Adversarial=[pattern])
+        agents = {engine: ClassifierAgent(RuleSet(rules, regex_engine=engine)) for engine in worst}
+        re_blocked = False
+        for size in sizes + (long_size,):
+            text = make_text(size)
+            linear_ms = classify_ms(agents["linear"], text)
+            if re_blocked or size == long_size:
+                re_cell = "skipped"
+            else:
+                re_ms = classify_ms(agents["re"], text)
+                re_cell = f"{re_ms:.1f}"
+                worst["re"] = max(worst["re"], re_ms)
+                re_blocked = re_ms > BUDGET_S * 1000
+            worst["linear"] = max(worst["linear"], linear_ms)
+            print(f"{pattern:<16}{len(text):>8}{re_cell:>12}{linear_ms:>12.1f}")
+    print(f"worst case: re {worst['re']:.0f} ms (then skipped), linear {worst['linear']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Event loop responsiveness benchmark
+-----------------------------------
+Measures `/health` latency while large TextRank summarizations run, with
+agents executed inline on the event loop versus on the agent thread pool.
+Every request summarizes a different document and the result cache is
+cleared per mode, so no request is answered from the cache.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_event_loop
+"""
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+import agents.dspy_integration as dspy_integration
+import agents.textrank_summarizer as textrank_summarizer
+from app.main import app
+
+HEAVY_REQUESTS = 4
+SENTENCES = 250
+PING_INTERVAL = 0.005
+
+WORDS = "agent model request context latency loop thread pool summary sentence score rank".split()
+
+
+def make_document(sentences: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(sentences)
+    )
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(pool_size: int, heavy_requests: int = HEAVY_REQUESTS) -> dict:
+    dspy_integration.AGENT_THREAD_POOL_SIZE = pool_size
+    # TextRank normally runs on the process pool (see bench_process_pool);
+    # here it runs inline or on the thread pool, which is what is compared
+    textrank_summarizer.EXECUTOR = "thread"
+    dspy_integration.clear_result_cache()
+    documents = [make_document(SENTENCES, seed) for seed in range(heavy_requests)]
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def heavy(document: str):
+            await client.get("/agent/textrank_summarizer", params={"TEXT_TO_SUMMARIZE": document})
+
+        async def ping(stop: asyncio.Event):
+            # Latency is measured from when each ping was due, so time spent
+            # waiting for a blocked event loop counts against /health.
+            due = time.perf_counter()
+            while True:
+                await client.get("/health")
+                latencies.append((time.perf_counter() - due) * 1000)
+                if stop.is_set():
+                    break
+                due = max(due + PING_INTERVAL, time.perf_counter())
+                await asyncio.sleep(due - time.perf_counter())
+
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(stop))
+        start = time.perf_counter()
+        if heavy_requests:
+            await asyncio.gather(*(heavy(document) for document in documents))
+        else:
+            await asyncio.sleep(1.0)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await pinger
+
+    return {
+        "pings": len(latencies),
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies),
+        "heavy_s": elapsed,
+    }
+
+
+def main():
+    pool_size = dspy_integration.AGENT_THREAD_POOL_SIZE
+    print(f"{HEAVY_REQUESTS} concurrent textrank requests ({SENTENCES} sentences) while pinging /health")
+    print(f"{'mode':<16}{'pings':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'heavy s':>10}")
+    modes = (("idle", pool_size, 0), ("inline", 0, HEAVY_REQUESTS), (f"pool({pool_size})", pool_size, HEAVY_REQUESTS))
+    for label, size, heavy_requests in modes:
+        stats = asyncio.run(run(size, heavy_requests))
+        print(f"{label:<16}{stats['pings']:>8}{stats['p50']:>10.1f}{stats['p99']:>10.1f}"
+              f"{stats['max']:>10.1f}{stats['heavy_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
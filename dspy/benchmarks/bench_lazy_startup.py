@@ -0,0 +1,83 @@
+"""
+Lazy route registration startup benchmark
+-----------------------------------------
+Times `import app.main` in fresh interpreters with LAZY_AGENT_ROUTES=0
+(every agent module imported to register its routes) versus
+LAZY_AGENT_ROUTES=1 (routes read from app/agent_manifest.json), counts the
+agent modules each imports, and reports their cumulative import time from
+`python -X importtime`.
+
+Usage (from the app folder):
+    python -m benchmarks.bench_lazy_startup
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+
+CODE = """
+import sys, time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start, sum(m.startswith('agents.') for m in sys.modules))
+"""
+
+# -X importtime only logs imports made through the import statement, so agent
+# modules loaded with importlib.import_module are routed through __import__
+IMPORTTIME_CODE = """
+import importlib, sys
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    if not name.startswith('agents.'):
+        return _import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = import_module
+import app.main
+"""
+
+
+def startup(lazy: bool):
+    env = dict(os.environ, LAZY_AGENT_ROUTES="1" if lazy else "0")
+    result = subprocess.run([sys.executable, "-c", CODE], env=env, capture_output=True, text=True, check=True)
+    seconds, modules = result.stdout.split()
+    return float(seconds), int(modules)
+
+
+def agent_import_time(lazy: bool) -> float:
+    """Cumulative -X importtime of the agents.* modules app.main imports, in ms."""
+    env = dict(os.environ, LAZY_AGENT_ROUTES="1" if lazy else "0")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORTTIME_CODE],
+                            env=env, capture_output=True, text=True, check=True)
+    # Lines are "import time: self [us] | cumulative | <indent>module", children
+    # before their parent; only the outermost agents.* imports are added up
+    total, stack = 0, []
+    for line in reversed(result.stderr.splitlines()):
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = len(name) - len(name.lstrip())
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        inside_agent = bool(stack) and stack[-1][1]
+        is_agent = name.strip().startswith("agents.")
+        if is_agent and not inside_agent:
+            total += int(cumulative)
+        stack.append((depth, is_agent or inside_agent))
+    return total / 1000
+
+
+def main():
+    print(f"{'mode':<8}{'median ms':>12}{'min ms':>10}{'agent modules':>15}{'agents.* ms':>13}")
+    for lazy in (False, True):
+        runs = [startup(lazy) for _ in range(RUNS)]
+        times = [seconds * 1000 for seconds, _ in runs]
+        agent_ms = statistics.median(agent_import_time(lazy) for _ in range(RUNS))
+        label = "lazy" if lazy else "eager"
+        print(f"{label:<8}{statistics.median(times):>12.1f}{min(times):>10.1f}{runs[0][1]:>15}{agent_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Process pool benchmark
+----------------------
+Measures TextRank summarization throughput with the agent executed on the
+thread pool versus the pre-warmed process pool (`EXECUTOR = "process"`).
+Threads are serialized by the GIL, so only the process pool scales with the
+number of cores. Each request sends a different document and the result
+cache is cleared per executor, so every request is summarized.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_process_pool
+"""
+import asyncio
+import time
+
+import httpx
+
+import agents.dspy_integration as dspy_integration
+from app.main import app, registry
+from benchmarks.bench_event_loop import make_document
+
+REQUESTS = 16
+SENTENCES = 150
+
+
+async def run(process_pool_size: int) -> float:
+    dspy_integration.AGENT_PROCESS_POOL_SIZE = process_pool_size
+    dspy_integration.shutdown_process_pool()
+    dspy_integration.start_process_pool(registry.process_agent_files())
+    dspy_integration.clear_result_cache()
+    documents = [make_document(SENTENCES, seed) for seed in range(REQUESTS)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client.get("/agent/textrank_summarizer", params={"TEXT_TO_SUMMARIZE": document})
+            for document in documents
+        ))
+        elapsed = time.perf_counter() - start
+    dspy_integration.shutdown_process_pool()
+    return REQUESTS / elapsed
+
+
+def main():
+    workers = dspy_integration.AGENT_PROCESS_POOL_SIZE
+    print(f"{REQUESTS} concurrent textrank requests ({SENTENCES} sentences)")
+    print(f"{'executor':<20}{'req/s':>10}")
+    for label, size in (("thread pool", 0), (f"process pool({workers})", workers)):
+        print(f"{label:<20}{asyncio.run(run(size)):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Result cache benchmark
+----------------------
+Measures TextRank summarization throughput through the dispatcher with the
+agent result cache disabled versus enabled, for a workload where a few
+documents are requested over and over.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_result_cache
+"""
+import asyncio
+import time
+
+import agents.dspy_integration as dspy_integration
+from agents.dspy_integration import AgentContext, clear_result_cache, result_cache_stats, run_agent
+from app.main import registry
+from benchmarks.bench_event_loop import make_document
+
+REQUESTS = 200
+DOCUMENTS = 5
+SENTENCES = 60
+
+
+async def run(cache_bytes: int) -> float:
+    dspy_integration.AGENT_RESULT_CACHE_BYTES = cache_bytes
+    dspy_integration.AGENT_PROCESS_POOL_SIZE = 0  # keep the comparison about caching, not process start-up
+    clear_result_cache()
+    module = registry.get("textrank_summarizer")
+    documents = [make_document(SENTENCES) + f" Document {i}." for i in range(DOCUMENTS)]
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        await run_agent(module, AgentContext({"TEXT_TO_SUMMARIZE": documents[i % DOCUMENTS], "num_sentences": 2}))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{REQUESTS} textrank requests over {DOCUMENTS} distinct documents ({SENTENCES} sentences)")
+    print(f"{'cache':<12}{'req/s':>12}")
+    default_bytes = dspy_integration.AGENT_RESULT_CACHE_BYTES
+    for label, size in (("disabled", 0), ("enabled", default_bytes)):
+        print(f"{label:<12}{asyncio.run(run(size)):>12.1f}")
+    print(result_cache_stats())
+
+
+if __name__ == "__main__":
+    main()
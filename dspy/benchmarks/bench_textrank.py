@@ -0,0 +1,63 @@
+"""
+TextRank ranking benchmark
+--------------------------
+Ranks the sentences of documents of growing size with the previous
+implementation, one `_calculate_similarity` call per ordered pair of
+sentences in Python lists, versus the agent's NumPy similarity matrix, and
+checks that both give exactly the same scores. The pairwise version is not
+run again once a single document takes longer than BUDGET_S.
+
+Usage (from the dspy folder):
+    python -m benchmarks.bench_textrank
+"""
+import time
+
+from agents.textrank_summarizer import TextRankSummarizerAgent
+from benchmarks.bench_event_loop import make_document
+
+SIZES = (100, 500, 1_000, 2_000, 5_000)
+BUDGET_S = 10.0
+
+
+def pairwise_scores(agent: TextRankSummarizerAgent, sentences) -> list:
+    n = len(sentences)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                matrix[i][j] = agent._calculate_similarity(sentences[i], sentences[j])
+    for i in range(n):
+        row_sum = sum(matrix[i])
+        if row_sum > 0:
+            matrix[i] = [sim / row_sum for sim in matrix[i]]
+    scores = [1.0 / n] * n
+    new_scores = [0.0] * n
+    for i in range(n):
+        for j in range(n):
+            new_scores[i] += matrix[j][i] * scores[j]
+    return new_scores
+
+
+def main():
+    agent = TextRankSummarizerAgent()
+    agent._rank_sentences(["Import NumPy.", "Outside the timing."])
+    print(f"{'sentences':>10}{'pairwise ms':>14}{'numpy ms':>12}{'speed-up':>10}")
+    pairwise_blocked = False
+    for size in SIZES:
+        sentences = agent._split_into_sentences(make_document(size))
+        start = time.perf_counter()
+        actual = agent._rank_sentences(sentences)
+        numpy_s = time.perf_counter() - start
+        if pairwise_blocked:
+            print(f"{len(sentences):>10}{'skipped':>14}{numpy_s * 1000:>12.1f}{'':>10}")
+            continue
+        start = time.perf_counter()
+        expected = pairwise_scores(agent, sentences)
+        pairwise_s = time.perf_counter() - start
+        assert actual == expected, "NumPy ranking disagrees with the pairwise ranking"
+        pairwise_blocked = pairwise_s > BUDGET_S
+        print(f"{len(sentences):>10}{pairwise_s * 1000:>14.1f}{numpy_s * 1000:>12.1f}{pairwise_s / numpy_s:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
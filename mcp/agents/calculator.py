@@ -1,11 +1,34 @@
 import ast
 import logging
+import sys
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, Query, Body
+from fastapi import APIRouter, Query, Body, Depends
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "MCP Agents",
+    "description": "Evaluates an arithmetic expression with context sharing via MCP.",
+    "details": "This agent demonstrates basic MCP functionality by evaluating arithmetic expressions and sharing the result through the Module Context Protocol. It safely evaluates expressions using a secure evaluation method and maintains context between calls.",
+    "instructions": "POST to /agents/calculator with a JSON payload containing the expression. Example: {\"expression\": \"3 + 4 * 2\"}",
+    "example_output": "{\"agent\": \"calculator\", \"result\": {\"result\": 11, \"context\": {\"expression\": \"3 + 4 * 2\", \"previous_result\": null}}}"
+}
+
+# Seconds the dispatcher allows one calculation before answering 504
+TIMEOUT = 5
+
+# Seconds the dispatcher caches a result for the same expression. A cached
+# answer skips the MCP context update, which only echoes the expression back.
+CACHE_TTL = 60
+
+# Largest power (in bits) the calculator computes. The agent runs on a thread
+# that cannot be interrupted, so something like 9**9**9**9 is refused up front
+# instead of pinning a worker inside a single C-level multiplication.
+MAX_POW_BITS = 1_000_000
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Global variable expected to be set externally.
+# Global variable for standalone use; the dispatcher passes the expression in the agent context.
 # Example: EXPRESSION = "3 + 4 * 2"
 try:
     EXPRESSION
@@ -41,10 +64,26 @@ def safe_arithmetic_eval(expr: str) -> float:
         elif not isinstance(node, valid_nodes):
             raise ValueError(f"Node not allowed: {type(node).__name__}")
 
+    tree = ast.fix_missing_locations(_BoundedPow().visit(tree))
     compiled = compile(tree, filename="<safe_arithmetic_eval>", mode="eval")
-    return eval(compiled, {"__builtins__": {}})
+    return eval(compiled, {"__builtins__": {}, "_pow": _bounded_pow})
 
-def agent_main():
+def _bounded_pow(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and exponent > 0:
+        if exponent * abs(base).bit_length() > MAX_POW_BITS:
+            raise ValueError("Result too large")
+    return base ** exponent
+
+class _BoundedPow(ast.NodeTransformer):
+    """Rewrites `a ** b` into `_pow(a, b)` so exponent sizes are checked before computing."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.Call(func=ast.Name(id="_pow", ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+def agent_main(agent_context: Optional[AgentContext] = None):
     """
     Context-Aware Calculator Agent
     --------------------------------
@@ -55,13 +94,21 @@ def agent_main():
       calculator.EXPRESSION = "3 + 4 * 2"
       result = calculator.agent_main()
       # Expected output: {'result': 14, 'context': <MCP_updated_context>}
+
+      # Or with a per-request context, as the dispatcher does:
+      result = calculator.agent_main(AgentContext({"expression": "3 + 4 * 2"}, mcp_adapter=adapter))
     """
     logging.debug("Calculator agent started")
-    if not EXPRESSION:
+    if agent_context is None:
+        expression, adapter = EXPRESSION, globals().get("mcp_adapter")
+    else:
+        expression, adapter = agent_context.get("expression"), agent_context.resources.get("mcp_adapter")
+
+    if not expression:
         logging.debug("EXPRESSION is not set")
         return {"error": "EXPRESSION is not set."}
 
-    processed_expression = EXPRESSION
+    processed_expression = expression
 
     # Build initial context
     context = {
@@ -72,12 +119,12 @@ def agent_main():
     # Update context via MCP
     try:
         logging.debug("Updating context")
-        if 'mcp_adapter' not in globals():
+        if adapter is None:
             logging.error("MCP adapter not injected")
             # Continue without MCP functionality
             updated_context = context
         else:
-            updated_context = mcp_adapter.send_context(context)
+            updated_context = adapter.send_context(context)
         logging.debug(f"Updated context: {updated_context}")
     except Exception as exc:
         logging.exception("Failed to update context")
@@ -96,9 +143,10 @@ def agent_main():
 
 def register_routes(router: APIRouter):
     """Registers the calculator agent's routes with the provided APIRouter."""
+    from app.mcp_adapter import MCPAdapter, get_mcp_adapter
 
     @router.post("/agents/calculator", summary="Evaluates arithmetic expressions with context sharing", response_model=Dict[str, Any], tags=["MCP Agents"])
-    async def calculator_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"expression": "3 + 4 * 2"}}})):
+    async def calculator_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"expression": "3 + 4 * 2"}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
         """
         Evaluates an arithmetic expression with context sharing via MCP.
 
@@ -143,13 +191,7 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        global EXPRESSION
-        EXPRESSION = payload.get("expression")
-        
-        # Inject the adapter so code references the same place that tests can patch
-        global mcp_adapter
-        from app.mcp_adapter import MCPAdapter
-        mcp_adapter = MCPAdapter()
+        agent_context = AgentContext({"expression": payload.get("expression")}, mcp_adapter=mcp_adapter)
         
-        output = agent_main()
+        output = await run_agent(sys.modules[__name__], agent_context)
         return {"agent": "calculator", "result": output}
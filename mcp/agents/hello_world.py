@@ -1,2 +1,12 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "Simple Agents",
+    "description": "Returns a simple hello world message.",
+    "instructions": "Call /agent/hello_world with no additional parameters."
+}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
 def agent_main():
     return "Welcome to the Agent Base Framework! (https://github.com/bar181/fastapi-agents)"
\ No newline at end of file
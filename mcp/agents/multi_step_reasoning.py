@@ -1,29 +1,98 @@
 # agents/multi_step_reasoning.py
 
 import logging
+import math
+import sys
+import uuid
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, HTTPException, Request, Depends
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "MCP Agents",
+    "description": "Iteratively refines a hypothesis through context sharing and updates via MCP.",
+    "details": "This agent demonstrates advanced reasoning capabilities using MCP for state management. It takes an initial hypothesis and iteratively refines it by sharing and updating context through MCP. The agent continues refining the hypothesis until a final answer is received from MCP or the maximum number of iterations is reached. This showcases how MCP can be used for complex, multi-step reasoning processes.",
+    "instructions": "POST to /agents/multi_step_reasoning with a JSON payload containing an initial hypothesis. Example: {\"hypothesis\": \"The Earth is flat\"}",
+    "example_output": "{\"agent\": \"multi_step_reasoning\", \"result\": {\"final_answer\": \"The Earth is an oblate spheroid\", \"context\": {\"iteration\": 1, \"hypothesis\": \"The Earth is flat\"}}}"
+}
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Global variable expected to be set externally.
+# Longest final_answer_wait honoured, in seconds; larger values are clamped to it
+MAX_FINAL_ANSWER_WAIT = 30.0
+
+INVALID_FINAL_ANSWER_WAIT = "final_answer_wait must be a non-negative number of seconds."
+
+# Global variable for standalone use; the dispatcher passes the hypothesis in the agent context.
 try:
     HYPOTHESIS
 except NameError:
     HYPOTHESIS = None
 
-def agent_main():
+def final_answer_wait(value: Any) -> float:
+    """
+    Seconds to wait for a published final answer: `value` clamped to
+    [0, MAX_FINAL_ANSWER_WAIT], with None meaning 0.
+
+    Raises ValueError for anything but a finite, non-negative number.
+    """
+    if value is None:
+        return 0.0
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(INVALID_FINAL_ANSWER_WAIT)
+    return min(float(value), MAX_FINAL_ANSWER_WAIT)
+
+def _context(payload: Dict[str, Any], mcp_adapter) -> AgentContext:
+    """The agent context of a route's payload; an invalid final_answer_wait is a 400."""
+    try:
+        wait = final_answer_wait(payload.get("final_answer_wait"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AgentContext({"hypothesis": payload.get("hypothesis"), "final_answer_wait": wait}, mcp_adapter=mcp_adapter)
+
+def agent_main(agent_context: Optional[AgentContext] = None):
     """
     Multi-Step Reasoning Agent
     ---------------------------
     Purpose: Iteratively refine a hypothesis by sharing and updating context through MCP.
+
+    The hypothesis and MCP adapter come from the per-request agent context,
+    or from the HYPOTHESIS / mcp_adapter globals when called without one.
+    """
+    for event in agent_stream(agent_context):
+        pass
+    return event["result"]
+
+def agent_stream(agent_context: Optional[AgentContext] = None):
+    """
+    Streaming variant of agent_main.
+
+    Yields an "iteration" event after every MCP round trip, a "waiting" event
+    while it waits for MCP to publish a final answer (`final_answer_wait`),
+    and ends with a "result" event carrying what agent_main returns.
     """
     logging.debug("Multi-Step Reasoning agent started")
-    if not HYPOTHESIS:
-        logging.debug("HYPOTHESIS is not set")
-        return {"error": "HYPOTHESIS is not set."}
+    if agent_context is None:
+        hypothesis, adapter = HYPOTHESIS, globals().get("mcp_adapter")
+    else:
+        hypothesis, adapter = agent_context.get("hypothesis"), agent_context.resources.get("mcp_adapter")
 
-    hypothesis = HYPOTHESIS
+    if not hypothesis:
+        logging.debug("HYPOTHESIS is not set")
+        yield {"event": "result", "result": {"error": "HYPOTHESIS is not set."}}
+        return
+
+    # All sends of this run share a session, so after the first one MCP
+    # receives only what changed (see MCPAdapter.send_context)
+    session = uuid.uuid4().hex
+    try:
+        yield from _refine(hypothesis, adapter, agent_context, session)
+    finally:
+        if adapter is not None and hasattr(adapter, "end_session"):
+            adapter.end_session(session)
+
+def _refine(hypothesis: str, adapter, agent_context: Optional[AgentContext], session: str):
     context = {
         "hypothesis": hypothesis,
         "iteration": 0,
@@ -32,28 +101,35 @@ def agent_main():
     max_iterations = 5
 
     for i in range(max_iterations):
+        if agent_context is not None:
+            # Stop between MCP round trips once the request deadline has passed
+            agent_context.check_deadline()
         context["iteration"] = i
         # Update context via MCP
         try:
             logging.debug("Updating context (iteration %d)", i)
-            if 'mcp_adapter' not in globals():
+            if adapter is None:
                 logging.error("MCP adapter not injected")
                 # Continue without MCP functionality
                 updated_context = context
             else:
-                updated_context = mcp_adapter.send_context(context)
+                updated_context = adapter.send_context(context, session=session)
             logging.debug("Updated context: %s", updated_context)
         except Exception as exc:
             logging.exception("Failed to update context")
-            return {"error": f"Failed to update context: {str(exc)}"}
+            yield {"event": "result", "result": {"error": f"Failed to update context: {str(exc)}"}}
+            return
+
+        yield {"event": "iteration", "iteration": i, "hypothesis": hypothesis, "context": updated_context}
 
         # Check if MCP returned a final answer
         if "final_answer" in updated_context:
             logging.debug("Final answer received from MCP")
-            return {
+            yield {"event": "result", "result": {
                 "final_answer": updated_context["final_answer"],
                 "context": updated_context.get("context", {})
-            }
+            }}
+            return
 
         # Otherwise, refine the hypothesis
         hypothesis += " refined"
@@ -61,24 +137,48 @@ def agent_main():
         context["history"].append(hypothesis)
         logging.debug("Refined hypothesis: %s", hypothesis)
 
+    # Optionally wait for MCP to publish a final answer for this session,
+    # resolved by one pushed response instead of more round trips
+    wait = 0.0
+    if agent_context is not None:
+        try:
+            wait = final_answer_wait(agent_context.get("final_answer_wait"))
+        except ValueError:
+            logging.warning("Ignoring invalid final_answer_wait %r", agent_context.get("final_answer_wait"))
+    if wait > 0 and adapter is not None and hasattr(adapter, "wait_for_response"):
+        remaining = agent_context.remaining()
+        if remaining is not None:
+            wait = min(wait, max(remaining, 0))
+        yield {"event": "waiting", "seconds": wait}
+        response = adapter.wait_for_response(session, until=lambda r: "final_answer" in r, timeout=wait)
+        if "final_answer" in response:
+            logging.debug("Final answer published by MCP")
+            yield {"event": "result", "result": {
+                "final_answer": response["final_answer"],
+                "context": response.get("context", {})
+            }}
+            return
+
     # If we reach max iterations without final answer, return partial
     logging.debug("Maximum iterations reached")
-    return {
+    yield {"event": "result", "result": {
         "partial_hypothesis": hypothesis,
         "context": updated_context.get("context", {})
-    }
+    }}
 
 def register_routes(router: APIRouter):
     """Registers the multi-step reasoning agent's routes with the provided APIRouter."""
+    from app.mcp_adapter import MCPAdapter, get_mcp_adapter
 
     @router.post("/agents/multi_step_reasoning", summary="Iteratively refines a hypothesis through context updates", response_model=Dict[str, Any], tags=["MCP Agents"])
-    async def multi_step_reasoning_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"hypothesis": "The Earth is flat"}}})):
+    async def multi_step_reasoning_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"hypothesis": "The Earth is flat"}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
         """
         Iteratively refines a hypothesis through context sharing and updates via MCP.
 
         **Input:**
 
         *   **hypothesis (required, string):** The initial hypothesis to refine. Example: The Earth is flat
+        *   **final_answer_wait (optional, number):** Seconds to wait for MCP to publish a final answer after the last iteration, instead of returning the partial hypothesis straight away. At most 30; a negative or non-numeric value is a 400. Default: 0
 
         **Process:** The agent takes an initial hypothesis and iteratively refines it by sharing and updating context through MCP.
         The agent continues refining the hypothesis until a final answer is received from MCP or the maximum number of iterations is reached.
@@ -123,13 +223,27 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        global HYPOTHESIS
-        HYPOTHESIS = payload.get("hypothesis")
+        agent_context = _context(payload, mcp_adapter)
         
-        # Inject the adapter so code references the same place that tests can patch
-        global mcp_adapter
-        from app.mcp_adapter import MCPAdapter
-        mcp_adapter = MCPAdapter()
-        
-        output = agent_main()
+        output = await run_agent(sys.modules[__name__], agent_context)
         return {"agent": "multi_step_reasoning", "result": output}
+
+    @router.post("/agents/multi_step_reasoning/stream", summary="Streams each refinement iteration as it completes", tags=["MCP Agents"])
+    async def multi_step_reasoning_stream_route(request: Request, payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"hypothesis": "The Earth is flat"}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
+        """
+        Streaming variant of POST /agents/multi_step_reasoning.
+
+        Emits an `iteration` event after every MCP round trip (and a `waiting` event while it waits for a
+        published final answer), then a final `result` event with the same result the non-streaming endpoint returns. Send `Accept: text/event-stream` for
+        Server-Sent Events; otherwise the response is NDJSON (one JSON event per line).
+
+        **Example Output (NDJSON):**
+
+        ```
+        {"agent": "multi_step_reasoning", "event": "iteration", "iteration": 0, "hypothesis": "The Earth is flat", "context": {...}}
+        {"agent": "multi_step_reasoning", "event": "result", "result": {"final_answer": "The Earth is an oblate spheroid", "context": {...}}}
+        ```
+        """
+        from app.streaming import agent_stream_response
+        agent_context = _context(payload, mcp_adapter)
+        return agent_stream_response("multi_step_reasoning", sys.modules[__name__], agent_context, request)
@@ -1,6 +1,13 @@
 # agents/quote.py
 import random
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "Simple Agents",
+    "description": "Returns an inspirational quote.",
+    "instructions": "Call /agent/quote with no additional parameters."
+}
+
 # Collection of inspirational quotes
 QUOTES = [
     "Believe in yourself and all that you are.",
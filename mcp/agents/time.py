@@ -3,6 +3,13 @@ from typing import Dict, Any
 from fastapi import APIRouter
 from datetime import datetime, UTC 
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "Simple Agents",
+    "description": "Returns the current time in ISO 8601 format.",
+    "instructions": "Call /agent/time with no additional parameters."
+}
+
 class TimeAgent:
     """
     Time Agent
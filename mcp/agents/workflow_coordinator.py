@@ -1,12 +1,23 @@
 # agents/workflow_coordinator.py
 
 import logging
+import sys
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Depends
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "MCP Agents",
+    "description": "Coordinates and aggregates responses from multiple sub-agents using MCP for shared context.",
+    "details": "This agent demonstrates workflow coordination using MCP. It simulates a scenario where multiple sub-agents contribute to a final decision or report. The agent aggregates the responses from these sub-agents and updates the shared context accordingly using MCP. This showcases how MCP can be used to coordinate complex workflows involving multiple agents.",
+    "instructions": "POST to /agents/workflow_coordinator with no additional parameters. Example: {}",
+    "example_output": "{\"agent\": \"workflow_coordinator\", \"result\": {\"result\": \"Aggregated results: Result from agent 1, Result from agent 2, Result from agent 3\", \"context\": {\"sub_agent_results\": {\"agent1\": \"Result from agent 1\", \"agent2\": \"Result from agent 2\", \"agent3\": \"Result from agent 3\"}, \"workflow_status\": \"in_progress\"}}}"
+}
 
 logging.basicConfig(level=logging.DEBUG)
 
-def agent_main():
+def agent_main(agent_context: Optional[AgentContext] = None):
     """
     Workflow Coordinator Agent
     ----------------------------
@@ -16,8 +27,15 @@ def agent_main():
       from agents import workflow_coordinator
       result = workflow_coordinator.agent_main()
       # Expected output: {'result': <aggregated_result>, 'context': <updated_context>}
+
+    The MCP adapter comes from the per-request agent context, or from the
+    mcp_adapter global when called without one.
     """
     logging.debug("Workflow Coordinator agent started")
+    if agent_context is None:
+        adapter = globals().get("mcp_adapter")
+    else:
+        adapter = agent_context.resources.get("mcp_adapter")
 
     # Simulate results from sub-agents
     sub_agent_results = {
@@ -35,12 +53,12 @@ def agent_main():
     # Update context via MCP
     try:
         logging.debug("Updating context")
-        if 'mcp_adapter' not in globals():
+        if adapter is None:
             logging.error("MCP adapter not injected")
             # Continue without MCP functionality
             updated_context = context
         else:
-            updated_context = mcp_adapter.send_context(context)
+            updated_context = adapter.send_context(context)
         logging.debug(f"Updated context: {updated_context}")
     except Exception as exc:
         logging.exception("Failed to update context")
@@ -56,9 +74,10 @@ def agent_main():
 
 def register_routes(router: APIRouter):
     """Registers the workflow coordinator agent's routes with the provided APIRouter."""
+    from app.mcp_adapter import MCPAdapter, get_mcp_adapter
 
     @router.post("/agents/workflow_coordinator", summary="Coordinates and aggregates responses from multiple sub-agents", response_model=Dict[str, Any], tags=["MCP Agents"])
-    async def workflow_coordinator_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {}}})):
+    async def workflow_coordinator_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
         """
         Coordinates and aggregates responses from multiple sub-agents using MCP for shared context.
 
@@ -95,10 +114,7 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        # Inject the adapter so code references the same place that tests can patch
-        global mcp_adapter
-        from app.mcp_adapter import MCPAdapter
-        mcp_adapter = MCPAdapter()
+        agent_context = AgentContext(payload, mcp_adapter=mcp_adapter)
         
-        output = agent_main()
+        output = await run_agent(sys.modules[__name__], agent_context)
         return {"agent": "workflow_coordinator", "result": output}
\ No newline at end of file
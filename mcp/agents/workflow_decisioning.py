@@ -1,11 +1,22 @@
 import logging
+import sys
 import datetime
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Request, Depends
+from agents.dspy_integration import AgentContext, run_agent
+
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "category": "MCP Agents",
+    "description": "Makes intelligent workflow decisions based on task descriptions using MCP for state management.",
+    "details": "This agent demonstrates advanced decision-making capabilities using MCP. It examines a task description, selects appropriate sub-agents based on keywords in the description, executes them, and updates shared state using MCP. The agent outputs a detailed, step-by-step decision process, showcasing how MCP can be used for complex decisioning workflows.",
+    "instructions": "POST to /agents/workflow_decisioning with a JSON payload containing a key 'task_description'. Example: {\"task_description\": \"Please analyze and report the data\"}",
+    "example_output": "{\"agent\": \"workflow_decisioning\", \"result\": {\"result\": \"Aggregated results: Performed comprehensive data analysis\", \"context\": {\"task_description\": \"Please analyze and report the data\", \"selected_agents\": [\"analysis\"], \"sub_agent_results\": {\"analysis\": \"Performed comprehensive data analysis\"}, \"workflow_status\": \"in_progress\", \"steps\": [\"collect\", \"analyze\"]}}}"
+}
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Global variable expected to be set externally.
+# Global variable for standalone use; the dispatcher passes task_description in the agent context.
 try:
     TASK_DESCRIPTION
 except NameError:
@@ -31,7 +42,7 @@ class DummyMCPAdapter:
         return context
 
 
-def agent_main():
+def agent_main(agent_context: Optional[AgentContext] = None):
     """
     Workflow Decisioning Agent
     ---------------------------
@@ -48,17 +59,39 @@ def agent_main():
       #    'result': <final aggregated output with detailed steps>,
       #    'context': <updated context including MCP state>
       # }
+
+    The task description and MCP adapter come from the per-request agent
+    context, or from the TASK_DESCRIPTION / mcp_adapter globals when called
+    without one.
+    """
+    for event in agent_stream(agent_context):
+        pass
+    return event["result"]
+
+
+def agent_stream(agent_context: Optional[AgentContext] = None):
+    """
+    Streaming variant of agent_main.
+
+    Yields a "step" event as each decision step is recorded and ends with a
+    "result" event carrying what agent_main returns.
     """
     logging.debug("Workflow Decisioning agent started.")
+    if agent_context is None:
+        task_description, adapter = TASK_DESCRIPTION, globals().get("mcp_adapter")
+    else:
+        task_description = agent_context.get("task_description", "")
+        adapter = agent_context.resources.get("mcp_adapter")
 
     # Step 1: Log and record the task description.
-    logging.debug("Received task description: %s", TASK_DESCRIPTION)
-    steps = [f"Step 1: Received task '{TASK_DESCRIPTION}'."]
+    logging.debug("Received task description: %s", task_description)
+    steps = [f"Step 1: Received task '{task_description}'."]
+    yield {"event": "step", "step": steps[-1]}
     
     # Step 2: Decide which sub-agents to run based on keywords.
     sub_agent_results = {}
     selected_agents = []
-    lower_desc = TASK_DESCRIPTION.lower()
+    lower_desc = task_description.lower()
 
     if "analyze" in lower_desc:
         sub_agent_results["analysis"] = "Performed comprehensive data analysis"
@@ -75,32 +108,34 @@ def agent_main():
         selected_agents.append("default")
 
     steps.append(f"Step 2: Analyzed keywords and selected agents: {', '.join(selected_agents)}.")
+    yield {"event": "step", "step": steps[-1]}
     logging.debug("Selected sub-agents: %s", selected_agents)
 
     # Step 3: Build the initial workflow context.
     context = {
-        "task_description": TASK_DESCRIPTION,
+        "task_description": task_description,
         "selected_agents": selected_agents,
         "sub_agent_results": sub_agent_results,
         "workflow_status": "in_progress",
         "steps": steps
     }
     steps.append("Step 3: Executed sub-agents and collected results.")
+    yield {"event": "step", "step": steps[-1]}
 
     # Step 4: Update context via MCP.
     try:
         logging.debug("Updating context via MCP.")
-        if "mcp_adapter" not in globals():
+        if adapter is None:
             logging.warning("MCP adapter not injected; using dummy adapter for simulation.")
-            global mcp_adapter
-            mcp_adapter = DummyMCPAdapter()
+            adapter = DummyMCPAdapter()
         # The adapter returns a new context, possibly with modified steps.
-        context = mcp_adapter.send_context(context)
+        context = adapter.send_context(context)
         # Note: Do not update local 'steps' here, we'll rely on context["steps"].
         logging.debug("Updated context: %s", context)
     except Exception as exc:
         logging.exception("Failed to update context via MCP.")
-        return {"error": f"Failed to update context: {str(exc)}"}
+        yield {"event": "result", "result": {"error": f"Failed to update context: {str(exc)}"}}
+        return
 
     # Step 5: Generate final output using the steps from the updated context.
     final_output = context.get(
@@ -109,14 +144,15 @@ def agent_main():
     )
     detailed_steps = "\n".join(context.get("steps", []))
     final_detailed_output = f"{final_output}\n\nDetailed Steps:\n{detailed_steps}"
-    return {"result": final_detailed_output, "context": context}
+    yield {"event": "result", "result": {"result": final_detailed_output, "context": context}}
 
 
 def register_routes(router: APIRouter):
     """Registers the workflow decisioning agent's routes with the provided APIRouter."""
+    from app.mcp_adapter import MCPAdapter, get_mcp_adapter
 
     @router.post("/agents/workflow_decisioning", summary="Makes intelligent workflow decisions based on task descriptions", response_model=Dict[str, Any], tags=["MCP Agents"])
-    async def workflow_decisioning_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"task_description": "Please analyze and report the data"}}})):
+    async def workflow_decisioning_route(payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"task_description": "Please analyze and report the data"}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
         """
         Makes intelligent workflow decisions based on task descriptions using MCP for state management.
 
@@ -161,17 +197,33 @@ def register_routes(router: APIRouter):
         }
         ```
         """
-        global TASK_DESCRIPTION
-        TASK_DESCRIPTION = payload.get("task_description", "")
+        agent_context = AgentContext({"task_description": payload.get("task_description", "")}, mcp_adapter=mcp_adapter)
         
-        # Inject the adapter so code references the same place that tests can patch
-        global mcp_adapter
-        from app.mcp_adapter import MCPAdapter
-        mcp_adapter = MCPAdapter()
-        
-        output = agent_main()
+        output = await run_agent(sys.modules[__name__], agent_context)
         return {"agent": "workflow_decisioning", "result": output}
 
+    @router.post("/agents/workflow_decisioning/stream", summary="Streams each workflow decision step as it completes", tags=["MCP Agents"])
+    async def workflow_decisioning_stream_route(request: Request, payload: Dict[str, Any] = Body(..., examples={"Example": {"value": {"task_description": "Please analyze and report the data"}}}), mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
+        """
+        Streaming variant of POST /agents/workflow_decisioning.
+
+        Emits a `step` event as each decision step is recorded, then a final `result` event with the
+        same result the non-streaming endpoint returns. Send `Accept: text/event-stream` for
+        Server-Sent Events; otherwise the response is NDJSON (one JSON event per line).
+
+        **Example Output (NDJSON):**
+
+        ```
+        {"agent": "workflow_decisioning", "event": "step", "step": "Step 1: Received task 'Please analyze and report the data'."}
+        {"agent": "workflow_decisioning", "event": "step", "step": "Step 2: Analyzed keywords and selected agents: analysis, report."}
+        {"agent": "workflow_decisioning", "event": "step", "step": "Step 3: Executed sub-agents and collected results."}
+        {"agent": "workflow_decisioning", "event": "result", "result": {"result": "...", "context": {...}}}
+        ```
+        """
+        from app.streaming import agent_stream_response
+        agent_context = AgentContext({"task_description": payload.get("task_description", "")}, mcp_adapter=mcp_adapter)
+        return agent_stream_response("workflow_decisioning", sys.modules[__name__], agent_context, request)
+
 
 if __name__ == "__main__":
     # Example execution with a sample task description.
@@ -0,0 +1,83 @@
+"""
+JSON Patch (RFC 6902) helpers for delta-encoded MCP context updates.
+
+Only the operations needed to describe how an agent context evolves between
+two sends are produced: "add", "remove" and "replace". A list that only grew
+at the end (such as a reasoning `history`) becomes one "add" per new item
+at `/-`, so the patch size does not depend on how long the list already is.
+"""
+import copy
+from typing import Any, Dict, List
+
+
+class JsonPatchError(ValueError):
+    """Raised when a patch does not apply to the document."""
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Operations that turn the JSON document `old` into `new`."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{"op": "remove", "path": f"{path}/{_escape(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key in old:
+                ops.extend(make_patch(old[key], value, child))
+            else:
+                ops.append({"op": "add", "path": child, "value": value})
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old) and new[:len(old)] == old:
+        return [{"op": "add", "path": f"{path}/-", "value": value} for value in new[len(old):]]
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """Return a copy of `document` with `patch` applied; the input is left untouched."""
+    document = copy.deepcopy(document)
+    for op in patch:
+        try:
+            kind, path = op["op"], op["path"]
+        except (KeyError, TypeError):
+            raise JsonPatchError(f"Malformed operation: {op!r}") from None
+        if path == "":
+            if kind not in ("add", "replace"):
+                raise JsonPatchError(f"Cannot {kind} the whole document")
+            document = copy.deepcopy(op["value"])
+            continue
+        *parents, last = [_unescape(token) for token in path.split("/")[1:]]
+        target = document
+        try:
+            for token in parents:
+                target = target[int(token)] if isinstance(target, list) else target[token]
+            if isinstance(target, list):
+                index = len(target) if last == "-" else int(last)
+                if kind == "add":
+                    target.insert(index, copy.deepcopy(op["value"]))
+                elif kind == "remove":
+                    del target[index]
+                elif kind == "replace":
+                    target[index] = copy.deepcopy(op["value"])
+                else:
+                    raise JsonPatchError(f"Unsupported operation: {kind}")
+            elif kind in ("add", "replace"):
+                if kind == "replace" and last not in target:
+                    raise JsonPatchError(f"Path does not exist: {path}")
+                target[last] = copy.deepcopy(op["value"])
+            elif kind == "remove":
+                del target[last]
+            else:
+                raise JsonPatchError(f"Unsupported operation: {kind}")
+        except (KeyError, IndexError, ValueError, TypeError) as exc:
+            if isinstance(exc, JsonPatchError):
+                raise
+            raise JsonPatchError(f"Cannot apply {kind} at {path}: {exc}") from None
+    return document
@@ -0,0 +1,120 @@
+"""
+Lazy agent route registration
+-----------------------------
+By default every agent module listed in ROUTE_AGENTS is imported at startup
+so its `register_routes` can add the dedicated endpoints. With
+LAZY_AGENT_ROUTES=1 the routes, their OpenAPI metadata and the `/agents`
+listing come from `app/agent_manifest.json` instead, and an agent module is
+only imported when one of its endpoints is first called.
+
+Regenerate the manifest after changing an agent's routes or metadata
+(from the mcp folder):
+    python -m app.lazy_routes
+"""
+import importlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.routing import APIRoute
+
+from agents.dspy_integration import AgentRegistry
+
+LAZY_AGENT_ROUTES = os.environ.get("LAZY_AGENT_ROUTES", "").lower() in ("1", "true", "yes")
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_manifest.json")
+
+# Agents whose register_routes() adds dedicated endpoints, in registration order
+ROUTE_AGENTS = ["classifier", "calculator", "multi_step_reasoning", "workflow_coordinator", "workflow_decisioning"]
+
+# Prefix of the router the agent routes are registered on (router in app/routes.py)
+ROUTE_PREFIX = ""
+
+
+def load_manifest() -> Dict[str, Any]:
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def create_registry(lazy: Optional[bool] = None) -> AgentRegistry:
+    """Agent registry for the app; built from the manifest in lazy mode."""
+    lazy = LAZY_AGENT_ROUTES if lazy is None else lazy
+    return AgentRegistry(manifest=load_manifest()["agents"]) if lazy else AgentRegistry()
+
+
+def register_agent_routes(router: APIRouter, lazy: Optional[bool] = None) -> None:
+    """Add the dedicated agent routes to `router`, importing the agents now or on first call."""
+    lazy = LAZY_AGENT_ROUTES if lazy is None else lazy
+    if not lazy:
+        for name in ROUTE_AGENTS:
+            importlib.import_module(f"agents.{name}").register_routes(router)
+        return
+    for spec in load_manifest()["routes"]:
+        _add_lazy_route(router, spec)
+
+
+def _add_lazy_route(router: APIRouter, spec: Dict[str, Any]) -> None:
+    handler = None
+
+    async def lazy_endpoint(request: Request):
+        nonlocal handler
+        if handler is None:
+            handler = _real_route_handler(spec)
+        return await handler(request)
+
+    router.add_api_route(
+        spec["path"],
+        lazy_endpoint,
+        methods=spec["methods"],
+        name=spec["name"],
+        summary=spec["summary"],
+        description=spec["description"],
+        tags=spec["tags"],
+        openapi_extra=spec["openapi"],
+    )
+
+
+def _real_route_handler(spec: Dict[str, Any]):
+    """Import the agent module and return the request handler of the route it registers for `spec`."""
+    scratch = APIRouter()
+    importlib.import_module(spec["module"]).register_routes(scratch)
+    for route in scratch.routes:
+        if isinstance(route, APIRoute) and route.path == spec["path"] and route.methods == set(spec["methods"]):
+            return route.get_route_handler()
+    raise RuntimeError(f"{spec['module']} does not register {spec['path']}; regenerate {MANIFEST_PATH}")
+
+
+def build_manifest() -> Dict[str, Any]:
+    """Import every agent and record its `/agents` entry and routes for lazy mode."""
+    routes: List[Dict[str, Any]] = []
+    for name in ROUTE_AGENTS:
+        module_name = f"agents.{name}"
+        scratch = APIRouter()
+        importlib.import_module(module_name).register_routes(scratch)
+        schema_app = FastAPI()
+        schema_app.include_router(scratch, prefix=ROUTE_PREFIX)
+        paths = schema_app.openapi()["paths"]
+        for route in scratch.routes:
+            if not isinstance(route, APIRoute):
+                continue
+            for method in sorted(route.methods):
+                operation = paths[ROUTE_PREFIX + route.path][method.lower()]
+                routes.append({
+                    "module": module_name,
+                    "path": route.path,
+                    "methods": [method],
+                    "name": route.name,
+                    "summary": route.summary,
+                    "description": route.description,
+                    "tags": route.tags,
+                    "openapi": {key: operation[key] for key in ("parameters", "requestBody", "responses") if key in operation},
+                })
+    return {"agents": AgentRegistry().manifest(), "routes": routes}
+
+
+if __name__ == "__main__":
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(build_manifest(), f, indent=2)
+        f.write("\n")
+    print(f"Wrote {MANIFEST_PATH}")
@@ -0,0 +1,293 @@
+"""
+Linear-time regular expressions
+-------------------------------
+A restricted regex engine whose `search` takes time proportional to the
+length of the text, whatever the pattern, so a rule cannot tie up a worker
+with catastrophic backtracking the way `(a+)+$` does in `re`.
+
+Patterns use `re` syntax and are parsed by `re`'s own parser. Everything
+that can be decided without backtracking is supported: literals, classes,
+`.`, alternation, groups, greedy and lazy repeats, `^ $ \\A \\Z \\b \\B`,
+and the MULTILINE, DOTALL, VERBOSE and (whole-pattern) ASCII flags.
+Constructs that need backtracking (backreferences, lookarounds, conditional
+groups, atomic groups and possessive repeats) are rejected with
+UnsupportedPattern, as are IGNORECASE and LOCALE. For the patterns it
+accepts, `search(text)` is true exactly when `re.search(pattern, text)`
+finds a match.
+
+The pattern becomes a Thompson NFA, run as a DFA built lazily: each set of
+NFA states reached so far, together with the kind of character on either
+side of the position (for anchors and word boundaries), is one DFA state,
+and transitions are cached as they are first taken. The cache is bounded;
+when it fills up it is dropped and rebuilt, which keeps the worst case at
+one NFA-sized step per character.
+"""
+import re
+from typing import Callable, Dict, FrozenSet, List, Tuple
+
+try:
+    from re import _parser as _sre_parser
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parser
+
+# Most NFA states a pattern may compile to; counted repeats such as x{1000} are expanded
+MAX_STATES = 10_000
+
+# Most cached DFA states per pattern before the cache is dropped
+MAX_DFA_STATES = 4_096
+
+_REJECTED = {
+    "GROUPREF": "backreference",
+    "GROUPREF_EXISTS": "conditional group",
+    "ASSERT": "lookahead or lookbehind",
+    "ASSERT_NOT": "negative lookahead or lookbehind",
+    "ATOMIC_GROUP": "atomic group",
+    "POSSESSIVE_REPEAT": "possessive repeat",
+}
+_REJECTED_FLAGS = {re.IGNORECASE: "IGNORECASE", re.LOCALE: "LOCALE"}
+
+# Kinds of character around a position: what anchors and \b look at
+_START = _END = -1
+_OTHER, _NEWLINE, _ASCII_WORD, _WORD, _FINAL_NEWLINE = range(5)
+
+# NFA instructions
+_CHAR, _SPLIT, _ASSERT, _MATCH = range(4)
+
+
+class UnsupportedPattern(ValueError):
+    """The pattern needs backtracking, or a feature the linear engine does not implement."""
+
+
+def _char_kind(char: str) -> int:
+    if char == "\n":
+        return _NEWLINE
+    if char == "_" or char.isalnum():
+        return _ASCII_WORD if char.isascii() else _WORD
+    return _OTHER
+
+
+def _is_word(kind: int, ascii_only: bool) -> bool:
+    return kind == _ASCII_WORD or (kind == _WORD and not ascii_only)
+
+
+def _category(name: str, ascii_only: bool) -> Callable[[str], bool]:
+    if name == "CATEGORY_DIGIT":
+        return (lambda c: "0" <= c <= "9") if ascii_only else str.isdecimal
+    if name == "CATEGORY_SPACE":
+        return (lambda c: c in " \t\n\r\f\v") if ascii_only else str.isspace
+    if name == "CATEGORY_WORD":
+        if ascii_only:
+            return lambda c: c.isascii() and (c == "_" or c.isalnum())
+        return lambda c: c == "_" or c.isalnum()
+    if name.startswith("CATEGORY_NOT_"):
+        positive = _category("CATEGORY_" + name[len("CATEGORY_NOT_"):], ascii_only)
+        return lambda c: not positive(c)
+    raise UnsupportedPattern(f"unsupported character category {name}")
+
+
+class _Closure:
+    """The NFA states a DFA state stands for, and its transitions taken so far."""
+
+    __slots__ = ("chars", "match", "steps")
+
+    def __init__(self, chars: Tuple[int, ...], match: bool):
+        self.chars = chars
+        self.match = match
+        self.steps: Dict[str, FrozenSet[int]] = {}
+
+
+class LinearRegex:
+    """
+    A pattern compiled for linear-time search.
+
+    Raises UnsupportedPattern for patterns it cannot run without
+    backtracking, and re.error for invalid ones.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        parsed = _sre_parser.parse(pattern)
+        flags = parsed.state.flags
+        self._check_flags(flags)
+        # (kind, argument, next state) per state; SPLIT has two next states
+        self._states: List[list] = [[_MATCH, None, None]]
+        start = self._sequence(parsed, flags, 0)
+        self._start: FrozenSet[int] = frozenset([start])
+        # Without anchors or \b, the characters around a position never matter
+        self._anchored = any(kind == _ASSERT for kind, _argument, _next in self._states)
+        self._closures: Dict[Tuple[FrozenSet[int], int, int], _Closure] = {}
+
+    def __repr__(self) -> str:
+        return f"LinearRegex({self.pattern!r})"
+
+    # -- compilation --------------------------------------------------------
+
+    @staticmethod
+    def _check_flags(flags: int) -> None:
+        for flag, name in _REJECTED_FLAGS.items():
+            if flags & flag:
+                raise UnsupportedPattern(f"the {name} flag is not supported")
+
+    def _add(self, kind: int, argument, next_state) -> int:
+        if len(self._states) >= MAX_STATES:
+            raise UnsupportedPattern(f"pattern expands to more than {MAX_STATES} states")
+        self._states.append([kind, argument, next_state])
+        return len(self._states) - 1
+
+    def _sequence(self, items, flags: int, next_state: int) -> int:
+        # Built back to front, so each item is compiled knowing where it continues
+        for op, av in reversed(list(items)):
+            next_state = self._item(op, av, flags, next_state)
+        return next_state
+
+    def _item(self, op, av, flags: int, next_state: int) -> int:
+        name = str(op)
+        if name in _REJECTED:
+            raise UnsupportedPattern(f"{_REJECTED[name]} needs backtracking")
+        if op is _sre_parser.LITERAL:
+            char = chr(av)
+            return self._add(_CHAR, lambda c: c == char, next_state)
+        if op is _sre_parser.NOT_LITERAL:
+            char = chr(av)
+            return self._add(_CHAR, lambda c: c != char, next_state)
+        if op is _sre_parser.ANY:
+            return self._add(_CHAR, (lambda c: True) if flags & re.DOTALL else (lambda c: c != "\n"), next_state)
+        if op is _sre_parser.IN:
+            return self._add(_CHAR, self._char_set(av, flags), next_state)
+        if op is _sre_parser.AT:
+            return self._add(_ASSERT, (str(av), flags), next_state)
+        if op is _sre_parser.BRANCH:
+            branches = [self._sequence(branch, flags, next_state) for branch in av[1]]
+            state = branches[-1]
+            for branch in reversed(branches[:-1]):
+                state = self._add(_SPLIT, branch, state)
+            return state
+        if op is _sre_parser.SUBPATTERN:
+            _group, add_flags, del_flags, items = av
+            self._check_flags(add_flags)
+            if (add_flags | del_flags) & re.ASCII:
+                # re itself gets \W, \D and \S wrong under a scoped (?a:...), so only (?a) is accepted
+                raise UnsupportedPattern("the ASCII flag is only supported for the whole pattern")
+            return self._sequence(items, (flags | add_flags) & ~del_flags, next_state)
+        if op is _sre_parser.MAX_REPEAT or op is _sre_parser.MIN_REPEAT:
+            # Greedy and lazy repeats match the same texts; only the match found differs
+            low, high, items = av
+            if high == _sre_parser.MAXREPEAT:
+                loop = self._add(_SPLIT, None, next_state)
+                self._states[loop][1] = self._sequence(items, flags, loop)
+                state = loop
+            else:
+                state = next_state
+                for _ in range(high - low):
+                    state = self._add(_SPLIT, self._sequence(items, flags, state), next_state)
+            for _ in range(low):
+                state = self._sequence(items, flags, state)
+            return state
+        raise UnsupportedPattern(f"unsupported construct {name}")
+
+    @staticmethod
+    def _char_set(items, flags: int) -> Callable[[str], bool]:
+        ascii_only = bool(flags & re.ASCII)
+        negate = False
+        chars = set()
+        tests: List[Callable[[str], bool]] = []
+        for op, av in items:
+            if op is _sre_parser.NEGATE:
+                negate = True
+            elif op is _sre_parser.LITERAL:
+                chars.add(chr(av))
+            elif op is _sre_parser.RANGE:
+                low, high = chr(av[0]), chr(av[1])
+                tests.append(lambda c, low=low, high=high: low <= c <= high)
+            elif op is _sre_parser.CATEGORY:
+                tests.append(_category(str(av), ascii_only))
+            else:
+                raise UnsupportedPattern(f"unsupported character class item {op}")
+        if negate:
+            return lambda c: not (c in chars or any(test(c) for test in tests))
+        return lambda c: c in chars or any(test(c) for test in tests)
+
+    # -- matching -----------------------------------------------------------
+
+    @staticmethod
+    def _holds(assertion: str, flags: int, before: int, after: int) -> bool:
+        if assertion == "AT_BEGINNING":
+            return before == _START or (bool(flags & re.MULTILINE) and before == _NEWLINE)
+        if assertion == "AT_BEGINNING_STRING":
+            return before == _START
+        if assertion == "AT_END":
+            if flags & re.MULTILINE:
+                return after in (_END, _NEWLINE, _FINAL_NEWLINE)
+            return after in (_END, _FINAL_NEWLINE)
+        if assertion == "AT_END_STRING":
+            return after == _END
+        ascii_only = bool(flags & re.ASCII)
+        boundary = _is_word(before, ascii_only) != _is_word(after, ascii_only)
+        if assertion == "AT_BOUNDARY":
+            return boundary
+        if assertion == "AT_NON_BOUNDARY":
+            # As in re, \B never matches in an empty string
+            return not boundary and not (before == _START and after == _END)
+        raise UnsupportedPattern(f"unsupported anchor {assertion}")
+
+    def _closure(self, kernel: FrozenSet[int], before: int, after: int) -> _Closure:
+        """States reachable from `kernel` without reading a character, between `before` and `after`."""
+        states = self._states
+        seen = set()
+        chars = []
+        match = False
+        stack = list(kernel)
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            kind, argument, next_state = states[state]
+            if kind == _CHAR:
+                chars.append(state)
+            elif kind == _SPLIT:
+                stack.append(next_state)
+                stack.append(argument)
+            elif kind == _ASSERT:
+                if self._holds(argument[0], argument[1], before, after):
+                    stack.append(next_state)
+            else:
+                match = True
+        if len(self._closures) >= MAX_DFA_STATES:
+            self._closures.clear()
+        closure = self._closures[kernel, before, after] = _Closure(tuple(sorted(chars)), match)
+        return closure
+
+    def search(self, text: str) -> bool:
+        """Whether the pattern matches anywhere in `text`."""
+        closures, states, start = self._closures, self._states, self._start
+        kernel = start
+        if not self._anchored:
+            for char in text:
+                closure = closures.get((kernel, _OTHER, _OTHER)) or self._closure(kernel, _OTHER, _OTHER)
+                if closure.match:
+                    return True
+                kernel = closure.steps.get(char)
+                if kernel is None:
+                    kernel = closure.steps[char] = start | frozenset(
+                        states[state][2] for state in closure.chars if states[state][1](char))
+            return (closures.get((kernel, _OTHER, _OTHER)) or self._closure(kernel, _OTHER, _OTHER)).match
+
+        before = _START
+        last = len(text) - 1
+        for index, char in enumerate(text):
+            after = _char_kind(char)
+            if after == _NEWLINE and index == last:
+                after = _FINAL_NEWLINE
+            closure = closures.get((kernel, before, after)) or self._closure(kernel, before, after)
+            if closure.match:
+                return True
+            kernel = closure.steps.get(char)
+            if kernel is None:
+                # A match may also begin at the next position
+                kernel = closure.steps[char] = start | frozenset(
+                    states[state][2] for state in closure.chars if states[state][1](char))
+            before = _NEWLINE if after == _FINAL_NEWLINE else after
+        closure = closures.get((kernel, before, _END)) or self._closure(kernel, before, _END)
+        return closure.match
+
@@ -1,75 +1,70 @@
-import os
-from fastapi import FastAPI, Request, HTTPException
-from agents.dspy_integration import load_agent, run_agent
-from app.mcp_adapter import MCPAdapter
-from app.routes import router as agent_router
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+from agents.dspy_integration import AgentContext, AgentTimeoutError, RequestDeadlineMiddleware, run_agent
+from app.mcp_adapter import MCPAdapter, get_mcp_adapter
+from app.routes import router as agent_router, registry
 
-app = FastAPI(title="Fastapi MCP Agents")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled MCP client on this event loop; all MCP agents share it
+    adapter = get_mcp_adapter()
+    await adapter.start()
+    yield
+    await adapter.aclose()
+
+app = FastAPI(title="Fastapi MCP Agents", lifespan=lifespan)
+
+# Agents that run past their deadline answer with a structured 504
+app.add_middleware(RequestDeadlineMiddleware)
+
+@app.exception_handler(AgentTimeoutError)
+async def agent_timeout_handler(request: Request, exc: AgentTimeoutError):
+    return JSONResponse(status_code=504, content={"agent": exc.agent, "error": "timeout", "detail": str(exc)})
 app.include_router(agent_router)
 
 @app.get("/agent/{agent_name}")
-async def run_agent_get(agent_name: str, request: Request):
+async def run_agent_get(agent_name: str, request: Request, mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
     """Handle GET requests to /agent/{agent_name}"""
-    # Construct the path to the agent file
-    agent_file = os.path.join("agents", f"{agent_name}.py")
-    if not os.path.exists(agent_file):
+    # Look up the agent discovered at startup
+    agent_module = registry.get(agent_name)
+    if agent_module is None:
         raise HTTPException(status_code=404, detail="Agent not found")
 
     try:
-        # Load the agent module
-        agent_module = load_agent(agent_file)
-
-        # Initialize and inject MCP Adapter
-        mcp_adapter = MCPAdapter()
-        agent_module.mcp_adapter = mcp_adapter
-
-        # Set global variables from query parameters
-        if hasattr(agent_module, 'TOKEN') and 'token' in request.query_params:
-            agent_module.TOKEN = request.query_params['token']
-        if hasattr(agent_module, 'INPUT_TEXT') and 'INPUT_TEXT' in request.query_params:
-            agent_module.INPUT_TEXT = request.query_params['INPUT_TEXT']
-        if hasattr(agent_module, 'TEXT_TO_SUMMARIZE') and 'TEXT_TO_SUMMARIZE' in request.query_params:
-            agent_module.TEXT_TO_SUMMARIZE = request.query_params['TEXT_TO_SUMMARIZE']
+        # Query parameters and the MCP adapter form the per-request context
+        context = AgentContext(dict(request.query_params), mcp_adapter=mcp_adapter)
 
         # Run the agent
-        output = run_agent(agent_module)
+        output = await run_agent(agent_module, context)
 
         # Return result
         return {"agent": agent_name, "result": output}
+    except AgentTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing agent: {str(e)}")
 
 @app.post("/agents/{agent_name}")
-async def run_agent_post(agent_name: str, request: Request):
+async def run_agent_post(agent_name: str, request: Request, mcp_adapter: MCPAdapter = Depends(get_mcp_adapter)):
     """
     Runs an agent using agent_name.
-    Optionally sets EXPRESSION if posted in JSON.
+    The JSON body (expression, hypothesis, ...) is passed as the agent's context.
     """
-    # Construct the path to the agent file
-    agent_file = os.path.join("agents", f"{agent_name}.py")
-    if not os.path.exists(agent_file):
+    # Look up the agent discovered at startup
+    agent_module = registry.get(agent_name)
+    if agent_module is None:
         raise HTTPException(status_code=404, detail="Agent not found")
 
     try:
         # Parse request body
         data = await request.json()
-        expression = data.get("expression")
-
-        # Load the agent module
-        agent_module = load_agent(agent_file)
-
-        # Initialize and inject MCP Adapter
-        mcp_adapter = MCPAdapter()
-        agent_module.mcp_adapter = mcp_adapter
 
-        # Set global variables from request body
-        if expression and hasattr(agent_module, 'EXPRESSION'):
-            agent_module.EXPRESSION = expression
-        if 'hypothesis' in data and hasattr(agent_module, 'HYPOTHESIS'):
-            agent_module.HYPOTHESIS = data['hypothesis']
+        # The request body and the MCP adapter form the per-request context
+        context = AgentContext(data, mcp_adapter=mcp_adapter)
 
         # Run the agent
-        output = run_agent(agent_module)
+        output = await run_agent(agent_module, context)
 
         # Return result
         if "error" in output:
@@ -82,5 +77,7 @@ async def run_agent_post(agent_name: str, request: Request):
             "result": output["result"],
             "context": output.get("context", {})
         }
+    except AgentTimeoutError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing agent: {str(e)}")
\ No newline at end of file
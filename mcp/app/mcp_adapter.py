@@ -1,47 +1,847 @@
-import requests
+import asyncio
+import json
+import logging
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app import mcp_encoding
+from app.json_patch import make_patch
+
+# Connection pool limits of the shared MCP HTTP client
+MCP_MAX_CONNECTIONS = int(os.environ.get("MCP_MAX_CONNECTIONS", 100))
+MCP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("MCP_MAX_KEEPALIVE_CONNECTIONS", 20))
+
+# Seconds to wait for a connection / for the response of one MCP request
+MCP_CONNECT_TIMEOUT = float(os.environ.get("MCP_CONNECT_TIMEOUT", 2))
+MCP_READ_TIMEOUT = float(os.environ.get("MCP_READ_TIMEOUT", 10))
+
+# Retries after a failed attempt (connection error, timeout or 5xx), with
+# exponential backoff from MCP_RETRY_BACKOFF seconds and +/-50% jitter
+MCP_RETRIES = int(os.environ.get("MCP_RETRIES", 2))
+MCP_RETRY_BACKOFF = float(os.environ.get("MCP_RETRY_BACKOFF", 0.1))
+
+# The circuit opens after this many failed calls in a row and lets a trial
+# call through after MCP_BREAKER_RESET seconds
+MCP_BREAKER_THRESHOLD = int(os.environ.get("MCP_BREAKER_THRESHOLD", 5))
+MCP_BREAKER_RESET = float(os.environ.get("MCP_BREAKER_RESET", 30))
+
+# Versioned context sessions remembered for delta encoding (least recently used are dropped)
+MCP_MAX_SESSIONS = int(os.environ.get("MCP_MAX_SESSIONS", 1024))
+
+# Opt-in micro-batching of session-less send_context calls: sends arriving
+# within MCP_BATCH_WINDOW_MS of each other (at most MCP_BATCH_MAX of them) go
+# out as one POST /send/batch. 0 sends every context on its own.
+MCP_BATCH_WINDOW_MS = float(os.environ.get("MCP_BATCH_WINDOW_MS", 0))
+MCP_BATCH_MAX = int(os.environ.get("MCP_BATCH_MAX", 32))
+
+# Bytes of GET /response bodies kept for revalidation with If-None-Match
+# (least recently used sessions are dropped; 0 disables the cache)
+MCP_RESPONSE_CACHE_BYTES = int(os.environ.get("MCP_RESPONSE_CACHE_BYTES", 4 * 1024 * 1024))
+
+# Seconds a cached response is served without asking the endpoint, unless
+# the endpoint sets its own Cache-Control max-age. 0 always revalidates.
+MCP_RESPONSE_MAX_AGE = float(os.environ.get("MCP_RESPONSE_MAX_AGE", 0))
+
+# Seconds the endpoint may hold one long-poll request (GET /response/wait)
+# open, and the polling interval used instead when it has no such route
+MCP_LONG_POLL_SECONDS = float(os.environ.get("MCP_LONG_POLL_SECONDS", 20))
+MCP_POLL_INTERVAL = float(os.environ.get("MCP_POLL_INTERVAL", 0.5))
+
+# Request bodies of at least this many bytes (as JSON) use the first format
+# and compression in MCP_ENCODINGS that the endpoint advertises (see
+# app/mcp_encoding.py); smaller ones stay plain JSON. An empty list disables it.
+MCP_COMPRESS_MIN_BYTES = int(os.environ.get("MCP_COMPRESS_MIN_BYTES", 1024))
+MCP_ENCODINGS = [name.strip() for name in os.environ.get("MCP_ENCODINGS", "msgpack,zstd,gzip").split(",") if name.strip()]
+
+# Response header carrying the version the endpoint assigned to a session's context
+CONTEXT_VERSION_HEADER = "X-MCP-Context-Version"
+
+logger = logging.getLogger(__name__)
+
+# Warnings already logged by this process, see _warn_once
+_WARNED = set()
+_WARNED_LOCK = threading.Lock()
+
+# Failures the async API answers with its local fall-back values: HTTP errors,
+# contexts that cannot be encoded (e.g. NaN), bodies that are not JSON and
+# replies missing expected fields
+_FALLBACK_ERRORS = (httpx.HTTPError, ValueError, KeyError, TypeError)
+
+# Response extension holding the body _attempts decoded, see _json
+_JSON_BODY = "mcp.json"
+
+
+def _warn_once(key: str, message: str, *args: Any) -> None:
+    """Log a warning the first time `key` is seen; repeats go to DEBUG so hot paths stay quiet."""
+    with _WARNED_LOCK:
+        first = key not in _WARNED
+        _WARNED.add(key)
+    logger.log(logging.WARNING if first else logging.DEBUG, message, *args)
+
+
+def _clear_warning(key: str) -> None:
+    """Re-arm a warning, e.g. once the MCP endpoint answers again after an error."""
+    if key in _WARNED:
+        with _WARNED_LOCK:
+            _WARNED.discard(key)
+
+
+def _json(response: httpx.Response) -> Any:
+    """The JSON body of a response returned by MCPAdapter._attempts, which decodes it under the breaker."""
+    return response.extensions[_JSON_BODY]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling MCP while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for the MCP endpoint.
+
+    "closed": calls go through. After `threshold` failed calls in a row it
+    turns "open" and calls are refused for `reset_after` seconds; then one
+    trial call is let through ("half_open"), which closes the circuit if it
+    succeeds and opens it again if it fails.
+    """
+
+    def __init__(self, threshold: Optional[int] = None, reset_after: Optional[float] = None):
+        self.threshold = MCP_BREAKER_THRESHOLD if threshold is None else threshold
+        self.reset_after = MCP_BREAKER_RESET if reset_after is None else reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go to MCP now; in half_open only one trial call is in flight."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self) -> None:
+        """Give back the half_open trial slot of a call that was cancelled before it finished."""
+        with self._lock:
+            self._trial = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self.state
+            retry_in = None
+            if state == "open":
+                retry_in = round(self.opened_at + self.reset_after - time.monotonic(), 3)
+            return {"state": state, "consecutive_failures": self.failures, "retry_in": retry_in}
+
+
+class _ResponseCache:
+    """
+    Last GET /response body per session, for conditional requests.
+
+    Each entry remembers the session version it was fetched at, the ETag and
+    when it goes stale. While it is fresh and the session is still at that
+    version it is served locally; otherwise its ETag goes out as
+    If-None-Match and a 304 reuses the stored body.
+    """
+
+    def __init__(self):
+        # session -> (version, etag, body, fresh until)
+        self.entries: "OrderedDict[Optional[str], Tuple[Optional[int], Optional[str], bytes, float]]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def get(self, session: Optional[str]) -> Optional[Tuple[Optional[int], Optional[str], bytes, float]]:
+        with self._lock:
+            entry = self.entries.get(session)
+            if entry is not None:
+                self.entries.move_to_end(session)
+            return entry
+
+    def put(self, session: Optional[str], version: Optional[int], etag: Optional[str], body: bytes, max_age: float) -> None:
+        with self._lock:
+            self._drop(session)
+            if len(body) > MCP_RESPONSE_CACHE_BYTES:
+                return
+            self.entries[session] = (version, etag, body, time.monotonic() + max_age)
+            self.bytes += len(body)
+            while self.bytes > MCP_RESPONSE_CACHE_BYTES:
+                _, (_, _, evicted, _) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def expire(self, session: Optional[str]) -> None:
+        """Make the next read of `session` revalidate, keeping the ETag."""
+        with self._lock:
+            entry = self.entries.get(session)
+            if entry is not None:
+                self.entries[session] = entry[:3] + (0.0,)
+
+    def invalidate(self, session: Optional[str]) -> None:
+        with self._lock:
+            self._drop(session)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.stats[kind] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, **self.stats}
+
+    def _drop(self, session: Optional[str]) -> None:
+        entry = self.entries.pop(session, None)
+        if entry is not None:
+            self.bytes -= len(entry[2])
+
+
+def _fresh_for(response: httpx.Response) -> Optional[float]:
+    """
+    Seconds the response may be reused without revalidation, from its
+    Cache-Control header (MCP_RESPONSE_MAX_AGE when it has none); None when
+    it must not be stored.
+    """
+    directives = [d.strip().lower() for d in response.headers.get("cache-control", "").split(",")]
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    for directive in directives:
+        if directive.startswith("max-age="):
+            try:
+                return max(0.0, float(directive[len("max-age="):]))
+            except ValueError:
+                return 0.0
+    return MCP_RESPONSE_MAX_AGE
+
+
+class _SendBatcher:
+    """
+    Collects the send_context calls made on one event loop and flushes them
+    together, after MCP_BATCH_WINDOW_MS or once MCP_BATCH_MAX are waiting.
+    """
+
+    def __init__(self, adapter: "MCPAdapter"):
+        self.adapter = adapter
+        self.pending: List[Tuple[dict, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: set = set()
+
+    async def send(self, context_data: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((context_data, future))
+        if len(self.pending) >= MCP_BATCH_MAX:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(MCP_BATCH_WINDOW_MS / 1000, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        items, self.pending = self.pending, []
+        if items:
+            task = asyncio.ensure_future(self._send(items))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, items: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            results = await self.adapter._send_batch([context for context, _ in items])
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
 
 class MCPAdapter:
+    """
+    Client for the MCP endpoint.
+
+    All requests go through one pooled keep-alive `httpx.AsyncClient` per
+    event loop. The app opens the client on its own loop in the lifespan
+    (`await adapter.start()`) and closes it on shutdown (`await adapter.aclose()`),
+    so every MCP agent shares the same connections.
+
+    `asend_context` / `aget_response` are the async API. The blocking
+    `send_context` / `get_response` used by agents running on worker threads
+    submit the same coroutines to the app's loop and wait for the result.
+    Without a started app loop (standalone scripts, or a call made on the loop
+    thread itself) they run on a private background loop with its own client.
+
+    When MCP_ENDPOINT / MCP_API_KEY are not set the adapter is a no-op: every
+    call returns its fall-back value at once and the missing configuration is
+    logged a single time per process.
+
+    Every request is bounded by MCP_CONNECT_TIMEOUT / MCP_READ_TIMEOUT and
+    retried up to MCP_RETRIES times with jittered backoff. A circuit breaker
+    stops calling an endpoint that keeps failing; meanwhile calls return the
+    same local fall-back as when MCP is unreachable. `health()` reports it.
+
+    Agents that send an evolving context repeatedly pass a `session` id to
+    `send_context`. The first send of a session carries the full context;
+    once the endpoint acknowledges it with an X-MCP-Context-Version header,
+    later sends carry only a JSON Patch against that version. If the endpoint
+    answers 409 (it no longer has the base version) the full context is sent
+    again. Call `end_session` when the agent is done.
+
+    With MCP_BATCH_WINDOW_MS set, concurrent session-less sends are gathered
+    into one `POST /send/batch` ({"items": [{"context": ...}, ...]} answered
+    by {"results": [...]}, in order) and the results fanned back out to the
+    callers. A lone send still uses `/send`, and endpoints that answer the
+    batch route with 404 or 405 get individual sends from then on.
+
+    `get_response` keeps the last body per session and revalidates it with
+    If-None-Match, so an unchanged response costs a 304 instead of a full
+    body. Within MCP_RESPONSE_MAX_AGE (or the endpoint's Cache-Control
+    max-age) and as long as the session's version has not moved, it is
+    answered without a request at all. Sends to a session, `end_session`
+    and `invalidate_response` make the next read go to the endpoint.
+
+    `await_response` waits for the endpoint to publish a new response instead
+    of polling: it long-polls `GET /response/wait` with the cached ETag as
+    If-None-Match, which the endpoint holds open until the response changes
+    (200) or MCP_LONG_POLL_SECONDS pass (304, and the next long poll starts).
+    Endpoints without the route (404/405) are polled every MCP_POLL_INTERVAL.
+
+    Request bodies of MCP_COMPRESS_MIN_BYTES or more are sent as msgpack
+    and/or compressed with zstd or gzip once the endpoint has advertised them
+    (`Accept-Post` / `Accept-Encoding` response headers). A 415 reply turns
+    this off again and the request is repeated as plain JSON.
+    `encoding_stats()` reports bytes and latency per encoding.
+    """
+
+    # Transport of the HTTP clients; tests substitute an httpx.MockTransport
+    transport: Optional[httpx.AsyncBaseTransport] = None
+
     def __init__(self):
         self.endpoint = os.environ.get("MCP_ENDPOINT")
         self.api_key = os.environ.get("MCP_API_KEY")
         if not self.endpoint or not self.api_key:
-            print("Warning: MCPAdapter could not be initialized: MCP_ENDPOINT and MCP_API_KEY must be set in the environment.")
+            _warn_once("unconfigured", "MCPAdapter could not be initialized: MCP_ENDPOINT and MCP_API_KEY must be set in the environment. MCP calls return the local context.")
         self.initialized = self.endpoint and self.api_key
+        self.breaker = CircuitBreaker()
+        # session -> (acknowledged version or None, context as last sent)
+        self._sessions: "OrderedDict[str, Tuple[Optional[int], Any]]" = OrderedDict()
+        self.delta_stats = {"full_sends": 0, "delta_sends": 0, "resyncs": 0, "full_bytes": 0, "delta_bytes": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._background: Optional[asyncio.AbstractEventLoop] = None
+        self._batchers: Dict[asyncio.AbstractEventLoop, _SendBatcher] = {}
+        self._batch_supported = True
+        self.batch_stats = {"batches": 0, "batched_contexts": 0}
+        self._responses = _ResponseCache()
+        self._long_poll_supported = True
+        # Body formats and request compressions the endpoint advertised
+        self._accept_post: Optional[str] = None
+        self._accept_encoding: Optional[str] = None
+        self._encoding_stats: Dict[str, Dict[str, Dict[str, float]]] = {"sent": {}, "received": {}}
+        self._lock = threading.Lock()
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """Open the shared client on the running loop; blocking calls from other threads are sent to it."""
+        if self.initialized:
+            self._client()
+        self._loop = asyncio.get_running_loop()
+
+    async def aclose(self) -> None:
+        """Close the client of the running loop, and the background loop if one was started."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            self._loop = None
+        batcher = self._batchers.pop(loop, None)
+        if batcher is not None:
+            batcher.flush()
+            await asyncio.gather(*batcher.tasks, return_exceptions=True)
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+        self.close()
 
-    def send_context(self, context_data: dict) -> dict:
+    def close(self) -> None:
+        """Stop the background loop used by blocking calls, closing its client."""
+        with self._lock:
+            background, self._background = self._background, None
+        if background is None:
+            return
+        client = self._clients.pop(background, None)
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), background).result()
+        background.call_soon_threadsafe(background.stop)
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=self.endpoint,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(max_connections=MCP_MAX_CONNECTIONS, max_keepalive_connections=MCP_MAX_KEEPALIVE_CONNECTIONS),
+                timeout=httpx.Timeout(MCP_READ_TIMEOUT, connect=MCP_CONNECT_TIMEOUT),
+                transport=self.transport,
+            )
+            self._clients[loop] = client
+        return client
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._background is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mcp-adapter", daemon=True).start()
+                self._background = loop
+            return self._background
+
+    def _run_sync(self, coro_func, *args: Any) -> Any:
+        loop = self._loop
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if loop is None or not loop.is_running() or loop is current:
+            loop = self._background_loop()
+        return asyncio.run_coroutine_threadsafe(coro_func(*args), loop).result()
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send one MCP request through the circuit breaker, retrying transient failures.
+
+        A `json` body is encoded as negotiated with the endpoint (see _encode).
+        """
+        if "json" not in kwargs:
+            return await self._attempts(method, path, **kwargs)
+        data = kwargs.pop("json")
+        content, headers, label, size = self._encode(data)
+        start = time.perf_counter()
+        try:
+            response = await self._attempts(method, path, content=content,
+                                            headers={**kwargs.pop("headers", {}), **headers}, **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 415 or label == "json":
+                raise
+            # The endpoint no longer takes what it advertised; fall back to plain JSON
+            logger.info("MCP endpoint refused a %s body; sending plain JSON", label)
+            with self._lock:
+                self._accept_post = self._accept_encoding = None
+            return await self._request(method, path, json=data, **kwargs)
+        self._count_encoding("sent", label, len(content), time.perf_counter() - start, size)
+        return response
+
+    def _encode(self, data: Any) -> Tuple[bytes, Dict[str, str], str, int]:
+        """Request body, headers, encoding label and plain JSON size for `data`."""
+        content = mcp_encoding.serialize(data, mcp_encoding.JSON)
+        size = len(content)
+        content_type, encoding = mcp_encoding.JSON, None
+        if size >= MCP_COMPRESS_MIN_BYTES:
+            usable = [name for name in MCP_ENCODINGS if mcp_encoding.available(name)]
+            with self._lock:
+                accept_post, accept_encoding = self._accept_post, self._accept_encoding
+            if accept_post and "msgpack" in usable and mcp_encoding.choose([mcp_encoding.MSGPACK], accept_post):
+                content_type = mcp_encoding.MSGPACK
+                content = mcp_encoding.serialize(data, content_type)
+            if accept_encoding:
+                encoding = mcp_encoding.choose([name for name in usable if name in mcp_encoding.ENCODINGS], accept_encoding)
+                content = mcp_encoding.compress(content, encoding)
+        headers = {"Content-Type": content_type}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return content, headers, mcp_encoding.label(content_type, encoding), size
+
+    def _learn_encodings(self, response: httpx.Response) -> None:
+        """Remember the body formats and compressions the endpoint advertises."""
+        accept_post, accept_encoding = response.headers.get("accept-post"), response.headers.get("accept-encoding")
+        if accept_post is not None or accept_encoding is not None:
+            with self._lock:
+                if accept_post is not None:
+                    self._accept_post = accept_post
+                if accept_encoding is not None:
+                    self._accept_encoding = accept_encoding
+
+    def _count_encoding(self, direction: str, label: str, wire_bytes: int, seconds: float = 0.0, size: int = 0) -> None:
+        with self._lock:
+            counters = self._encoding_stats[direction].setdefault(label, {"count": 0, "bytes": 0, "wire_bytes": 0, "seconds": 0.0})
+            counters["count"] += 1
+            counters["bytes"] += size
+            counters["wire_bytes"] += wire_bytes
+            counters["seconds"] += seconds
+
+    def encoding_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Counters per encoding label ("json", "json+gzip", "msgpack+zstd", ...):
+        for request bodies sent and responses received, their count, size as
+        JSON (`bytes`) and on the wire (`wire_bytes`); for sent bodies also
+        the mean round trip in ms.
+        """
+        with self._lock:
+            report = {}
+            for direction, labels in self._encoding_stats.items():
+                report[direction] = {}
+                for label, c in labels.items():
+                    entry = {"count": c["count"], "bytes": c["bytes"], "wire_bytes": c["wire_bytes"]}
+                    if direction == "sent":
+                        entry["mean_ms"] = round(1000 * c["seconds"] / c["count"], 3)
+                    report[direction][label] = entry
+            return report
+
+    async def _attempts(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError("MCP circuit breaker is open")
+        # Every call settles the breaker exactly once, so a half-open trial is never left claimed
+        settled = False
+        try:
+            for attempt in range(MCP_RETRIES + 1):
+                try:
+                    response = await self._client().request(method, path, **kwargs)
+                    # 304 is the answer to a conditional GET, not a failure
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                except httpx.HTTPError as e:
+                    retryable = isinstance(e, httpx.TransportError) or (
+                        isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500)
+                    if not retryable or attempt == MCP_RETRIES:
+                        # Client errors (4xx) are our fault, not the endpoint's
+                        if retryable:
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_success()
+                        settled = True
+                        raise
+                    await asyncio.sleep(MCP_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+                else:
+                    # An undecodable 200 is the endpoint failing too, so decode before settling
+                    if response.status_code != 304:
+                        response.extensions[_JSON_BODY] = response.json()
+                    self.breaker.record_success()
+                    settled = True
+                    self._learn_encodings(response)
+                    if response.status_code != 304:
+                        label = mcp_encoding.label(mcp_encoding.JSON, response.headers.get("content-encoding"))
+                        self._count_encoding("received", label, response.num_bytes_downloaded, size=len(response.content))
+                    return response
+        except asyncio.CancelledError:
+            if not settled:
+                self.breaker.release()
+            raise
+        except Exception:
+            # Anything else, e.g. a body that is not JSON, counts against the endpoint
+            if not settled:
+                self.breaker.record_failure()
+            raise
+
+    async def _send_versioned(self, session: str, context_data: dict) -> httpx.Response:
+        """POST a session's context to /send, as a patch against the acknowledged version when possible."""
+        snapshot = json.loads(json.dumps(context_data, default=str))
+        with self._lock:
+            version, previous = self._sessions.get(session, (None, None))
+        response = None
+        if version is not None:
+            body = {"session": session, "base_version": version, "patch": make_patch(previous, snapshot)}
+            try:
+                response = await self._request("POST", "/send", json=body)
+                self._count("delta", response)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 409:
+                    raise
+                with self._lock:
+                    self.delta_stats["resyncs"] += 1
+        if response is None:
+            response = await self._request("POST", "/send", json={"session": session, "context": snapshot})
+            self._count("full", response)
+        acknowledged = response.headers.get(CONTEXT_VERSION_HEADER)
+        with self._lock:
+            self._sessions[session] = (int(acknowledged) if acknowledged else None, snapshot)
+            self._sessions.move_to_end(session)
+            while len(self._sessions) > MCP_MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        return response
+
+    async def _send_batch(self, contexts: List[dict]) -> List[dict]:
+        """Send several session-less contexts in one request; results come back in order."""
+        if len(contexts) > 1 and self._batch_supported:
+            try:
+                response = await self._request("POST", "/send/batch", json={"items": [{"context": c} for c in contexts]})
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (404, 405):
+                    raise
+                self._batch_supported = False
+                logger.info("MCP endpoint does not support /send/batch; sending contexts one by one")
+            else:
+                results = _json(response)["results"]
+                if len(results) != len(contexts):
+                    raise httpx.DecodingError(f"/send/batch returned {len(results)} results for {len(contexts)} contexts")
+                with self._lock:
+                    self.batch_stats["batches"] += 1
+                    self.batch_stats["batched_contexts"] += len(contexts)
+                return results
+        return list(await asyncio.gather(*(self._send_one(c) for c in contexts)))
+
+    async def _send_one(self, context_data: dict) -> dict:
+        return _json(await self._request("POST", "/send", json={"context": context_data}))
+
+    def _count(self, kind: str, response: httpx.Response) -> None:
+        with self._lock:
+            self.delta_stats[f"{kind}_sends"] += 1
+            self.delta_stats[f"{kind}_bytes"] += len(response.request.content)
+
+    def end_session(self, session: str) -> None:
+        """Forget the versioned context of a finished session."""
+        with self._lock:
+            self._sessions.pop(session, None)
+        self._responses.invalidate(session)
+
+    def invalidate_response(self, session: Optional[str] = None) -> None:
+        """Drop the cached response of `session`, so the next get_response fetches it in full."""
+        self._responses.invalidate(session)
+
+    def clear_response_cache(self) -> None:
+        """Drop every cached response."""
+        self._responses.clear()
+
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """Entries, bytes, local hits, 304 revalidations, full fetches and evictions of the response cache."""
+        return self._responses.snapshot()
+
+    def health(self) -> Dict[str, Any]:
+        """Configuration and circuit breaker state, reported by /health."""
+        return {"configured": bool(self.initialized), "circuit": self.breaker.snapshot(),
+                "response_cache": self._responses.snapshot()}
+
+    # --- Async API ---
+
+    async def asend_context(self, context_data: dict, session: Optional[str] = None) -> dict:
         """
         Sends context data to the MCP endpoint.
+
+        Repeated sends with the same `session` are delta-encoded; session-less
+        sends may be micro-batched (MCP_BATCH_WINDOW_MS).
         """
         if not self.initialized:
-            print("Warning: MCPAdapter not initialized. Returning original context.")
             return context_data
 
-        url = f"{self.endpoint}/send"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        payload = {"context": context_data}
         try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Warning: Error sending context to MCP: {e}")
+            if session is not None:
+                result = _json(await self._send_versioned(session, context_data))
+            elif MCP_BATCH_WINDOW_MS > 0 and self._batch_supported:
+                loop = asyncio.get_running_loop()
+                batcher = self._batchers.get(loop) or self._batchers.setdefault(loop, _SendBatcher(self))
+                result = await batcher.send(context_data)
+            else:
+                result = await self._send_one(context_data)
+        except CircuitOpenError:
+            _warn_once("circuit", "MCP circuit breaker is open; returning local fall-back values until the endpoint recovers.")
+            return context_data
+        except _FALLBACK_ERRORS as e:
+            _warn_once("send", "Error sending context to MCP, returning the original context: %s", e)
             return context_data
+        # The endpoint's view of this session has changed, so check before reusing its response
+        self._responses.expire(session)
+        _clear_warning("send")
+        _clear_warning("circuit")
+        return result
 
-    def get_response(self) -> dict:
+    async def aget_response(self, session: Optional[str] = None) -> dict:
         """
         Retrieves the response from the MCP endpoint.
+
+        Unchanged responses are served from the cache or revalidated with a
+        conditional request (see the class docstring).
         """
         if not self.initialized:
-            print("Warning: MCPAdapter not initialized. Returning empty response.")
             return {}
 
-        url = f"{self.endpoint}/response"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Warning: Error getting response from MCP: {e}")
+            result = json.loads(await self._fetch_response(session))
+        except CircuitOpenError:
+            _warn_once("circuit", "MCP circuit breaker is open; returning local fall-back values until the endpoint recovers.")
+            return {}
+        except _FALLBACK_ERRORS as e:
+            _warn_once("response", "Error getting response from MCP, returning an empty response: %s", e)
             return {}
+        _clear_warning("response")
+        _clear_warning("circuit")
+        return result
+
+    async def _fetch_response(self, session: Optional[str]) -> bytes:
+        with self._lock:
+            version = self._sessions.get(session, (None, None))[0] if session is not None else None
+        cached = self._responses.get(session) if MCP_RESPONSE_CACHE_BYTES > 0 else None
+        if cached is not None and cached[0] == version and cached[3] > time.monotonic():
+            self._responses.count("hits")
+            return cached[2]
+
+        headers = {"If-None-Match": cached[1]} if cached is not None and cached[1] else {}
+        params = {"session": session} if session is not None else None
+        response = await self._request("GET", "/response", params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self._responses.count("revalidated")
+            body, etag = cached[2], response.headers.get("etag", cached[1])
+        else:
+            self._responses.count("misses")
+            body, etag = response.content, response.headers.get("etag")
+        fresh_for = _fresh_for(response)
+        # Entries without an ETag still tell await_response what was last seen
+        if MCP_RESPONSE_CACHE_BYTES > 0 and fresh_for is not None:
+            self._responses.put(session, version, etag, body, fresh_for)
+        else:
+            self._responses.invalidate(session)
+        return body
+
+    async def await_response(self, session: Optional[str] = None, until: Optional[Callable[[dict], bool]] = None,
+                             timeout: Optional[float] = None) -> dict:
+        """
+        Waits until the MCP endpoint has a new response (for `session`) and returns it.
+
+        "New" means different from the last response this adapter read for
+        the session; with `until`, waiting goes on until a response satisfies
+        it. When `timeout` seconds pass first, or the endpoint fails, the last
+        response seen is returned instead (or an empty one).
+        """
+        if not self.initialized:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        latest: dict = {}
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return latest
+                body = await self._wait_for_change(session, MCP_LONG_POLL_SECONDS if remaining is None
+                                                   else min(MCP_LONG_POLL_SECONDS, remaining))
+                if body is not None:
+                    latest = json.loads(body)
+                    if until is None or until(latest):
+                        return latest
+        except CircuitOpenError:
+            _warn_once("circuit", "MCP circuit breaker is open; returning local fall-back values until the endpoint recovers.")
+        except _FALLBACK_ERRORS as e:
+            _warn_once("response", "Error waiting for a response from MCP, returning the last one seen: %s", e)
+        return latest
+
+    async def _wait_for_change(self, session: Optional[str], wait: float) -> Optional[bytes]:
+        """One long poll (or poll) for the session's response; None when it has not changed within `wait`."""
+        cached = self._responses.get(session)
+        if not self._long_poll_supported:
+            await asyncio.sleep(min(MCP_POLL_INTERVAL, wait))
+            self._responses.expire(session)
+            body = await self._fetch_response(session)
+            return None if cached is not None and body == cached[2] else body
+
+        headers = {"If-None-Match": cached[1]} if cached is not None and cached[1] else {}
+        params = {"timeout": wait} if session is None else {"session": session, "timeout": wait}
+        try:
+            response = await self._request("GET", "/response/wait", params=params, headers=headers,
+                                           timeout=httpx.Timeout(MCP_READ_TIMEOUT + wait, connect=MCP_CONNECT_TIMEOUT))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in (404, 405):
+                raise
+            self._long_poll_supported = False
+            logger.info("MCP endpoint does not support /response/wait; polling /response instead")
+            return await self._wait_for_change(session, wait)
+        if response.status_code == 304:
+            return None
+        with self._lock:
+            version = self._sessions.get(session, (None, None))[0] if session is not None else None
+        fresh_for = _fresh_for(response)
+        if MCP_RESPONSE_CACHE_BYTES > 0 and fresh_for is not None:
+            self._responses.put(session, version, response.headers.get("etag"), response.content, fresh_for)
+        return response.content
+
+    # --- Blocking API for agents running on worker threads ---
+
+    def send_context(self, context_data: dict, session: Optional[str] = None) -> dict:
+        """
+        Sends context data to the MCP endpoint.
+
+        Repeated sends with the same `session` are delta-encoded.
+        """
+        if not self.initialized:
+            return context_data
+        return self._run_sync(self.asend_context, context_data, session)
+
+    def get_response(self, session: Optional[str] = None) -> dict:
+        """
+        Retrieves the response from the MCP endpoint.
+
+        Unchanged responses are served from the cache or revalidated with a
+        conditional request.
+        """
+        if not self.initialized:
+            return {}
+        return self._run_sync(self.aget_response, session)
+
+    def wait_for_response(self, session: Optional[str] = None, until: Optional[Callable[[dict], bool]] = None,
+                          timeout: Optional[float] = None) -> dict:
+        """
+        Blocks until the MCP endpoint has a new response (for `session`) and returns it.
+
+        See `await_response`.
+        """
+        if not self.initialized:
+            return {}
+        return self._run_sync(self.await_response, session, until, timeout)
+
+
+_shared_adapter: Optional[MCPAdapter] = None
+_shared_lock = threading.Lock()
+
+
+def get_mcp_adapter() -> MCPAdapter:
+    """
+    The process-wide adapter shared by all MCP agents and routes.
+
+    Routes receive it as a FastAPI dependency (`Depends(get_mcp_adapter)`), so
+    tests can swap it through `app.dependency_overrides`. The app opens and
+    closes its client in the lifespan.
+    """
+    global _shared_adapter
+    with _shared_lock:
+        if _shared_adapter is None:
+            _shared_adapter = MCPAdapter()
+        return _shared_adapter
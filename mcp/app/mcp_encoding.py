@@ -0,0 +1,99 @@
+"""
+Payload encodings for MCP request bodies
+----------------------------------------
+Contexts go to the endpoint as plain JSON unless they are large. Bodies of
+at least MCP_COMPRESS_MIN_BYTES (as JSON) are serialized with msgpack and/or
+compressed with zstd or gzip, in the adapter's order of preference, limited
+to what the endpoint advertises in its responses:
+
+* `Accept-Post: application/msgpack, application/json` for body formats
+* `Accept-Encoding: zstd, gzip` for request compression (RFC 7694)
+
+msgpack and zstd are used only when the `msgpack` / `zstandard` packages are
+installed; gzip is always available. Responses are compressed the usual HTTP
+way and decoded by httpx.
+"""
+import gzip
+import json
+from typing import Any, Iterable, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional: pip install msgpack
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Short names used in configuration and in the encoding counters
+CONTENT_TYPES = {"json": JSON, "msgpack": MSGPACK}
+ENCODINGS = ("zstd", "gzip")
+
+
+def available(name: str) -> bool:
+    """Whether this process can produce the named format or encoding."""
+    if name == "msgpack":
+        return msgpack is not None
+    if name == "zstd":
+        return zstandard is not None
+    return name in ("json", "gzip")
+
+
+def serialize(data: Any, content_type: str) -> bytes:
+    if content_type == MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode()
+
+
+def deserialize(body: bytes, content_type: str) -> Any:
+    if content_type == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor().compress(body)
+    if encoding == "gzip":
+        # Level 6 keeps most of the size gain of level 9 at a fraction of the time
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding in (None, "", "identity"):
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def header_values(value: str) -> List[str]:
+    """Tokens of a comma-separated header, lower-cased, without parameters or q=0 entries."""
+    tokens = []
+    for item in value.split(","):
+        token, _, params = item.strip().partition(";")
+        if token and params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            tokens.append(token.strip().lower())
+    return tokens
+
+
+def choose(preferred: Iterable[str], offered: str) -> Optional[str]:
+    """First of our `preferred` values the endpoint `offered`, or None."""
+    offered = header_values(offered)
+    return next((value for value in preferred if value in offered), None)
+
+
+def label(content_type: str, encoding: Optional[str]) -> str:
+    """Counter key such as "json", "json+gzip" or "msgpack+zstd"."""
+    name = "msgpack" if content_type == MSGPACK else "json"
+    return f"{name}+{encoding}" if encoding else name
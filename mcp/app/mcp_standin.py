@@ -0,0 +1,313 @@
+"""
+Local MCP stand-in
+------------------
+A small ASGI app that speaks the MCP endpoint protocol the adapter uses, for
+tests and benchmarks that should not depend on a live MCP service:
+
+* `POST /send` echoes the context back, including versioned sessions
+  (full context or JSON Patch against `base_version`, 409 when that version
+  is unknown, `X-MCP-Context-Version` on every answer)
+* `POST /send/batch` answers several contexts at once
+* `GET /response` returns the last context received (or, with `?session=`,
+  that session's context) with an ETag, and 304 for a matching If-None-Match
+* `GET /response/wait` is the long-poll form: it holds the request until the
+  response no longer matches If-None-Match, or answers 304 after `timeout`
+* `POST /response` publishes a response for a session, as the MCP side would
+  when it finishes work in the background
+* `GET /stats` reports what the stand-in has served
+
+It advertises and accepts compressed (gzip, or zstd when installed) and
+msgpack (when installed) request bodies, see `app/mcp_encoding.py`, and
+gzips responses of `compress_min_bytes` or more for clients that accept it.
+
+Latency, jitter and the share of failed (503) requests are configurable, and
+with `final_answer_after` set every context whose `iteration` has reached it
+comes back with a canned `final_answer`, either in the `/send` reply or,
+with `final_answer_delay_ms`, published to the session's response later.
+
+Use it in-process through `httpx.ASGITransport(app=create_standin_app(...))`,
+or over the network:
+
+    python -m app.mcp_standin --port 8001 --latency-ms 20 --jitter-ms 5
+    MCP_ENDPOINT=http://127.0.0.1:8001 MCP_API_KEY=standin python -m uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.gzip import GZipMiddleware
+
+from app import mcp_encoding
+from app.json_patch import JsonPatchError, apply_patch
+from app.mcp_adapter import CONTEXT_VERSION_HEADER
+
+DEFAULT_FINAL_ANSWER = "Stand-in final answer"
+
+
+class _RequestEncodings:
+    """
+    ASGI middleware that decodes compressed and msgpack request bodies into
+    plain JSON before the routes see them, and advertises what it accepts
+    on every response (`Accept-Post`, `Accept-Encoding`).
+    """
+
+    def __init__(self, app, stats: Dict[str, Any]):
+        self.app = app
+        self.stats = stats
+        types = [mcp_encoding.MSGPACK] if mcp_encoding.available("msgpack") else []
+        encodings = [name for name in mcp_encoding.ENCODINGS if mcp_encoding.available(name)]
+        self.advertised = [(b"accept-post", ", ".join(types + [mcp_encoding.JSON]).encode()),
+                           (b"accept-encoding", ", ".join(encodings).encode())]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def advertise(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + self.advertised
+            await send(message)
+
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+        encoding = headers.get("content-encoding")
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if not encoding and content_type != mcp_encoding.MSGPACK:
+            if scope["method"] == "POST":
+                self._count(mcp_encoding.label(mcp_encoding.JSON, None))
+            return await self.app(scope, receive, advertise)
+
+        body, more = b"", True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        try:
+            body = mcp_encoding.decompress(body, encoding)
+            if content_type == mcp_encoding.MSGPACK:
+                body = mcp_encoding.serialize(mcp_encoding.deserialize(body, content_type), mcp_encoding.JSON)
+        except Exception as exc:
+            response = JSONResponse(status_code=415, content={"detail": f"Cannot decode request body: {exc}"})
+            return await response(scope, receive, advertise)
+        self._count(mcp_encoding.label(content_type, encoding))
+
+        scope = dict(scope, headers=[(name, value) for name, value in scope["headers"]
+                                     if name.lower() not in (b"content-encoding", b"content-length", b"content-type")]
+                     + [(b"content-type", mcp_encoding.JSON.encode()), (b"content-length", str(len(body)).encode())])
+        delivered = False
+
+        async def decoded_receive():
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, decoded_receive, advertise)
+
+    def _count(self, label: str) -> None:
+        self.stats["request_encodings"][label] = self.stats["request_encodings"].get(label, 0) + 1
+
+
+def create_standin_app(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    final_answer_after: Optional[int] = None,
+    final_answer: str = DEFAULT_FINAL_ANSWER,
+    final_answer_delay_ms: Optional[float] = None,
+    batch: bool = True,
+    response_max_age: Optional[float] = None,
+    compress_min_bytes: int = 1024,
+    max_sessions: int = 1024,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """
+    Build a stand-in MCP endpoint.
+
+    Every request waits `latency_ms` plus or minus up to `jitter_ms`, then
+    fails with 503 with probability `error_rate`. With `final_answer_delay_ms`
+    the final answer is left out of the `/send` reply and published to the
+    session's `/response` that many milliseconds later. With `batch=False` the
+    batch route answers 404, like endpoints that predate it. With
+    `response_max_age` set, `/response` lets clients reuse it for that many
+    seconds (Cache-Control: max-age). Responses of `compress_min_bytes` or
+    more are gzipped for clients that accept it. Only the `max_sessions`
+    most recently used versioned sessions are kept; older ones answer 409
+    and get resynced by the adapter.
+    """
+    app = FastAPI(title="MCP stand-in")
+    rng = random.Random(seed)
+    # session -> (version, context)
+    sessions: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+    # What /response returns, by session (None for session-less sends)
+    responses: Dict[Optional[str], Any] = {}
+    # Long-poll requests waiting for a session's response to change. They may
+    # come from different event loops, so each future is resolved on its own.
+    waiters: Dict[Optional[str], List[asyncio.Future]] = {}
+    stats = {"send": 0, "batch": 0, "batched_contexts": 0, "response": 0, "not_modified": 0,
+             "long_polls": 0, "published": 0, "full_sends": 0, "delta_sends": 0, "conflicts": 0, "errors": 0,
+             "request_encodings": {}}
+    app.state.stats = stats
+    app.add_middleware(GZipMiddleware, minimum_size=compress_min_bytes)
+    app.add_middleware(_RequestEncodings, stats=stats)
+
+    async def delay_or_fail() -> Optional[JSONResponse]:
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"detail": "Injected stand-in failure"})
+        return None
+
+    def publish(session: Optional[str], response: Any) -> None:
+        responses[session] = response
+        for future in waiters.pop(session, []):
+            future.get_loop().call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    async def publish_later(session: Optional[str], response: Any) -> None:
+        await asyncio.sleep(final_answer_delay_ms / 1000)
+        stats["published"] += 1
+        publish(session, response)
+
+    def answer(context: Any, session: Optional[str] = None) -> Any:
+        publish(session, context)
+        if (final_answer_after is not None and isinstance(context, dict)
+                and context.get("iteration", 0) >= final_answer_after):
+            if final_answer_delay_ms is None:
+                return {**context, "final_answer": final_answer}
+            task = asyncio.ensure_future(publish_later(session, {**context, "final_answer": final_answer}))
+            app.state.tasks.add(task)
+            task.add_done_callback(app.state.tasks.discard)
+        return context
+
+    def current(session: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+        headers = {}
+        if session is not None and session in sessions:
+            headers[CONTEXT_VERSION_HEADER] = str(sessions[session][0])
+        body = json.dumps(responses.get(session) or {}).encode()
+        headers["ETag"] = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if response_max_age is not None:
+            headers["Cache-Control"] = f"max-age={response_max_age:g}"
+        return body, headers
+
+    app.state.tasks = set()
+
+    @app.post("/send")
+    async def send(payload: Dict[str, Any] = Body(...)):
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        stats["send"] += 1
+        session = payload.get("session")
+        if session is None:
+            return answer(payload.get("context"))
+
+        if "patch" in payload:
+            version, context = sessions.get(session, (None, None))
+            if version is None or version != payload.get("base_version"):
+                stats["conflicts"] += 1
+                return JSONResponse(status_code=409, content={"detail": "Unknown base version"})
+            try:
+                context = apply_patch(context, payload["patch"])
+            except JsonPatchError as exc:
+                return JSONResponse(status_code=422, content={"detail": str(exc)})
+            stats["delta_sends"] += 1
+        else:
+            version, context = sessions.get(session, (0, None))[0], payload.get("context")
+            stats["full_sends"] += 1
+        sessions[session] = (version + 1, context)
+        sessions.move_to_end(session)
+        while len(sessions) > max_sessions:
+            responses.pop(sessions.popitem(last=False)[0], None)
+        return JSONResponse(content=answer(context, session), headers={CONTEXT_VERSION_HEADER: str(version + 1)})
+
+    @app.post("/send/batch")
+    async def send_batch(payload: Dict[str, Any] = Body(...)):
+        if not batch:
+            return JSONResponse(status_code=404, content={"detail": "Not Found"})
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        items = payload.get("items", [])
+        stats["batch"] += 1
+        stats["batched_contexts"] += len(items)
+        return {"results": [answer(item.get("context")) for item in items]}
+
+    @app.get("/response")
+    async def response(request: Request, session: Optional[str] = None):
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        stats["response"] += 1
+        body, headers = current(session)
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @app.get("/response/wait")
+    async def response_wait(request: Request, session: Optional[str] = None, timeout: float = 20.0):
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        stats["long_polls"] += 1
+        body, headers = current(session)
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            future = asyncio.get_running_loop().create_future()
+            waiters.setdefault(session, []).append(future)
+            try:
+                await asyncio.wait_for(future, min(max(timeout, 0.0), 60.0))
+            except asyncio.TimeoutError:
+                stats["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+            finally:
+                if future in waiters.get(session, []):
+                    waiters[session].remove(future)
+            body, headers = current(session)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @app.post("/response")
+    async def post_response(payload: Dict[str, Any] = Body(...)):
+        stats["published"] += 1
+        publish(payload.get("session"), payload.get("response"))
+        return {"status": "published"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "sessions": len(sessions)}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local MCP stand-in endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--final-answer-after", type=int, default=None)
+    parser.add_argument("--final-answer-delay-ms", type=float, default=None,
+                        help="publish the final answer to /response this long after the send instead of replying with it")
+    parser.add_argument("--no-batch", action="store_true", help="answer /send/batch with 404")
+    parser.add_argument("--response-max-age", type=float, default=None, help="Cache-Control max-age of /response")
+    parser.add_argument("--compress-min-bytes", type=int, default=1024, help="smallest response to gzip")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_standin_app(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                             final_answer_after=args.final_answer_after,
+                             final_answer_delay_ms=args.final_answer_delay_ms, batch=not args.no_batch,
+                             response_max_age=args.response_max_age, compress_min_bytes=args.compress_min_bytes)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Streaming agent responses
+-------------------------
+Sends the events of an agent's `agent_stream` generator to the client as
+they are produced, instead of one JSON body when the agent finishes.
+
+Clients that accept `text/event-stream` get Server-Sent Events
+(`event: <name>` / `data: <json>`); everyone else gets NDJSON, one JSON
+object per line. The last event is always "result", or "error" when the
+agent fails or runs out of time.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from agents.dspy_integration import AgentContext, AgentTimeoutError, stream_agent
+
+SSE_MEDIA_TYPE = "text/event-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _encode_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('event', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _encode_ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event, default=str) + "\n"
+
+
+async def _events(agent_name: str, agent_module, agent_context: AgentContext) -> AsyncIterator[Dict[str, Any]]:
+    try:
+        async for event in stream_agent(agent_module, agent_context):
+            yield {"agent": agent_name, **event}
+    except AgentTimeoutError as exc:
+        # The status line has already been sent, so a timeout is reported in-stream
+        yield {"agent": agent_name, "event": "error", "error": "timeout", "detail": str(exc)}
+    except Exception as exc:
+        logging.exception("Streaming agent %s failed", agent_name)
+        yield {"agent": agent_name, "event": "error", "error": str(exc)}
+
+
+def agent_stream_response(agent_name: str, agent_module, agent_context: AgentContext, request: Request) -> StreamingResponse:
+    """Stream the agent's events as SSE or NDJSON, depending on the request's Accept header."""
+    sse = SSE_MEDIA_TYPE in request.headers.get("accept", "")
+    encode = _encode_sse if sse else _encode_ndjson
+
+    async def body() -> AsyncIterator[str]:
+        async for event in _events(agent_name, agent_module, agent_context):
+            yield encode(event)
+
+    # Disable proxy buffering so each event reaches the client as soon as it is sent
+    return StreamingResponse(body(), media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
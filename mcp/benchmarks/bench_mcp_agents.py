@@ -0,0 +1,128 @@
+"""
+MCP agent benchmark
+-------------------
+Drives the MCP agents through the app against the local MCP stand-in
+(`app.mcp_standin`) at several concurrency levels and reports throughput
+and latency percentiles, so changes to the adapter can be measured without
+a live MCP service.
+
+By default the stand-in runs in-process behind an httpx.ASGITransport, which
+keeps its injected latency but skips the network stack. With `--network` it
+is served by uvicorn on a local port and the adapter talks to it over TCP.
+
+Usage (from the mcp folder):
+    python -m benchmarks.bench_mcp_agents
+    python -m benchmarks.bench_mcp_agents --network --latency-ms 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+
+os.environ.setdefault("MCP_API_KEY", "standin")
+os.environ.setdefault("MCP_ENDPOINT", "http://mcp-standin")
+
+import agents.dspy_integration as dspy_integration
+from app.main import app
+from app.mcp_adapter import MCPAdapter, get_mcp_adapter
+from app.mcp_standin import create_standin_app
+
+CONCURRENCY = (1, 8, 32)
+REQUESTS = 64
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def payload(agent: str, i: int) -> dict:
+    # Distinct expressions, so the calculator's result cache does not answer
+    if agent == "calculator":
+        return {"expression": f"{i} * 3 + 1"}
+    if agent == "multi_step_reasoning":
+        return {"hypothesis": f"Hypothesis {i}"}
+    return {"task_description": f"Please analyze and report the data, run {i}"}
+
+
+async def run(agent: str, concurrency: int, requests: int = REQUESTS) -> dict:
+    dspy_integration.clear_result_cache()
+    adapter = get_mcp_adapter()
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+        # ASGITransport does not run the lifespan, so open the adapter's client here
+        await adapter.start()
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(f"/agents/{agent}", json=payload(agent, i))
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        await adapter.aclose()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "errors": errors,
+    }
+
+
+def serve(standin) -> str:
+    """Serve the stand-in with uvicorn on a free local port and return its URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(standin, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--network", action="store_true", help="serve the stand-in over TCP with uvicorn")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    # The agents log every step at DEBUG, which would swamp the table
+    logging.getLogger().setLevel(logging.WARNING)
+
+    standin = create_standin_app(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                 final_answer_after=2, seed=0)
+    if args.network:
+        get_mcp_adapter().endpoint = serve(standin)
+    else:
+        MCPAdapter.transport = httpx.ASGITransport(app=standin)
+
+    where = "over TCP" if args.network else "in-process"
+    print(f"{REQUESTS} requests per run, stand-in {where} with {args.latency_ms:g}±{args.jitter_ms:g} ms latency, "
+          f"{args.error_rate:.0%} errors, {dspy_integration.AGENT_THREAD_POOL_SIZE} agent threads")
+    print(f"{'agent':<24}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for agent in ("calculator", "multi_step_reasoning", "workflow_decisioning"):
+        for concurrency in CONCURRENCY:
+            stats = asyncio.run(run(agent, concurrency))
+            print(f"{agent:<24}{concurrency:>6}{stats['rps']:>10.1f}{stats['p50']:>10.1f}"
+                  f"{stats['p95']:>10.1f}{stats['errors']:>8}")
+    print("stand-in:", standin.state.stats)
+    print("adapter encodings:", get_mcp_adapter().encoding_stats())
+
+
+if __name__ == "__main__":
+    main()
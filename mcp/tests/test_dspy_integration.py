@@ -0,0 +1,373 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import agents.dspy_integration as dspy_integration
+from agents.dspy_integration import (
+    AgentContext, AgentRegistry, AgentTimeoutError, load_agent, run_agent, run_batch, stream_agent, invalidate_agent_cache,
+    clear_result_cache, result_cache_stats,
+)
+
+AGENT_CODE = """
+INPUTS = ("GREETING",)
+GREETING = "hello"
+
+def agent_main():
+    return GREETING
+"""
+
+CONTEXT_AGENT_CODE = """
+def agent_main(context):
+    greeting = context.resources.get("greeting", "Hello")
+    return f"{greeting} {context.get('name', 'nobody')}"
+"""
+
+SLOW_LEGACY_CODE = """
+import time
+
+INPUTS = ("VALUE",)
+VALUE = None
+
+def agent_main():
+    seen = VALUE
+    time.sleep(0.001)
+    return VALUE if VALUE == seen else "mixed"
+"""
+
+ASYNC_AGENT_CODE = """
+import asyncio
+
+async def agent_main(context):
+    await asyncio.sleep(0)
+    return context.get("value")
+"""
+
+THREAD_AGENT_CODE = """
+import threading
+
+def agent_main(context):
+    return threading.current_thread().name
+"""
+
+PROCESS_AGENT_CODE = """
+import os
+
+EXECUTOR = "process"
+
+def agent_main(context):
+    return {"pid": os.getpid(), "doubled": context.get("value") * 2, "resources": sorted(context.resources)}
+"""
+
+SLOW_PROCESS_AGENT_CODE = """
+import os
+import time
+
+EXECUTOR = "process"
+TIMEOUT = 2
+
+def agent_main(context):
+    time.sleep(context.get("sleep", 0))
+    return os.getpid()
+"""
+
+COOPERATIVE_AGENT_CODE = """
+import time
+
+TIMEOUT = 0.2
+
+def agent_main(context):
+    while True:
+        context.check_deadline()
+        time.sleep(0.01)
+"""
+
+BATCH_AGENT_CODE = """
+import asyncio
+
+ACTIVE = {"now": 0, "peak": 0}
+
+async def agent_main(context):
+    ACTIVE["now"] += 1
+    ACTIVE["peak"] = max(ACTIVE["peak"], ACTIVE["now"])
+    await asyncio.sleep(0.01)
+    ACTIVE["now"] -= 1
+    if context.get("fail"):
+        raise ValueError("boom")
+    return context.get("i")
+"""
+
+STREAM_AGENT_CODE = """
+import threading
+import time
+
+def agent_stream(context):
+    for i in range(context.get("steps", 3)):
+        time.sleep(context.get("sleep", 0))
+        yield {"event": "step", "step": i, "thread": threading.current_thread().name}
+    yield {"event": "result", "result": "done"}
+"""
+
+CACHED_AGENT_CODE = """
+CACHE_TTL = 60
+CALLS = []
+
+def agent_main(context):
+    CALLS.append(context.params)
+    return {"text": context.get("text"), "padding": "x" * context.get("size", 0)}
+"""
+
+def _run(module, context=None):
+    return asyncio.run(run_agent(module, context))
+
+def _stream(module, context=None):
+    async def collect():
+        return [(event, time.perf_counter()) async for event in stream_agent(module, context)]
+    return asyncio.run(collect())
+
+def _write_agent(path, code):
+    path.write_text(code)
+    return str(path)
+
+def test_load_agent_reuses_cached_module(tmp_path):
+    """Repeated loads of an unchanged file return the same module object."""
+    agent_file = _write_agent(tmp_path / "cached_agent.py", AGENT_CODE)
+    first = load_agent(agent_file)
+    assert load_agent(agent_file) is first
+    assert load_agent(agent_file, use_cache=False) is not first
+
+def test_run_agent_passes_context(tmp_path):
+    """Agents whose agent_main takes an argument receive the per-request context."""
+    agent_file = _write_agent(tmp_path / "context_agent.py", CONTEXT_AGENT_CODE)
+    module = load_agent(agent_file)
+    context = AgentContext({"name": "Ada"}, greeting="Hi")
+    assert _run(module, context) == "Hi Ada"
+    assert _run(module) == "Hello nobody"
+
+def test_run_agent_legacy_globals_are_restored(tmp_path):
+    """Old agent_main() modules get params as globals only for the duration of the call."""
+    agent_file = _write_agent(tmp_path / "legacy_agent.py", AGENT_CODE)
+    module = load_agent(agent_file)
+    assert _run(module, AgentContext({"greeting": "hey"})) == "hey"
+    assert module.GREETING == "hello"
+    assert _run(module) == "hello"
+
+def test_run_agent_legacy_params_only_set_declared_inputs():
+    """A param named after a non-input global, like quote's QUOTES, is ignored."""
+    module = load_agent(os.path.join("agents", "quote.py"))
+    quotes = module.QUOTES
+    clear_result_cache()
+    assert _run(module, AgentContext({"quotes": "xyz"}))["quote"] in quotes
+    assert module.QUOTES is quotes
+
+def test_run_agent_shared_module_across_threads(tmp_path):
+    """One loaded module serves concurrent requests without mixing their inputs."""
+    context_module = load_agent(_write_agent(tmp_path / "threaded_agent.py", CONTEXT_AGENT_CODE))
+    legacy_module = load_agent(_write_agent(tmp_path / "threaded_legacy.py", SLOW_LEGACY_CODE))
+
+    def call(i):
+        return (
+            _run(context_module, AgentContext({"name": str(i)}, greeting="Hi")),
+            _run(legacy_module, AgentContext({"value": i})),
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, range(32)))
+    assert results == [(f"Hi {i}", i) for i in range(32)]
+
+def test_load_agent_picks_up_file_changes(tmp_path):
+    """A modified file is re-executed; a touched but identical file is not."""
+    path = tmp_path / "changing_agent.py"
+    agent_file = _write_agent(path, AGENT_CODE)
+    first = load_agent(agent_file)
+
+    stat = os.stat(agent_file)
+    os.utime(agent_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_agent(agent_file) is first
+
+    _write_agent(path, AGENT_CODE.replace('"hello"', '"goodbye!"'))
+    os.utime(agent_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+    second = load_agent(agent_file)
+    assert second is not first
+    assert _run(second) == "goodbye!"
+
+def test_invalidate_agent_cache(tmp_path):
+    """Explicit invalidation forces the next load to execute the file again."""
+    agent_file = _write_agent(tmp_path / "invalidated_agent.py", AGENT_CODE)
+    first = load_agent(agent_file)
+    invalidate_agent_cache(agent_file)
+    assert load_agent(agent_file) is not first
+
+def test_agent_registry_scans_folder_once(tmp_path):
+    """The registry indexes agent modules by name and skips helpers."""
+    _write_agent(tmp_path / "greeter.py", 'AGENT_INFO = {"description": "Greets."}\n' + AGENT_CODE)
+    _write_agent(tmp_path / "documented.py", '"""Documented agent.\n\nMore text."""\n' + AGENT_CODE)
+    _write_agent(tmp_path / "helpers.py", "VALUE = 1\n")
+    _write_agent(tmp_path / "_private.py", AGENT_CODE)
+
+    registry = AgentRegistry(str(tmp_path))
+    assert registry.names() == ["documented", "greeter"]
+    assert "greeter" in registry and "helpers" not in registry
+    assert registry.get("missing") is None
+    assert _run(registry.get("greeter")) == "hello"
+    assert registry.describe() == [
+        {"name": "documented", "description": "Documented agent."},
+        {"name": "greeter", "description": "Greets."},
+    ]
+
+    _write_agent(tmp_path / "late.py", AGENT_CODE)
+    assert "late" not in registry
+    registry.scan()
+    assert "late" in registry
+
+def test_run_agent_awaits_coroutine_agents(tmp_path):
+    """Async agent_main functions are awaited on the event loop."""
+    module = load_agent(_write_agent(tmp_path / "async_agent.py", ASYNC_AGENT_CODE))
+    assert _run(module, AgentContext({"value": 42})) == 42
+
+def test_run_agent_dispatches_sync_agents_to_thread_pool(tmp_path):
+    """Synchronous agents run on the agent thread pool, not the event loop thread."""
+    module = load_agent(_write_agent(tmp_path / "pooled_agent.py", THREAD_AGENT_CODE))
+    thread_name = _run(module)
+    assert thread_name.startswith("agent")
+    assert thread_name != threading.current_thread().name
+
+def test_run_agent_dispatches_process_agents_to_worker_processes(tmp_path):
+    """EXECUTOR = "process" agents run in a pre-warmed worker that only receives params."""
+    agent_file = _write_agent(tmp_path / "process_agent.py", PROCESS_AGENT_CODE)
+    registry = AgentRegistry(str(tmp_path))
+    assert registry.process_agent_files() == [agent_file]
+
+    dspy_integration.shutdown_process_pool()
+    dspy_integration.start_process_pool(registry.process_agent_files(), max_workers=1)
+    try:
+        output = _run(registry.get("process_agent"), AgentContext({"value": 21}, adapter=object()))
+    finally:
+        dspy_integration.shutdown_process_pool()
+    assert output["pid"] != os.getpid()
+    assert output["doubled"] == 42
+    assert output["resources"] == []
+
+def test_run_agent_kills_process_agents_past_their_timeout(tmp_path):
+    """A process agent that overruns its TIMEOUT is killed and the pool replaced."""
+    agent_file = _write_agent(tmp_path / "slow_process_agent.py", SLOW_PROCESS_AGENT_CODE)
+    module = load_agent(agent_file)
+    dspy_integration.shutdown_process_pool()
+    dspy_integration.start_process_pool([agent_file], max_workers=1)
+    try:
+        first_pid = _run(module)
+        start = time.perf_counter()
+        with pytest.raises(AgentTimeoutError) as exc_info:
+            _run(module, AgentContext({"sleep": 60}))
+        assert exc_info.value.agent == "slow_process_agent"
+        assert time.perf_counter() - start < 10
+        assert _run(module) != first_pid
+    finally:
+        dspy_integration.shutdown_process_pool()
+
+def test_process_agent_timeout_spares_other_calls_in_the_pool(tmp_path):
+    """Only the stuck worker is killed: a call running next to it still returns its result."""
+    agent_file = _write_agent(tmp_path / "slow_process_agent.py", SLOW_PROCESS_AGENT_CODE)
+    module = load_agent(agent_file)
+    dspy_integration.shutdown_process_pool()
+    dspy_integration.start_process_pool([agent_file], max_workers=2)
+
+    async def both():
+        stuck = run_agent(module, AgentContext({"sleep": 60}, deadline=time.time() + 0.5))
+        other = run_agent(module, AgentContext({"sleep": 1.5}))
+        return await asyncio.gather(stuck, other, return_exceptions=True)
+
+    try:
+        stuck, other = asyncio.run(both())
+        assert isinstance(stuck, AgentTimeoutError)
+        assert isinstance(other, int) and other != os.getpid()
+        assert isinstance(_run(module), int)
+    finally:
+        dspy_integration.shutdown_process_pool()
+
+def test_run_agent_deadlines_for_thread_agents(tmp_path):
+    """Thread agents honour TIMEOUT cooperatively, and expired deadlines fail fast."""
+    cooperative = load_agent(_write_agent(tmp_path / "cooperative_agent.py", COOPERATIVE_AGENT_CODE))
+    with pytest.raises(AgentTimeoutError) as exc_info:
+        _run(cooperative)
+    assert exc_info.value.agent == "cooperative_agent"
+
+    module = load_agent(_write_agent(tmp_path / "deadline_agent.py", CONTEXT_AGENT_CODE))
+    with pytest.raises(AgentTimeoutError):
+        _run(module, AgentContext(deadline=time.time() - 1))
+    assert _run(module, AgentContext({"name": "Ada"}, deadline=time.time() + 10)) == "Hello Ada"
+
+def test_run_batch_keeps_order_and_caps_concurrency(tmp_path):
+    """Batch items run concurrently up to the cap and report per-item status in request order."""
+    _write_agent(tmp_path / "batched.py", BATCH_AGENT_CODE)
+    registry = AgentRegistry(str(tmp_path))
+    items = [("batched", {"i": i}) for i in range(10)] + [("batched", {"fail": True}), ("missing", {})]
+    outcomes = asyncio.run(run_batch(registry, items, concurrency=3))
+
+    assert [o["result"] for o in outcomes[:10]] == list(range(10))
+    assert [o["status"] for o in outcomes] == ["ok"] * 10 + ["error", "not_found"]
+    assert "boom" in outcomes[10]["error"]
+    assert all(o["elapsed_ms"] >= 0 for o in outcomes)
+    assert registry.get("batched").ACTIVE["peak"] == 3
+
+def test_stream_agent_yields_events_as_they_are_produced(tmp_path):
+    """Generator agents stream each event as soon as its step completes, off the event loop."""
+    module = load_agent(_write_agent(tmp_path / "stream_agent.py", STREAM_AGENT_CODE))
+    start = time.perf_counter()
+    events = _stream(module, AgentContext({"steps": 3, "sleep": 0.1}))
+    assert [event["event"] for event, _ in events] == ["step"] * 3 + ["result"]
+    assert all(event["thread"].startswith("agent") for event, _ in events[:3])
+    # The first event arrives after one step, not after the whole run
+    assert events[0][1] - start < events[-1][1] - start - 0.15
+
+    with pytest.raises(AgentTimeoutError):
+        _stream(module, AgentContext({"steps": 100, "sleep": 0.05}, deadline=time.time() + 0.2))
+
+def test_run_agent_caches_results_of_agents_with_cache_ttl(tmp_path, monkeypatch):
+    """CACHE_TTL agents are cached by name, source version and params, with TTL expiry and byte-bounded LRU."""
+    clear_result_cache()
+    path = tmp_path / "cached_result_agent.py"
+    module = load_agent(_write_agent(path, CACHED_AGENT_CODE))
+
+    first = _run(module, AgentContext({"text": "a", "size": 1}))
+    first["text"] = "mutated"
+    assert _run(module, AgentContext({"size": 1, "text": "a"})) == {"text": "a", "padding": "x"}
+    assert len(module.CALLS) == 1
+    stats = result_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+    # An edited agent gets new keys instead of serving results of the old code
+    _write_agent(path, CACHED_AGENT_CODE.replace('"padding"', '"pad"'))
+    edited = load_agent(str(path), use_cache=False)
+    assert _run(edited, AgentContext({"text": "a", "size": 1})) == {"text": "a", "pad": "x"}
+
+    # So does an agent whose cache_version() changes, e.g. after loading new data
+    monkeypatch.setattr(module, "cache_version", lambda: "data-v2", raising=False)
+    calls = len(module.CALLS)
+    _run(module, AgentContext({"text": "a", "size": 1}))
+    _run(module, AgentContext({"text": "a", "size": 1}))
+    assert len(module.CALLS) == calls + 1
+    # and while it has no version yet, calls are not cached at all
+    monkeypatch.setattr(module, "cache_version", lambda: None)
+    _run(module, AgentContext({"text": "a", "size": 1}))
+    _run(module, AgentContext({"text": "a", "size": 1}))
+    assert len(module.CALLS) == calls + 3
+    monkeypatch.setattr(module, "cache_version", lambda: "data-v2")
+
+    monkeypatch.setattr(dspy_integration, "AGENT_RESULT_CACHE_BYTES", 4096)
+    for i in range(8):
+        _run(module, AgentContext({"text": str(i), "size": 1000}))
+    stats = result_cache_stats()
+    assert stats["evictions"] > 0 and stats["bytes"] <= 4096
+
+    monkeypatch.setattr(module, "CACHE_TTL", 0.01)
+    _run(module, AgentContext({"text": "short-lived"}))
+    time.sleep(0.02)
+    calls = len(module.CALLS)
+    _run(module, AgentContext({"text": "short-lived"}))
+    assert len(module.CALLS) == calls + 1
+    assert result_cache_stats()["expirations"] == 1
+    clear_result_cache()
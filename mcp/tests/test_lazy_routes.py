@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.lazy_routes import ROUTE_PREFIX, build_manifest, create_registry, load_manifest, register_agent_routes
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _app(lazy):
+    app = FastAPI()
+    router = APIRouter(prefix=ROUTE_PREFIX)
+    register_agent_routes(router, lazy=lazy)
+    app.include_router(router)
+    return app
+
+# -X importtime only logs the import statement, so importlib.import_module goes through __import__
+IMPORTTIME_CODE = """
+import importlib, sys
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    if not name.startswith('agents.'):
+        return _import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = import_module
+import app.main
+"""
+
+def _agent_modules_after_startup(lazy):
+    """Run `python -X importtime` on app.main in a fresh interpreter and return the agent modules it imported."""
+    env = dict(os.environ, LAZY_AGENT_ROUTES="1" if lazy else "0")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORTTIME_CODE],
+                            cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+    lines = [line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")]
+    return {name for name in lines if name.startswith("agents.")}
+
+def test_manifest_is_up_to_date():
+    """app/agent_manifest.json matches the agents; regenerate with `python -m app.lazy_routes`"""
+    assert json.loads(json.dumps(build_manifest())) == load_manifest()
+
+def test_lazy_routes_match_eager_routes():
+    """Lazy placeholders expose the same OpenAPI paths and responses as the real routes"""
+    eager, lazy = _app(lazy=False), _app(lazy=True)
+    assert lazy.openapi()["paths"] == eager.openapi()["paths"]
+
+    params = {"INPUT_TEXT": "What a great day"}
+    eager_response = TestClient(eager).get("/classifier", params=params)
+    lazy_response = TestClient(lazy).get("/classifier", params=params)
+    assert lazy_response.status_code == eager_response.status_code == 200
+    assert lazy_response.json() == eager_response.json()
+    assert TestClient(lazy).post("/agents/calculator", json={"expression": "2*3"}).json()["result"]["result"] == 6
+
+def test_lazy_registry_loads_agents_on_first_use():
+    """The manifest registry lists agents without loading them"""
+    registry = create_registry(lazy=True)
+    assert registry.describe() == create_registry(lazy=False).describe()
+    assert registry.get("hello_world").agent_main().startswith("Welcome to the Agent Base Framework!")
+
+def test_lazy_startup_skips_agent_imports():
+    """Lazy mode registers every route without importing the agent modules; timings are in benchmarks/"""
+    assert "agents.calculator" in _agent_modules_after_startup(lazy=False)
+    assert _agent_modules_after_startup(lazy=True) == {"agents.dspy_integration"}
@@ -0,0 +1,64 @@
+import random
+import re
+import time
+
+import pytest
+
+from app.linear_regex import LinearRegex, UnsupportedPattern
+
+ATOMS = ["a", "b", "ab", ".", r"\d", r"\w", r"\s", r"\W", r"\D", "[ab]", "[^a]", "[a-c_]", r"[\d\s]",
+         r"\b", r"\B", "^", "$", r"\A", r"\Z", "\n", "é"]
+CHARS = ["a", "b", "c", "1", " ", "\n", "_", "é", "-", "٣", "\x1c", "\r"]
+
+def _pattern(rng: random.Random, depth: int = 0) -> str:
+    if depth > 3 or rng.random() < 0.3:
+        return rng.choice(ATOMS)
+    choice = rng.random()
+    if choice < 0.3:
+        return _pattern(rng, depth + 1) + _pattern(rng, depth + 1)
+    if choice < 0.45:
+        return f"({_pattern(rng, depth + 1)}|{_pattern(rng, depth + 1)})"
+    if choice < 0.65:
+        return f"(?:{_pattern(rng, depth + 1)})" + rng.choice(["*", "+", "?", "*?", "{2}", "{1,3}", "{0,2}?"])
+    if choice < 0.8:
+        return f"({rng.choice(['?s', '?m', '?-s'])}:{_pattern(rng, depth + 1)})"
+    return _pattern(rng, depth + 1)
+
+def test_linear_regex_agrees_with_re():
+    """search() is true exactly when re.search finds a match, anchors, flags and Unicode classes included"""
+    rng = random.Random(3)
+    checked = 0
+    while checked < 600:
+        pattern = rng.choice(["", "(?m)", "(?s)", "(?a)", "(?x)"]) + _pattern(rng)
+        try:
+            expected = re.compile(pattern)
+        except re.error:
+            continue
+        linear = LinearRegex(pattern)
+        for _ in range(20):
+            text = "".join(rng.choice(CHARS) for _ in range(rng.randint(0, 8)))
+            assert linear.search(text) == bool(expected.search(text)), (pattern, text)
+        checked += 1
+
+@pytest.mark.parametrize("pattern, reason", [
+    (r"(a)\1", "backreference"),
+    (r"a(?=b)", "lookahead"),
+    (r"(?<!a)b", "lookbehind"),
+    (r"(a)?(?(1)b|c)", "conditional"),
+    (r"(?>a+)b", "atomic"),
+    (r"a++b", "possessive"),
+    (r"(?i)hello", "IGNORECASE"),
+    (r"(?a:\w)", "ASCII"),
+    (r"a{20000}", "states"),
+])
+def test_linear_regex_rejects_patterns_that_need_backtracking(pattern, reason):
+    """Patterns the engine cannot run in linear time are rejected when compiled"""
+    with pytest.raises(UnsupportedPattern, match=reason):
+        LinearRegex(pattern)
+
+def test_linear_regex_is_linear_on_adversarial_input():
+    """Patterns that backtrack exponentially in re take time proportional to the text"""
+    for pattern, text in [(r"(a+)+$", "a" * 5000 + "!"), (r"(a|aa)*c", "a" * 5000), (r"^(\w+\s?)*$", "word " * 1000 + "!")]:
+        start = time.perf_counter()
+        assert not LinearRegex(pattern).search(text)
+        assert time.perf_counter() - start < 2
@@ -1,5 +1,8 @@
+import os
+import time
 from fastapi.testclient import TestClient
 from app.main import app
+from agents.dspy_integration import clear_result_cache
 
 client = TestClient(app)
 
@@ -7,7 +10,9 @@ def test_health_check():
     """Test the health check endpoint"""
     response = client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok", "message": "Healthy"}
+    body = response.json()
+    assert (body["status"], body["message"]) == ("ok", "Healthy")
+    assert body["mcp"]["circuit"]["state"] in ("closed", "open", "half_open")
 
 def test_nonexistent_agent():
     """Test error handling for non-existent agent"""
@@ -20,4 +25,44 @@ def test_invalid_agent():
     # This would require creating a temporary invalid agent file
     # For now, we'll just verify the 404 response
     response = client.get("/agent/invalid")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_list_agents_matches_agent_files():
+    """/agents is generated from the agent files actually present"""
+    response = client.get("/agents")
+    assert response.status_code == 200
+    names = {agent["name"] for agent in response.json()["agents"]}
+    for filename in os.listdir("agents"):
+        name, ext = os.path.splitext(filename)
+        if ext == ".py" and name not in ("__init__", "dspy_integration"):
+            assert name in names
+    assert all(agent["description"] for agent in response.json()["agents"])
+
+def test_expired_request_deadline_returns_504():
+    """An X-Request-Deadline in the past stops the agent call with a structured 504"""
+    response = client.get("/agent/hello_world", headers={"X-Request-Deadline": str(time.time() - 1)})
+    assert response.status_code == 504
+    assert response.json()["agent"] == "hello_world"
+    assert response.json()["error"] == "timeout"
+
+def test_batch_runs_agents_in_order():
+    """POST /agents/batch returns one result per item, in order, with status and timing"""
+    response = client.post("/agents/batch", json={"items": [
+        {"agent": "hello_world"},
+        {"agent": "nonexistent_agent", "params": {"x": 1}},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["agent"] for r in results] == ["hello_world", "nonexistent_agent"]
+    assert [r["status"] for r in results] == ["ok", "not_found"]
+    assert isinstance(results[0]["result"], str)
+    assert all("elapsed_ms" in r for r in results)
+
+def test_agent_cache_stats_counts_hits():
+    """Repeated calls of a CACHE_TTL agent are cache hits reported by /agents/cache/stats"""
+    clear_result_cache()
+    for _ in range(2):
+        assert client.post("/agents/batch", json={"items": [{"agent": "hello_world"}]}).status_code == 200
+    stats = client.get("/agents/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert 0 < stats["bytes"] <= stats["max_bytes"]
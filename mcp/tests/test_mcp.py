@@ -1,6 +1,14 @@
+import asyncio
+import json
+import logging
 import pytest
+import httpx
 from unittest.mock import patch, MagicMock
-from app.mcp_adapter import MCPAdapter
+import app.mcp_adapter as mcp_adapter
+from app.mcp_adapter import MCPAdapter, get_mcp_adapter, CONTEXT_VERSION_HEADER
+from app.json_patch import JsonPatchError, apply_patch, make_patch
+from app import mcp_encoding
+from app.mcp_standin import create_standin_app
 from agents.dspy_integration import load_agent
 import os
 
@@ -14,15 +22,16 @@ def mock_env_vars():
         yield
 
 @pytest.fixture
-def mock_requests():
-    """Mock requests library for testing."""
-    with patch('requests.post') as mock_post, patch('requests.get') as mock_get:
-        mock_response = MagicMock()
-        mock_response.json.return_value = {"status": "success"}
-        mock_response.raise_for_status.return_value = None
-        mock_post.return_value = mock_response
-        mock_get.return_value = mock_response
-        yield mock_post, mock_get
+def mock_transport():
+    """Route the adapter's HTTP clients to an in-process handler that records each request."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={"status": "success"})
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        yield sent
 
 def test_mcp_adapter_initialization(mock_env_vars):
     """Test MCPAdapter initialization with environment variables."""
@@ -35,35 +44,307 @@ def test_mcp_adapter_initialization_missing_env():
     adapter = MCPAdapter()
     assert adapter.initialized is None
 
-def test_send_context(mock_env_vars, mock_requests):
+def test_send_context(mock_env_vars, mock_transport):
     """Test sending context data through MCPAdapter."""
-    mock_post, _ = mock_requests
     adapter = MCPAdapter()
     context = {"test": "data"}
     
     result = adapter.send_context(context)
+    adapter.close()
     
     assert result == {"status": "success"}
-    mock_post.assert_called_once_with(
-        'http://test-endpoint.com/send',
-        json={"context": context},
-        headers={"Authorization": "Bearer test_key"}
-    )
+    [request] = mock_transport
+    assert (request.method, str(request.url)) == ('POST', 'http://test-endpoint.com/send')
+    assert json.loads(request.content) == {"context": context}
+    assert request.headers["Authorization"] == "Bearer test_key"
 
-def test_get_response(mock_env_vars, mock_requests):
+def test_get_response(mock_env_vars, mock_transport):
     """Test getting response from MCPAdapter."""
-    _, mock_get = mock_requests
     adapter = MCPAdapter()
     
     result = adapter.get_response()
+    adapter.close()
     
     assert result == {"status": "success"}
-    mock_get.assert_called_once_with(
-        'http://test-endpoint.com/response',
-        headers={"Authorization": "Bearer test_key"}
-    )
+    [request] = mock_transport
+    assert (request.method, str(request.url)) == ('GET', 'http://test-endpoint.com/response')
+    assert request.headers["Authorization"] == "Bearer test_key"
+
+def test_async_adapter_shares_one_pooled_client(mock_env_vars, mock_transport):
+    """Async calls and blocking calls from worker threads all use the client opened by start()."""
+    async def scenario():
+        adapter = MCPAdapter()
+        await adapter.start()
+        try:
+            client = adapter._client()
+            results = await asyncio.gather(*(adapter.asend_context({"i": i}) for i in range(5)))
+            threaded = await asyncio.to_thread(adapter.send_context, {"i": "thread"})
+            assert adapter._clients == {asyncio.get_running_loop(): client}
+            assert adapter._background is None
+        finally:
+            await adapter.aclose()
+        assert client.is_closed
+        return results + [threaded]
+
+    assert asyncio.run(scenario()) == [{"status": "success"}] * 6
+    assert len(mock_transport) == 6
+
+def test_unconfigured_adapter_is_a_quiet_no_op(monkeypatch, caplog):
+    """Without MCP configuration calls return their fall-back value at once and warn only once."""
+    monkeypatch.delenv("MCP_ENDPOINT", raising=False)
+    monkeypatch.delenv("MCP_API_KEY", raising=False)
+    monkeypatch.setattr(mcp_adapter, "_WARNED", set())
+    with caplog.at_level(logging.DEBUG, logger="app.mcp_adapter"):
+        adapters = [MCPAdapter() for _ in range(3)]
+        for adapter in adapters:
+            assert adapter.send_context({"a": 1}) == {"a": 1}
+            assert adapter.get_response() == {}
+    assert len([r for r in caplog.records if r.levelno == logging.WARNING]) == 1
+    assert all(adapter._background is None and not adapter._clients for adapter in adapters)
+
+def test_mcp_errors_warn_once_until_the_endpoint_recovers(mock_env_vars, monkeypatch, caplog):
+    """Repeated failures log one warning; a success re-arms it for the next outage."""
+    monkeypatch.setattr(mcp_adapter, "_WARNED", set())
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRIES", 0)
+    status = {"code": 503}
+    transport = httpx.MockTransport(lambda request: httpx.Response(status["code"], json={"ok": True}))
+    with patch.object(MCPAdapter, "transport", transport), caplog.at_level(logging.WARNING, logger="app.mcp_adapter"):
+        adapter = MCPAdapter()
+        for _ in range(3):
+            assert adapter.send_context({"a": 1}) == {"a": 1}
+        status["code"] = 200
+        assert adapter.send_context({"a": 1}) == {"ok": True}
+        status["code"] = 503
+        assert adapter.send_context({"a": 1}) == {"a": 1}
+        adapter.close()
+    assert len(caplog.records) == 2
+
+def test_transient_mcp_failures_are_retried(mock_env_vars, monkeypatch):
+    """Connection errors and 5xx responses are retried with backoff; 4xx responses are not."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRY_BACKOFF", 0)
+    outcomes = [httpx.ConnectError("refused"), httpx.Response(502), httpx.Response(200, json={"ok": True}), httpx.Response(400)]
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        adapter = MCPAdapter()
+        assert adapter.send_context({"a": 1}) == {"ok": True}
+        assert len(attempts) == 3
+        assert adapter.send_context({"a": 1}) == {"a": 1}
+        assert len(attempts) == 4
+        adapter.close()
+    assert adapter.health()["circuit"]["state"] == "closed"
+
+def test_circuit_breaker_short_circuits_an_unhealthy_endpoint(mock_env_vars, monkeypatch):
+    """After repeated failures calls skip MCP and fall back locally until a trial call succeeds."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRIES", 0)
+    healthy = {"value": False}
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if not healthy["value"]:
+            raise httpx.ReadTimeout("slow endpoint")
+        return httpx.Response(200, json={"ok": True})
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        adapter = MCPAdapter()
+        adapter.breaker = mcp_adapter.CircuitBreaker(threshold=2, reset_after=60)
+        for _ in range(4):
+            assert adapter.send_context({"a": 1}) == {"a": 1}
+        assert len(attempts) == 2
+        assert adapter.health()["circuit"]["state"] == "open"
+        assert adapter.health()["circuit"]["retry_in"] > 0
+
+        healthy["value"] = True
+        adapter.breaker.reset_after = 0
+        assert adapter.breaker.state == "half_open"
+        assert adapter.send_context({"a": 1}) == {"ok": True}
+        adapter.close()
+    assert adapter.health()["circuit"] == {"state": "closed", "consecutive_failures": 0, "retry_in": None}
+
+def test_circuit_breaker_trial_is_settled_by_any_error(mock_env_vars, monkeypatch):
+    """Undecodable 200s count as failures, and a half-open trial failing that way reopens the breaker."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRIES", 0)
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(lambda request: httpx.Response(200, content=b"<html>"))):
+        adapter = MCPAdapter()
+        assert adapter.send_context({"a": 1}) == {"a": 1}
+        adapter.close()
+    assert adapter.breaker.snapshot()["consecutive_failures"] == 1
+
+    outcomes = [ValueError("transport bug"), httpx.Response(200, json={"ok": True})]
+
+    def handler(request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        adapter = MCPAdapter()
+        adapter.breaker = mcp_adapter.CircuitBreaker(threshold=1, reset_after=0)
+        adapter.breaker.record_failure()
+        assert adapter.breaker.state == "half_open"
+        assert adapter.send_context({"a": 1}) == {"a": 1}
+        assert adapter.breaker.state == "half_open"
+        assert adapter.send_context({"a": 1}) == {"ok": True}
+        adapter.close()
+    assert adapter.breaker.state == "closed"
+
+def test_json_patch_round_trip():
+    """Patches reproduce the new document; appending to a list costs one op per new item."""
+    old = {"hypothesis": "h", "iteration": 0, "history": ["h"], "a/b": 1, "gone": True}
+    new = {"hypothesis": "h refined", "iteration": 1, "history": ["h", "h refined"], "a/b": 2, "nested": {"x": [1]}}
+    patch = make_patch(old, new)
+    assert {"op": "add", "path": "/history/-", "value": "h refined"} in patch
+    assert {"op": "replace", "path": "/a~1b", "value": 2} in patch
+    assert apply_patch(old, patch) == new
+    assert old["history"] == ["h"]
+    assert make_patch(new, new) == []
+    assert apply_patch(old, make_patch(old, [1, 2])) == [1, 2]
+    with pytest.raises(JsonPatchError):
+        apply_patch(old, [{"op": "replace", "path": "/missing/x", "value": 1}])
+
+def _versioned_server(sessions, versioned=True):
+    """MockTransport handler of an MCP endpoint that keeps each session's context by version."""
+    def handler(request):
+        body = json.loads(request.content)
+        session = body.get("session")
+        if "patch" in body:
+            version, context = sessions.get(session, (None, None))
+            if version != body["base_version"]:
+                return httpx.Response(409, json={"error": "unknown base version"})
+            context = apply_patch(context, body["patch"])
+        else:
+            context = body["context"]
+        version = sessions.get(session, (0, None))[0] + 1
+        sessions[session] = (version, context)
+        headers = {CONTEXT_VERSION_HEADER: str(version)} if versioned else {}
+        return httpx.Response(200, json=context, headers=headers)
+    return handler
+
+def test_send_context_delta_encodes_sessions(mock_env_vars):
+    """After the first full send only patches go out; a 409 triggers a full resync."""
+    sessions = {}
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(_versioned_server(sessions))):
+        adapter = MCPAdapter()
+        context = {"hypothesis": "h", "iteration": 0, "history": ["h" * 200]}
+        for i in range(6):
+            context["iteration"] = i
+            assert adapter.send_context(context, session="s1") == context
+            context["history"].append("h" * 200 + " refined" * (i + 1))
+        stats = dict(adapter.delta_stats)
+        assert (stats["full_sends"], stats["delta_sends"]) == (1, 5)
+        # Each patch carries only the newest history entry, not the whole list
+        assert stats["delta_bytes"] / 5 < stats["full_bytes"] * 2
+
+        sessions.clear()  # The endpoint lost its state
+        assert adapter.send_context(context, session="s1") == context
+        assert adapter.delta_stats["resyncs"] == 1
+        assert adapter.delta_stats["full_sends"] == 2
+
+        adapter.end_session("s1")
+        assert not adapter._sessions
+        adapter.close()
+
+def test_send_context_without_version_support_sends_full_contexts(mock_env_vars):
+    """Endpoints that do not acknowledge versions keep receiving the full context."""
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(_versioned_server({}, versioned=False))):
+        adapter = MCPAdapter()
+        for i in range(3):
+            assert adapter.send_context({"iteration": i}, session="s1") == {"iteration": i}
+        adapter.close()
+    assert (adapter.delta_stats["full_sends"], adapter.delta_stats["delta_sends"]) == (3, 0)
+
+def _batching_server(requests_seen, batch_route=True):
+    """MockTransport handler answering /send and /send/batch with each context tagged as seen."""
+    def handler(request):
+        requests_seen.append(request.url.path)
+        body = json.loads(request.content)
+        if request.url.path == "/send/batch":
+            if not batch_route:
+                return httpx.Response(404)
+            return httpx.Response(200, json={"results": [dict(item["context"], seen=True) for item in body["items"]]})
+        return httpx.Response(200, json=dict(body["context"], seen=True))
+    return handler
+
+def test_send_context_micro_batches_concurrent_sends(mock_env_vars, monkeypatch):
+    """Concurrent sends within the window share one /send/batch request, capped at MCP_BATCH_MAX."""
+    monkeypatch.setattr(mcp_adapter, "MCP_BATCH_WINDOW_MS", 20)
+    monkeypatch.setattr(mcp_adapter, "MCP_BATCH_MAX", 4)
+    requests_seen = []
+
+    async def scenario():
+        adapter = MCPAdapter()
+        await adapter.start()
+        try:
+            results = await asyncio.gather(*(adapter.asend_context({"i": i}) for i in range(10)))
+            lone = await adapter.asend_context({"i": "lone"})
+        finally:
+            await adapter.aclose()
+        return adapter, results, lone
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(_batching_server(requests_seen))):
+        adapter, results, lone = asyncio.run(scenario())
+    assert results == [{"i": i, "seen": True} for i in range(10)]
+    assert lone == {"i": "lone", "seen": True}
+    assert requests_seen == ["/send/batch"] * 3 + ["/send"]
+    assert adapter.batch_stats == {"batches": 3, "batched_contexts": 10}
+
+def test_malformed_mcp_replies_return_fall_backs(mock_env_vars, monkeypatch):
+    """Non-JSON bodies, unencodable contexts and /send/batch replies without results don't escape the API."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRIES", 0)
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(lambda request: httpx.Response(200, content=b"<html>"))):
+        adapter = MCPAdapter()
+        assert adapter.send_context({"a": 1}) == {"a": 1}
+        assert adapter.get_response() == {}
+        context = {"a": float("nan")}
+        assert adapter.send_context(context) is context
+        assert adapter.send_context(context, session="s") is context
+        adapter.close()
+
+    monkeypatch.setattr(mcp_adapter, "MCP_BATCH_WINDOW_MS", 20)
+
+    async def scenario():
+        adapter = MCPAdapter()
+        try:
+            return await asyncio.gather(*(adapter.asend_context({"i": i}) for i in range(3)))
+        finally:
+            await adapter.aclose()
 
-def test_agent_mcp_integration(mock_env_vars, mock_requests, tmp_path):
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(lambda request: httpx.Response(200, json={}))):
+        assert asyncio.run(scenario()) == [{"i": i} for i in range(3)]
+
+def test_send_context_batching_falls_back_without_batch_route(mock_env_vars, monkeypatch):
+    """An endpoint without /send/batch gets individual sends."""
+    monkeypatch.setattr(mcp_adapter, "MCP_BATCH_WINDOW_MS", 20)
+    requests_seen = []
+
+    async def scenario():
+        adapter = MCPAdapter()
+        try:
+            first = await asyncio.gather(*(adapter.asend_context({"i": i}) for i in range(3)))
+            second = await asyncio.gather(*(adapter.asend_context({"i": i}) for i in range(3)))
+        finally:
+            await adapter.aclose()
+        return first + second
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(_batching_server(requests_seen, batch_route=False))):
+        results = asyncio.run(scenario())
+    assert results == [{"i": i, "seen": True} for i in range(3)] * 2
+    assert requests_seen == ["/send/batch"] + ["/send"] * 6
+
+def test_get_mcp_adapter_is_a_process_singleton():
+    """Every route shares one adapter instance."""
+    assert get_mcp_adapter() is get_mcp_adapter()
+
+def test_agent_mcp_integration(mock_env_vars, mock_transport, tmp_path):
     """Test MCP integration in an agent."""
     # Create a temporary test agent
     agent_code = """
@@ -109,4 +390,240 @@ def agent_main():
     assert "result" in result
     assert "context" in result
     assert result["result"] == "test"
-    assert result["context"] == {"test": "data"}  # Original context is returned when not initialized
\ No newline at end of file
+    assert result["context"] == {"test": "data"}  # Original context is returned when not initialized
+
+def test_calculator_refuses_huge_powers():
+    """Powers too large to finish in time are rejected instead of pinning a worker."""
+    from agents.calculator import safe_arithmetic_eval
+    assert safe_arithmetic_eval("2 ** 10 + 3") == 1027
+    with pytest.raises(ValueError, match="Result too large"):
+        safe_arithmetic_eval("9 ** 9 ** 9 ** 9")
+
+def test_standin_serves_versioned_sessions_and_final_answers(mock_env_vars):
+    """The adapter's delta sends apply cleanly on the stand-in, which answers with its canned final_answer."""
+    standin = create_standin_app(final_answer_after=2)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        replies = [adapter.send_context({"iteration": i, "history": list(range(i + 1))}, session="s1") for i in range(3)]
+        last = adapter.get_response(session="s1")
+        adapter.close()
+    assert [reply.get("final_answer") for reply in replies] == [None, None, "Stand-in final answer"]
+    assert replies[1] == {"iteration": 1, "history": [0, 1]}
+    assert last == {"iteration": 2, "history": [0, 1, 2]}
+    assert standin.state.stats["full_sends"] == 1 and standin.state.stats["delta_sends"] == 2
+    assert adapter.delta_stats["delta_sends"] == 2
+
+def test_standin_injected_errors_open_the_circuit(mock_env_vars, monkeypatch):
+    """With every request failing, the adapter falls back locally and stops calling once the breaker opens."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RETRIES", 0)
+    monkeypatch.setattr(mcp_adapter, "MCP_BREAKER_THRESHOLD", 2)
+    standin = create_standin_app(error_rate=1.0)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        for _ in range(4):
+            assert adapter.send_context({"a": 1}) == {"a": 1}
+        adapter.close()
+    assert standin.state.stats["errors"] == 2
+    assert adapter.breaker.state == "open"
+
+def test_multi_step_reasoning_stops_at_standin_final_answer(mock_env_vars):
+    """The reasoning agent ends as soon as the stand-in hands back a final answer."""
+    from app.main import app
+    from fastapi.testclient import TestClient
+    standin = create_standin_app(latency_ms=1, jitter_ms=1, final_answer_after=1, seed=0)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)), \
+            patch.object(mcp_adapter, "_shared_adapter", None), TestClient(app) as client:
+        response = client.post("/agents/multi_step_reasoning", json={"hypothesis": "The Earth is flat"})
+    assert response.status_code == 200
+    assert response.json()["result"]["final_answer"] == "Stand-in final answer"
+    assert standin.state.stats["send"] == 2
+
+def test_get_response_revalidates_with_etag(mock_env_vars):
+    """An unchanged response comes back as a 304 and is served from the cache; a send makes it refetch."""
+    standin = create_standin_app()
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        adapter.send_context({"step": 1})
+        first, second = adapter.get_response(), adapter.get_response()
+        adapter.send_context({"step": 2})
+        third = adapter.get_response()
+        adapter.close()
+    assert (first, second, third) == ({"step": 1}, {"step": 1}, {"step": 2})
+    assert standin.state.stats["not_modified"] == 1
+    stats = adapter.response_cache_stats()
+    assert (stats["hits"], stats["revalidated"], stats["misses"]) == (0, 1, 2)
+
+def test_get_response_fresh_entries_are_local_hits(mock_env_vars):
+    """Within max-age, reads of an unchanged session version need no request; invalidation forces one."""
+    standin = create_standin_app(response_max_age=60)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        adapter.send_context({"n": 1}, session="s")
+        reads = [adapter.get_response(session="s") for _ in range(3)]
+        adapter.send_context({"n": 2}, session="s")
+        reads.append(adapter.get_response(session="s"))
+        adapter.invalidate_response("s")
+        reads.append(adapter.get_response(session="s"))
+        adapter.close()
+    assert reads == [{"n": 1}] * 3 + [{"n": 2}] * 2
+    assert standin.state.stats["response"] == 3
+    stats = adapter.response_cache_stats()
+    assert (stats["hits"], stats["revalidated"], stats["misses"]) == (2, 0, 3)
+
+def test_response_cache_is_bounded_by_bytes(mock_env_vars, monkeypatch):
+    """Least recently read sessions are evicted once the cached bodies exceed MCP_RESPONSE_CACHE_BYTES."""
+    monkeypatch.setattr(mcp_adapter, "MCP_RESPONSE_CACHE_BYTES", 100)
+    standin = create_standin_app()
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        for i in range(5):
+            adapter.send_context({"payload": "x" * 30}, session=f"s{i}")
+            adapter.get_response(session=f"s{i}")
+        adapter.close()
+    stats = adapter.response_cache_stats()
+    assert stats["bytes"] <= 100
+    assert stats["entries"] == 2 and stats["evictions"] == 3
+
+def test_await_response_resolves_when_a_response_is_published(mock_env_vars):
+    """A long poll is held open until the endpoint publishes, then resolves with that response."""
+    standin = create_standin_app()
+    transport = httpx.ASGITransport(app=standin)
+
+    async def scenario():
+        adapter = MCPAdapter()
+        await adapter.asend_context({"n": 1}, session="s")
+        await adapter.aget_response(session="s")
+
+        async def publish():
+            await asyncio.sleep(0.05)
+            async with httpx.AsyncClient(transport=transport, base_url="http://standin") as client:
+                await client.post("/response", json={"session": "s", "response": {"final_answer": 42}})
+
+        publisher = asyncio.ensure_future(publish())
+        result = await adapter.await_response(session="s", until=lambda r: "final_answer" in r, timeout=5)
+        await publisher
+        timed_out = await adapter.await_response(session="s", timeout=0.05)
+        await adapter.aclose()
+        return result, timed_out
+
+    with patch.object(MCPAdapter, "transport", transport):
+        result, timed_out = asyncio.run(scenario())
+    assert result == {"final_answer": 42}
+    assert timed_out == {}
+    assert standin.state.stats["long_polls"] == 2
+    assert standin.state.stats["not_modified"] == 1
+
+def test_await_response_falls_back_to_polling(mock_env_vars, monkeypatch):
+    """Endpoints without /response/wait are polled until the response changes."""
+    monkeypatch.setattr(mcp_adapter, "MCP_POLL_INTERVAL", 0.01)
+    paths, bodies = [], iter([{"n": 1}, {"n": 1}, {"n": 2}])
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path == "/response/wait":
+            return httpx.Response(404)
+        return httpx.Response(200, json=next(bodies))
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        adapter = MCPAdapter()
+        assert adapter.get_response() == {"n": 1}
+        assert adapter.wait_for_response(timeout=5) == {"n": 2}
+        adapter.close()
+    assert paths == ["/response", "/response/wait", "/response", "/response"]
+
+def test_multi_step_reasoning_waits_for_published_final_answer(mock_env_vars):
+    """With final_answer_wait, the agent resolves on a final answer the endpoint publishes later."""
+    from app.main import app
+    from fastapi.testclient import TestClient
+    standin = create_standin_app(final_answer_after=4, final_answer_delay_ms=50)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)), \
+            patch.object(mcp_adapter, "_shared_adapter", None), TestClient(app) as client:
+        waited = client.post("/agents/multi_step_reasoning", json={"hypothesis": "H", "final_answer_wait": 5})
+        not_waited = client.post("/agents/multi_step_reasoning", json={"hypothesis": "H"})
+    assert waited.json()["result"]["final_answer"] == "Stand-in final answer"
+    assert "partial_hypothesis" in not_waited.json()["result"]
+
+def test_multi_step_reasoning_rejects_invalid_final_answer_wait(mock_env_vars):
+    """final_answer_wait must be a non-negative number; large values are clamped."""
+    import agents.multi_step_reasoning as multi_step_reasoning
+    from app.main import app
+    from fastapi.testclient import TestClient
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=create_standin_app())), \
+            patch.object(mcp_adapter, "_shared_adapter", None), TestClient(app) as client:
+        for wait in ("soon", -1, True, [1]):
+            response = client.post("/agents/multi_step_reasoning", json={"hypothesis": "H", "final_answer_wait": wait})
+            assert response.status_code == 400, wait
+        assert client.post("/agents/multi_step_reasoning/stream", json={"hypothesis": "H", "final_answer_wait": -1}).status_code == 400
+    assert multi_step_reasoning.final_answer_wait(1e9) == multi_step_reasoning.MAX_FINAL_ANSWER_WAIT
+    with pytest.raises(ValueError):
+        multi_step_reasoning.final_answer_wait(float("nan"))
+
+def test_large_bodies_use_the_encoding_the_endpoint_advertises(mock_env_vars, monkeypatch):
+    """Bodies over the threshold are compressed once the endpoint has advertised it; small ones stay JSON."""
+    monkeypatch.setattr(mcp_adapter, "MCP_ENCODINGS", ["gzip"])
+    standin = create_standin_app()
+    big = {"steps": ["Step %d: executed sub-agents and collected results." % i for i in range(100)]}
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        replies = [adapter.send_context(big), adapter.send_context(big), adapter.send_context({"small": 1})]
+        response = adapter.get_response()
+        adapter.close()
+    assert replies == [big, big, {"small": 1}]
+    assert response == {"small": 1}
+    assert standin.state.stats["request_encodings"] == {"json": 2, "json+gzip": 1}
+    sent = adapter.encoding_stats()["sent"]
+    assert sent["json+gzip"]["count"] == 1
+    assert sent["json+gzip"]["wire_bytes"] < sent["json+gzip"]["bytes"] / 5
+    assert sent["json"]["count"] == 2 and sent["json"]["mean_ms"] >= 0
+
+def test_large_responses_arrive_compressed(mock_env_vars):
+    """The stand-in gzips large responses and the adapter counts them under json+gzip."""
+    standin = create_standin_app(compress_min_bytes=100)
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        adapter.send_context({"text": "x" * 1000})
+        adapter.close()
+    received = adapter.encoding_stats()["received"]["json+gzip"]
+    assert received["bytes"] > 1000 > received["wire_bytes"]
+
+def test_unsupported_media_type_falls_back_to_plain_json(mock_env_vars, monkeypatch):
+    """A 415 for an advertised encoding is repeated as plain JSON and ends the negotiation."""
+    monkeypatch.setattr(mcp_adapter, "MCP_ENCODINGS", ["gzip"])
+    monkeypatch.setattr(mcp_adapter, "MCP_COMPRESS_MIN_BYTES", 10)
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("content-encoding"))
+        if request.headers.get("content-encoding"):
+            return httpx.Response(415)
+        return httpx.Response(200, json={"ok": True}, headers={"Accept-Encoding": "gzip"})
+
+    with patch.object(MCPAdapter, "transport", httpx.MockTransport(handler)):
+        adapter = MCPAdapter()
+        for _ in range(2):
+            assert adapter.send_context({"payload": "y" * 50}) == {"ok": True}
+        adapter.close()
+    assert seen == [None, "gzip", None]
+    assert adapter.breaker.state == "closed"
+
+def test_encoding_negotiation_helpers():
+    """Offered values are matched in our order of preference; q=0 means refused."""
+    assert mcp_encoding.header_values("zstd;q=0, GZIP; q=0.5") == ["gzip"]
+    assert mcp_encoding.choose(["zstd", "gzip"], "gzip, zstd") == "zstd"
+    assert mcp_encoding.choose(["zstd"], "gzip") is None
+    body = mcp_encoding.serialize({"a": [1, "b"]}, mcp_encoding.JSON)
+    assert mcp_encoding.decompress(mcp_encoding.compress(body, "gzip"), "gzip") == body
+    assert mcp_encoding.label(mcp_encoding.MSGPACK, "zstd") == "msgpack+zstd"
+
+@pytest.mark.skipif(mcp_encoding.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_bodies_round_trip_through_the_standin(mock_env_vars, monkeypatch):
+    """With msgpack installed, large bodies go out as msgpack and come back unchanged."""
+    monkeypatch.setattr(mcp_adapter, "MCP_ENCODINGS", ["msgpack", "gzip"])
+    standin = create_standin_app()
+    big = {"sub_agent_results": {str(i): "Generated detailed summary report" for i in range(100)}}
+    with patch.object(MCPAdapter, "transport", httpx.ASGITransport(app=standin)):
+        adapter = MCPAdapter()
+        assert [adapter.send_context(big) for _ in range(2)] == [big, big]
+        adapter.close()
+    assert standin.state.stats["request_encodings"]["msgpack+gzip"] == 1
+
@@ -1,11 +1,12 @@
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import json
+import time
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.main import app
-from app.mcp_adapter import MCPAdapter
+from app.mcp_adapter import MCPAdapter, get_mcp_adapter
 
 client = TestClient(app)
 
@@ -115,4 +116,62 @@ def test_workflow_decisioning_agent():
         assert "result" in result
         # The exact structure of the result depends on the implementation
         # but we can at least check that it's not an error
-        assert "error" not in result["result"]
\ No newline at end of file
+        assert "error" not in result["result"]
+def test_multi_step_reasoning_stream_ndjson():
+    """The streaming variant emits one NDJSON line per iteration, then the result."""
+    def send_context(context, session=None):
+        if context["iteration"] == 1:
+            return {"final_answer": "The Earth is an oblate spheroid", "context": {"iteration": 1}}
+        return dict(context)
+
+    with patch('app.mcp_adapter.MCPAdapter.send_context', side_effect=send_context):
+        with client.stream("POST", "/agents/multi_step_reasoning/stream", json={"hypothesis": "The Earth is flat"}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            events = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [event["event"] for event in events] == ["iteration", "iteration", "result"]
+    assert [event["hypothesis"] for event in events[:2]] == ["The Earth is flat", "The Earth is flat refined"]
+    assert events[-1]["result"]["final_answer"] == "The Earth is an oblate spheroid"
+
+def test_workflow_decisioning_stream_sse():
+    """With Accept: text/event-stream each decision step is sent as a Server-Sent Event."""
+    with patch('app.mcp_adapter.MCPAdapter.send_context', side_effect=lambda context: context):
+        response = client.post(
+            "/agents/workflow_decisioning/stream",
+            json={"task_description": "Please analyze and report the data"},
+            headers={"Accept": "text/event-stream"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in messages] == ["event: step"] * 3 + ["event: result"]
+    steps = [json.loads(lines[1][len("data: "):]) for lines in messages]
+    assert steps[1]["step"] == "Step 2: Analyzed keywords and selected agents: analysis, report."
+    assert steps[-1]["result"]["result"].startswith("Aggregated results: Performed comprehensive data analysis")
+
+def test_stream_reports_timeout_as_error_event():
+    """An expired request deadline ends the stream with a timeout error event."""
+    response = client.post(
+        "/agents/multi_step_reasoning/stream",
+        json={"hypothesis": "The Earth is flat"},
+        headers={"X-Request-Deadline": str(time.time() - 1)},
+    )
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events == [{"agent": "multi_step_reasoning", "event": "error", "error": "timeout",
+                       "detail": events[0]["detail"]}]
+
+def test_routes_use_the_injected_adapter():
+    """MCP routes receive the adapter through the get_mcp_adapter dependency."""
+    fake_adapter = MagicMock()
+    fake_adapter.send_context.side_effect = lambda context: dict(context, aggregated_result="from fake")
+    app.dependency_overrides[get_mcp_adapter] = lambda: fake_adapter
+    try:
+        response = client.post("/agents/workflow_coordinator", json={})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["result"]["result"] == "from fake"
+    fake_adapter.send_context.assert_called_once()
@@ -1,3 +1,12 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Returns an echo message.",
+    "instructions": "Call /agent/echo with no additional parameters."
+}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
 # agents/echo.py
 
 def agent_main():
@@ -1,2 +1,8 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Returns a goodbye message.",
+    "instructions": "Call /agent/goodbye with no additional parameters."
+}
+
 def agent_main():
     return "Goodbye from the agent!"
\ No newline at end of file
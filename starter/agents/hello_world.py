@@ -1,2 +1,11 @@
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Returns a simple hello world message.",
+    "instructions": "Call /agent/hello_world with no additional parameters."
+}
+
+# Seconds the dispatcher caches a result for the same parameters
+CACHE_TTL = 300
+
 def agent_main():
     return "Hello, World from the agent!"
\ No newline at end of file
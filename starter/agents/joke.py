@@ -1,6 +1,12 @@
 # agents/joke.py
 import random
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Returns a random joke.",
+    "instructions": "Call /agent/joke with no additional parameters."
+}
+
 # Collection of programming jokes
 JOKES = [
     "Why did the programmer quit his job? Because he didn't get arrays!",
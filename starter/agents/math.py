@@ -4,10 +4,21 @@
 import ast
 import operator
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Evaluates a math expression after verifying a token.",
+    "instructions": "Call /agent/math with token=MATH_SECRET and expression parameters."
+}
+
+# Large exponents can keep a core busy, so evaluate in the agent process pool
+EXECUTOR = "process"
+# Seconds allowed per evaluation; on timeout the worker process is killed and replaced
+TIMEOUT = 5
+
 # Expected token for authorization
 EXPECTED_TOKEN = "MATH_SECRET"
 
-# Global variables for configuration
+# Global variables for standalone use; the dispatcher passes token/expression in the context instead
 TOKEN = None  # User must set this before calling agent_main()
 EXPRESSION = None  # User must set this to a valid arithmetic expression (e.g., "2+2")
 
@@ -59,7 +70,7 @@ def safe_eval(expr):
     except (ValueError, SyntaxError, TypeError) as e:
         raise ValueError(f"Invalid expression: {str(e)}")
 
-def agent_main():
+def agent_main(context=None):
     """
     Main function for the Math Agent.
     
@@ -77,24 +88,32 @@ def agent_main():
     3. Call agent_main() to execute:
        >>> result = math.agent_main()
        >>> print(result)  # Should output: 18
+
+    When run through the dispatcher, `token` and `expression` are read from
+    the per-request context instead of the globals.
     
     Returns:
         Union[float, str]: The result of the evaluated expression if successful,
                           or an error message if authorization fails or evaluation errors occur.
     """
+    if context is None:
+        token, expression = TOKEN, EXPRESSION
+    else:
+        token, expression = context.get("token"), context.get("expression")
+
     # Check authorization
-    if TOKEN != EXPECTED_TOKEN:
+    if token != EXPECTED_TOKEN:
         return "Error: Invalid token. Access denied."
         
     # Validate expression
-    if not isinstance(EXPRESSION, str):
+    if not isinstance(expression, str):
         return "Error: Expression must be a string."
-    if not EXPRESSION.strip():
+    if not expression.strip():
         return "Error: Expression cannot be empty."
         
     # Evaluate expression
     try:
-        result = safe_eval(EXPRESSION)
+        result = safe_eval(expression)
         return result
     except ValueError as e:
         return f"Error: {str(e)}"
@@ -1,6 +1,12 @@
 # agents/time.py
 from datetime import datetime, UTC 
 
+# Agent metadata listed by the /agents endpoint
+AGENT_INFO = {
+    "description": "Returns the current server time.",
+    "instructions": "Call /agent/time with no additional parameters."
+}
+
 def agent_main():
     """
     Time Agent
@@ -1,19 +1,51 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse, Response
-from typing import List, Dict
-import os
+from typing import Any, List, Dict
+from agents.dspy_integration import AgentTimeoutError, RequestDeadlineMiddleware, result_cache_stats, run_batch, run_in_thread, shutdown_process_pool, start_process_pool
 from app import agent_routes
-from app.agents_info import AGENTS_INFO
-from agents.dspy_integration import load_agent, run_agent
+from app.models import BatchRequest
 
-app = FastAPI(title="FastAPI Agent System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warm worker processes for agents that declare EXECUTOR = "process"
+    await run_in_thread(start_process_pool, agent_routes.registry.process_agent_files())
+    yield
+    shutdown_process_pool()
+
+app = FastAPI(title="FastAPI Agent System", lifespan=lifespan)
+
+# Agents that run past their deadline answer with a structured 504
+app.add_middleware(RequestDeadlineMiddleware)
+
+@app.exception_handler(AgentTimeoutError)
+async def agent_timeout_handler(request: Request, exc: AgentTimeoutError):
+    return JSONResponse(status_code=504, content={"agent": exc.agent, "error": "timeout", "detail": str(exc)})
 
 @app.get("/agents")
 async def list_all_agents() -> Dict[str, List[Dict[str, str]]]:
     """
     Returns a list of all available agents with brief descriptions and instructions.
     """
-    return {"agents": AGENTS_INFO}
+    return {"agents": agent_routes.registry.describe()}
+
+@app.post("/agents/batch")
+async def run_agents_batch(batch: BatchRequest) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Runs several agents concurrently, e.g. classifier, textrank_summarizer and quote for the same item.
+
+    Results come back in request order with a per-item status ("ok", "not_found",
+    "timeout" or "error") and elapsed_ms.
+    """
+    items = [(item.agent, item.params) for item in batch.items]
+    return {"results": await run_batch(agent_routes.registry, items, batch.concurrency)}
+
+@app.get("/agents/cache/stats")
+async def agent_cache_stats() -> Dict[str, Any]:
+    """
+    Counters of the agent result cache (agents that declare CACHE_TTL), for sizing AGENT_RESULT_CACHE_BYTES.
+    """
+    return result_cache_stats()
 
 @app.get("/favicon.ico")
 async def get_favicon():